@@ -1,31 +1,49 @@
+import os
 import sys
 
 import numpy as np
 
 from karman_vs_naca import compare_ktreff_naca as compare
-from variable_sweep_ktreff import variable_sweep_ktreff as sweep
-from doublet_panel_order import dpan_order as doublet
+from variable_sweep_ktreff import variable_sweep_ktreff as sweep, sweep_outputs
+from doublet_panel_order import dpan_order as doublet, order_outputs
 from run_xfoil import run_xfoil
-from xfoil_post import XFoilPost
+from xfoil_post import xfoil_post
+from matlab_pool import get_pool
+from pipeline import Pipeline, Stage
+from result_cache import ResultCache, set_default_cache
 
-folder_path = sys.argv[1]
-
-naca_digits = compare(folder_path, alpha=0.0, eps=0.06, beta=0.02, tau=0.15, n=150, output_naca=True)
-
-sweep(folder_path, alpha=0.0, eps=[0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08], beta=0.02, tau=0.15, n=150)
-sweep(folder_path, alpha=0.0, eps=0.06, beta=[0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08], tau=0.15, n=150)
-
-doublet(folder_path, alpha=3.0, eps=0.06, beta=0.02, tau=0.15, n_list=np.arange(10, 330, 10), dpan=True)
 
-run_xfoil(folder_path, 50000000, 0.0,
-          -2.0, 30.0, 0.1,
-          1000,
-          aerofoil_filename='aerofoil.dat')
-
-run_xfoil(folder_path, 50000000, 0.0,
-          -2.0, 30.0, 0.1,
-          1000,
-          naca_4_name='1510')
-
-xfoil_post = XFoilPost(folder_path, ['aerofoil', 'naca1510'])
-xfoil_post()
+folder_path = sys.argv[1]
+get_pool(size=4)    # MATLAB sessions shared by every aerofoil below, up to four sweep points at once
+set_default_cache(ResultCache(os.path.join(folder_path, 'ktreff_cache')))
+
+aerofoil_file = os.path.join(folder_path, 'aerofoil.dat')
+aerofoil_polar = os.path.join(folder_path, 'aerofoil', 'aerofoil_polar.dat')
+naca_polar = os.path.join(folder_path, 'naca1510', 'naca1510_polar.dat')
+
+pipeline = Pipeline(folder_path, processes=4)
+pipeline.add(Stage('compare', compare, (folder_path,),
+                   dict(alpha=0.0, eps=0.06, beta=0.02, tau=0.15, n=150, output_naca=True),
+                   outputs=[aerofoil_file]))
+
+sweep_eps = dict(alpha=0.0, eps=[0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08], beta=0.02, tau=0.15, n=150)
+pipeline.add(Stage('sweep_eps', sweep, (folder_path,), sweep_eps, outputs=sweep_outputs(folder_path, **sweep_eps)))
+sweep_beta = dict(alpha=0.0, eps=0.06, beta=[0.01, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.08], tau=0.15, n=150)
+pipeline.add(Stage('sweep_beta', sweep, (folder_path,), sweep_beta, outputs=sweep_outputs(folder_path, **sweep_beta)))
+
+doublet_order = dict(alpha=3.0, eps=0.06, beta=0.02, tau=0.15, n_list=np.arange(10, 330, 10), dpan=True)
+pipeline.add(Stage('doublet_order', doublet, (folder_path,), doublet_order,
+                   outputs=order_outputs(folder_path, **doublet_order)))
+
+pipeline.add(Stage('xfoil_aerofoil', run_xfoil, (folder_path, 50000000, 0.0, -2.0, 30.0, 0.1, 1000),
+                   dict(aerofoil_filename='aerofoil.dat'),
+                   inputs=[aerofoil_file], outputs=[aerofoil_polar]))
+pipeline.add(Stage('xfoil_naca1510', run_xfoil, (folder_path, 50000000, 0.0, -2.0, 30.0, 0.1, 1000),
+                   dict(naca_4_name='1510'),
+                   outputs=[naca_polar]))
+
+pipeline.add(Stage('xfoil_post', xfoil_post, (folder_path, ['aerofoil', 'naca1510']),
+                   inputs=[aerofoil_polar, naca_polar],
+                   outputs=[os.path.join(folder_path, 'stall_angle.txt')]))
+
+pipeline.run()
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class AerofoilGeometry(object):
+    """
+    Object to represent the geometry of a batch of k aerofoils given as a stacked (k, n, 2) coordinate array.
+    Each closed contour is split at the leading edge (the point furthest from the trailing edge), both surfaces
+    are resampled onto a common cosine spaced chord grid and camber, thickness and their maxima are
+    evaluated for the whole batch at once. Results are computed on first access and then kept on the object.
+    """
+    def __init__(self, coords, m=201):
+        """
+        :param coords: array (k, n, 2) or (n, 2) of x, y coordinates starting and ending at the trailing edge.
+        :param m: number of points on the common chord grid.
+        """
+        coords = np.asarray(coords, dtype=float)
+        self.coords = coords[np.newaxis] if coords.ndim == 2 else coords
+        self.x = 0.5 * (1.0 - np.cos(np.linspace(0.0, np.pi, int(m))))
+        self._upper = None
+        self._lower = None
+        self._maxima = {}
+
+    @classmethod
+    def from_xy(cls, x, y, m=201):
+        """
+        :param x: array (k, n) of x coordinates, e.g. from a ktreff batch.
+        :param y: array (k, n) of y coordinates.
+        """
+        return cls(np.stack([np.atleast_2d(x), np.atleast_2d(y)], axis=-1), m)
+
+    def _resample(self):
+        k, n = self.coords.shape[:2]
+        x, y = self.coords[..., 0], self.coords[..., 1]
+        te = 0.5 * (self.coords[:, 0] + self.coords[:, -1])
+        le = np.argmax(np.hypot(x - te[:, [0]], y - te[:, [1]]), axis=1)[:, np.newaxis]
+        chord = te[:, [0]] - np.take_along_axis(x, le, axis=1)
+        x = (x - np.take_along_axis(x, le, axis=1)) / chord
+        y = y / chord
+
+        # Both branches run from the leading edge to the trailing edge, padded by repeating the trailing edge
+        steps = np.arange(n)[np.newaxis]
+        branches = []
+        for idx in (np.clip(le - steps, 0, n - 1), np.clip(le + steps, 0, n - 1)):
+            branch_x = np.maximum.accumulate(np.clip(np.take_along_axis(x, idx, axis=1), 0.0, 1.0), axis=1)
+            branches.append(batch_interp(self.x, branch_x, np.take_along_axis(y, idx, axis=1)))
+
+        first_upper = (branches[0].mean(axis=1) > branches[1].mean(axis=1))[:, np.newaxis]
+        self._upper = np.where(first_upper, branches[0], branches[1])
+        self._lower = np.where(first_upper, branches[1], branches[0])
+
+    @property
+    def upper(self):
+        """
+        Upper surface y on the chord grid, (k, m).
+        """
+        if self._upper is None:
+            self._resample()
+        return self._upper
+
+    @property
+    def lower(self):
+        """
+        Lower surface y on the chord grid, (k, m).
+        """
+        if self._lower is None:
+            self._resample()
+        return self._lower
+
+    @property
+    def camber(self):
+        return 0.5 * (self.upper + self.lower)
+
+    @property
+    def thickness(self):
+        return self.upper - self.lower
+
+    def _maximum(self, name, values):
+        if name not in self._maxima:
+            idx = np.argmax(values, axis=1)
+            self._maxima[name] = values[np.arange(len(idx)), idx], self.x[idx]
+        return self._maxima[name]
+
+    def get_max_camber(self):
+        """
+        :return: arrays of maximum camber and its chordwise location, one entry per aerofoil.
+        """
+        return self._maximum('camber', self.camber)
+
+    def get_max_thickness(self):
+        """
+        :return: arrays of maximum thickness and its chordwise location, one entry per aerofoil.
+        """
+        return self._maximum('thickness', self.thickness)
+
+    def get_naca_digits(self):
+        """
+        :return: integer arrays of the nearest NACA 4 digit camber, camber location and thickness.
+        """
+        max_camber, max_camber_x = self.get_max_camber()
+        return naca_digits(max_camber, max_camber_x, self.get_max_thickness()[0])
+
+
+def naca_digits(max_camber, max_camber_x, max_thickness):
+    """
+    Function to round maximum camber, its location and maximum thickness (fractions of chord) to NACA 4 digits.
+    :return: integer arrays of camber, camber location and thickness digits.
+    """
+    camber = np.round(np.asarray(max_camber) * 100).astype(int)
+    camber_x = np.where(camber > 0, np.round(np.asarray(max_camber_x) * 10), 0).astype(int)    # Symmetric sections
+    return camber, camber_x, np.round(np.asarray(max_thickness) * 100).astype(int)
+
+
+def batch_interp(x, xp, fp):
+    """
+    Function to linearly interpolate many rows at once, equivalent to np.interp applied row by row.
+    :param x: array (m,) or (k, m) of points to evaluate at.
+    :param xp: array (k, n) of non-decreasing sample points in [0, 1].
+    :param fp: array (k, n) of sample values.
+    :return: array (k, m).
+    """
+    k, n = xp.shape
+    x = np.broadcast_to(x, (k, np.shape(x)[-1]))
+    offset = 2.0 * np.arange(k)[:, np.newaxis]    # Shift each row so all rows can share one sorted search
+    idx = np.searchsorted((xp + offset).ravel(), (x + offset).ravel(), side='right').reshape(x.shape) - 1
+    idx = np.clip(idx - n * np.arange(k)[:, np.newaxis], 0, n - 2)
+    x_0, x_1 = np.take_along_axis(xp, idx, axis=1), np.take_along_axis(xp, idx + 1, axis=1)
+    f_0, f_1 = np.take_along_axis(fp, idx, axis=1), np.take_along_axis(fp, idx + 1, axis=1)
+    span = x_1 - x_0
+    weight = np.clip(np.where(span > 0.0, (x - x_0) / np.where(span > 0.0, span, 1.0), 0.0), 0.0, 1.0)
+    return f_0 + weight * (f_1 - f_0)
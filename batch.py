@@ -0,0 +1,183 @@
+"""
+Batch mode: run the cases of one or more JSON job files in a single process, so interpreter startup and imports are
+paid once rather than per case. A job file is a list of jobs, or {"defaults": {...}, "jobs": [...]} with defaults
+added to the kwargs of every job, and each job is
+    {"stage": "compare", "args": ["results"], "kwargs": {"eps": 0.06}, "name": "eps=0.06"}
+with stage one of STAGES or "<module>:<function>". Stage modules are imported by the first job that needs them and
+their heavy dependencies (pandas, scipy, matplotlib, MATLAB) only when first used, see lazy_import.
+Usage: python batch.py <job file> [<job file> ...] [--report <report.json>] [--stop-on-error]
+"""
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+
+from lazy_import import IMPORT_TIMES
+from tracing import span
+
+STARTED = time.time()
+
+STAGES = {
+    'compare': 'karman_vs_naca:compare_ktreff_naca',
+    'sweep': 'variable_sweep_ktreff:variable_sweep_ktreff',
+    'design_space_sweep': 'variable_sweep_ktreff:design_space_sweep',
+    'doublet_order': 'doublet_panel_order:dpan_order',
+    'xfoil': 'run_xfoil:run_xfoil',
+    'resume_xfoil': 'run_xfoil:resume_xfoil',
+    'xfoil_post': 'xfoil_post:xfoil_post',
+    'inverse_design': 'inverse_design:fit_sections',
+}
+
+Job = namedtuple('Job', ['name', 'stage', 'args', 'kwargs'])
+JobResult = namedtuple('JobResult', ['name', 'stage', 'status', 'seconds', 'import_seconds', 'error'])
+
+
+def read_jobs(file_path):
+    """
+    Function to read a job file.
+    :return: list of Job, named <file name>[<index>] unless the job gives a name.
+    """
+    with open(file_path) as job_file:
+        spec = json.load(job_file)
+    if isinstance(spec, list):
+        spec = {'jobs': spec}
+    defaults = spec.get('defaults', {})
+    jobs = []
+    for idx, job in enumerate(spec['jobs']):
+        unknown = set(job) - set(['stage', 'args', 'kwargs', 'name'])
+        if 'stage' not in job or unknown:
+            raise ValueError('Job {} of {} needs a stage and only args, kwargs and name, got {}'.format(
+                idx, file_path, sorted(job)))
+        kwargs = dict(defaults)
+        kwargs.update(job.get('kwargs', {}))
+        jobs.append(Job(job.get('name', '{}[{}]'.format(os.path.basename(file_path), idx)), job['stage'],
+                        list(job.get('args', [])), kwargs))
+    return jobs
+
+
+def resolve(stage):
+    """
+    Function to import the function of a stage.
+    :param stage: name in STAGES or <module>:<function>.
+    :return: function and seconds spent importing its module (0 if already imported).
+    """
+    target = STAGES.get(stage, stage)
+    if ':' not in target:
+        raise ValueError('Unknown stage {}, expected one of {} or <module>:<function>'.format(stage, sorted(STAGES)))
+    module_name, func_name = target.split(':', 1)
+    start = time.time()
+    loaded = module_name in sys.modules
+    with span('batch.import', module=module_name):
+        module = importlib.import_module(module_name)
+    return getattr(module, func_name), 0.0 if loaded else time.time() - start
+
+
+def run_batch(jobs, stop_on_error=False, verbose=True):
+    """
+    Function to run jobs one after the other in this process. A failed job is reported and the batch carries on,
+    unless stop_on_error.
+    :param jobs: list of Job.
+    :return: list of JobResult, one per job run.
+    """
+    results = []
+    for job in jobs:
+        start = time.time()
+        import_seconds = 0.0
+        try:
+            func, import_seconds = resolve(job.stage)
+            with span('batch.job', job=job.name, stage=job.stage):
+                func(*job.args, **job.kwargs)
+        except Exception as error:
+            if verbose:
+                sys.stderr.write('Job {} failed:\n{}'.format(job.name, traceback.format_exc()))
+            results.append(JobResult(job.name, job.stage, 'failed', time.time() - start, import_seconds, repr(error)))
+            if stop_on_error:
+                break
+            continue
+        results.append(JobResult(job.name, job.stage, 'ran', time.time() - start, import_seconds, None))
+    return results
+
+
+def process_start_time():
+    """
+    :return: time the process started (seconds since the epoch), None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/stat') as stat:
+            start_ticks = float(stat.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime:
+            seconds = float(uptime.read().split()[0])
+        return time.time() - seconds + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def startup_times(first_job=None):
+    """
+    :param first_job: time the first job started, defaults to now.
+    :return: dict of seconds from process start to this module being imported (interpreter, None if unknown) and to
+    the first job (startup).
+    """
+    first_job = first_job or time.time()
+    process_start = process_start_time()
+    interpreter = STARTED - process_start if process_start is not None else None
+    return {'interpreter': interpreter,
+            'startup': first_job - (process_start if process_start is not None else STARTED)}
+
+
+def summary(startup, results):
+    """
+    :return: table of startup, deferred imports and the status and wall time of each job.
+    """
+    lines = ['startup {:.3f} s{}'.format(startup['startup'], '' if startup['interpreter'] is None else
+                                         ' (interpreter {:.3f} s)'.format(startup['interpreter']))]
+    for name, seconds in sorted(IMPORT_TIMES.items()):
+        lines.append('import {:<40} {:>10.3f}'.format(name, seconds))
+    lines.append('{:<30} {:<20} {:>8} {:>10} {:>10}'.format('job', 'stage', 'status', 'seconds', 'import'))
+    for result in results:
+        lines.append('{:<30} {:<20} {:>8} {:>10.2f} {:>10.2f}'.format(result.name, result.stage, result.status,
+                                                                      result.seconds, result.import_seconds))
+    lines.append('{:<30} {:<20} {:>8} {:>10.2f}'.format('total', '', '{}/{}'.format(
+        sum(result.status == 'ran' for result in results), len(results)), sum(result.seconds for result in results)))
+    return '\n'.join(lines)
+
+
+def write_report(report_path, startup, results):
+    """
+    Function to write the startup time, deferred import times and job results as JSON.
+    """
+    with open(report_path, 'w') as report:
+        json.dump({'startup': startup, 'imports': IMPORT_TIMES, 'jobs': [result._asdict() for result in results]},
+                  report, indent=1, sort_keys=True)
+
+
+def main(argv):
+    """
+    :return: exit status, 1 if any job failed.
+    """
+    argv = list(argv)
+    report_path = None
+    if '--report' in argv:
+        idx = argv.index('--report')
+        report_path = argv[idx + 1]
+        del argv[idx:idx + 2]
+    stop_on_error = '--stop-on-error' in argv
+    file_paths = [arg for arg in argv if arg != '--stop-on-error']
+    if not file_paths:
+        sys.stderr.write(__doc__)
+        return 2
+
+    jobs = [job for file_path in file_paths for job in read_jobs(file_path)]
+    startup = startup_times()
+    results = run_batch(jobs, stop_on_error)
+    print(summary(startup, results))
+    if report_path is not None:
+        write_report(report_path, startup, results)
+    return int(any(result.status == 'failed' for result in results))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
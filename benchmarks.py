@@ -0,0 +1,251 @@
+"""
+Offline benchmarks of the main code paths at several problem sizes.
+MATLAB, Xfoil and airfoiltools.com are replaced by the deterministic stand-ins fake_matlab.py, fake_xfoil.py and a
+local copy of the airfoiltools page, so results only depend on this code and the machine. The MATLAB backend case
+(matlab_marshalling) therefore only measures the cost of passing arrays through the engine interface, fake_matlab
+evaluates the NumPy ktreff.
+Benchmarks needing an optional dependency that is not installed fail the run unless --allow-skip is given.
+Usage: python benchmarks.py <output.json> [small|medium|large ...] [--allow-skip]
+"""
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import naca_aerofoil
+from doublet_panel_order import dpan_order
+from fake_matlab import start_matlab
+from fake_xfoil import FakeXFoil
+from ktreff_aerofoil import KarmanTrefftzAerofoil
+from matlab_pool import MatlabEnginePool
+from naca_aerofoil import Naca4DigitAerofoil, naca4
+from result_writer import BACKENDS, ResultWriter
+from variable_sweep_ktreff import design_space_sweep, variable_sweep_ktreff
+from xfoil_post import XFoilPost
+
+SIZES = {
+    'small': {'n': 150, 'n_list': [20, 40, 80], 'sweep': 4, 'files': 10, 'tables': 20},
+    'medium': {'n': 600, 'n_list': [40, 80, 160, 320], 'sweep': 16, 'files': 50, 'tables': 200},
+    'large': {'n': 2400, 'n_list': [80, 160, 320, 640, 1280], 'sweep': 64, 'files': 200, 'tables': 1000},
+}
+AEROFOIL = {'alpha': 3.0, 'eps': 0.06, 'beta': 0.02, 'tau': 0.15}
+
+
+@contextlib.contextmanager
+def scratch_folder():
+    """
+    Context manager yielding an empty temporary folder, also made the working directory.
+    """
+    folder_path = tempfile.mkdtemp(prefix='ktreff_bench_')
+    cwd = os.getcwd()
+    os.chdir(folder_path)
+    try:
+        yield folder_path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(folder_path, ignore_errors=True)
+
+
+def bench_ktreff_geometry(size, backend):
+    """
+    With backend 'matlab' the fake engine runs the NumPy ktreff, so the difference from backend 'numpy' is the
+    marshalling overhead of the MATLAB backend, not MATLAB's own speed.
+    """
+    engines = MatlabEnginePool(1, start=start_matlab)
+
+    def run(folder_path):
+        aerofoil = KarmanTrefftzAerofoil(n=size['n'], backend=backend, pool=engines, cache=False, **AEROFOIL)
+        aerofoil()
+        aerofoil.get_max_camber()
+        aerofoil.get_max_thickness()
+        aerofoil.get_naca_digits()
+    return run
+
+
+def bench_dpan_order(size):
+    def run(folder_path):
+        dpan_order(folder_path, n_list=list(size['n_list']), dpan=True, backend='numpy', cache=False, **AEROFOIL)
+    return run
+
+
+def bench_variable_sweep(size):
+    def run(folder_path):
+        eps = np.linspace(0.01, 0.08, size['sweep']).round(4).tolist()
+        variable_sweep_ktreff(folder_path, alpha=0.0, eps=eps, beta=0.02, tau=0.15, n=size['n'], backend='numpy',
+                              cache=False)
+    return run
+
+
+def bench_design_space_sweep(size):
+    def run(folder_path):
+        design_space_sweep(folder_path, mode='lhs', samples=size['sweep'], alpha=0.0, eps=[0.01, 0.08],
+                           beta=[0.0, 0.05], tau=0.15, n=size['n'], backend='numpy', cache=False)
+    return run
+
+
+def write_xfoil_folder(folder_path, name, naca_4_name, files):
+    """
+    Function to write the polar and cp/bl files of one aerofoil as Xfoil would, using the fake Xfoil models.
+    """
+    output_folder = os.path.join(folder_path, name)
+    os.mkdir(output_folder)
+    with open(os.devnull, 'w') as null:
+        xfoil = FakeXFoil(null)
+        xfoil.command('naca {}'.format(naca_4_name))
+        xfoil.command('visc 5000000')
+        xfoil.command('pacc')
+        xfoil.command(os.path.join(output_folder, '{}_polar.dat'.format(name)))
+        xfoil.command('')
+        for alpha in np.arange(-2.0, 30.0, 0.1).round(1):
+            xfoil.command('alfa {}'.format(alpha))
+        for alpha in np.linspace(-2.0, 28.0, files).round(1):
+            xfoil.command('alfa {}'.format(alpha))
+            xfoil.command('dump {}'.format(os.path.join(output_folder, '{}_alpha={}.bl'.format(name, alpha))))
+            xfoil.command('cpwr {}'.format(os.path.join(output_folder, '{}_alpha={}.cp'.format(name, alpha))))
+        xfoil.polar_file.close()
+
+
+def bench_xfoil_post(size):
+    """
+    First run parses the text files and renders every figure, the second reuses sidecars and skips figures.
+    """
+    def run(folder_path):
+        names = ['aerofoil', 'naca1510']
+        for name, naca_4_name in zip(names, ['0012', '1510']):
+            write_xfoil_folder(folder_path, name, naca_4_name, size['files'])
+        start = time.time()
+        XFoilPost(folder_path, names, alphas=None)()
+        cold = time.time() - start
+        XFoilPost(folder_path, names, alphas=None)()
+        return {'cold': cold, 'warm': time.time() - start - cold}
+    return run
+
+
+def bench_result_writer(size, backend):
+    tables = [pd.DataFrame(np.random.RandomState(idx).rand(200, 8), columns=list('abcdefgh'))
+              for idx in range(size['tables'])]
+
+    def run(folder_path):
+        with ResultWriter(os.path.join(folder_path, 'tables'), backend=backend) as writer:
+            for idx, table in enumerate(tables):
+                writer.write('table{}'.format(idx), table)
+    return run
+
+
+def bench_naca(size, source):
+    def run(folder_path):
+        naca_aerofoil._sections.clear()
+        aerofoil = Naca4DigitAerofoil(2, 4, 12, size['n'], source=source)
+        if source == 'airfoiltools':
+            aerofoil.url = 'file://' + write_airfoiltools_page(folder_path, aerofoil)
+        aerofoil()
+    return run
+
+
+def write_airfoiltools_page(folder_path, aerofoil):
+    """
+    Function to write a local copy of the airfoiltools.com page for aerofoil.
+    :return: path of the page.
+    """
+    data = naca4(aerofoil.camber, aerofoil.camber_x, aerofoil.thickness, aerofoil.n)
+    rows = '\n'.join('{:9.6f} {:9.6f}'.format(x, y) for x, y in data)
+    path = os.path.join(folder_path, 'naca{}.html'.format(aerofoil.get_name()))
+    with open(path, 'w') as page:
+        page.write('<html><body><pre>{}\n{}\n{}\n</pre></body></html>'.format(aerofoil.get_name(), aerofoil.n, rows))
+    return path
+
+
+def benchmarks(size):
+    """
+    :return: list of (name, params, function of a scratch folder) to time at size.
+    """
+    cases = [('ktreff_geometry', {'n': size['n'], 'backend': 'numpy'}, bench_ktreff_geometry(size, 'numpy')),
+             ('matlab_marshalling', {'n': size['n'], 'backend': 'matlab', 'engine': 'fake_matlab'},
+              bench_ktreff_geometry(size, 'matlab'))]
+    cases += [('dpan_order', {'n_list': size['n_list']}, bench_dpan_order(size)),
+              ('variable_sweep', {'n': size['n'], 'sweep': size['sweep']}, bench_variable_sweep(size)),
+              ('design_space_sweep', {'n': size['n'], 'samples': size['sweep']}, bench_design_space_sweep(size)),
+              ('xfoil_post', {'files': size['files']}, bench_xfoil_post(size))]
+    cases += [('result_writer', {'tables': size['tables'], 'backend': backend}, bench_result_writer(size, backend))
+              for backend in sorted(BACKENDS)]
+    cases += [('naca', {'n': size['n'], 'source': source}, bench_naca(size, source))
+              for source in ('local', 'airfoiltools')]
+    return cases
+
+
+def run_benchmarks(output_path, sizes=('small',), repeat=3):
+    """
+    Function to time every benchmark at each size and write the results to a JSON file.
+    Benchmarks needing an optional dependency that is not installed are recorded as skipped and listed under
+    'skipped' in the report.
+    :return: dict written.
+    """
+    results = []
+    for size_name in sizes:
+        for name, params, func in benchmarks(SIZES[size_name]):
+            record = {'name': name, 'size': size_name, 'params': params}
+            try:
+                times, details = [], []
+                for idx in range(repeat):
+                    with scratch_folder() as folder_path:
+                        start = time.time()
+                        details.append(func(folder_path))
+                        times.append(time.time() - start)
+                record.update(times=times, best=min(times), mean=float(np.mean(times)))
+                if details[0] is not None:
+                    record['details'] = details
+            except ImportError as error:
+                record['skipped'] = str(error)
+            results.append(record)
+            outcome = 'SKIPPED ' + record['skipped'] if 'skipped' in record else '{:.4f} s'.format(record['best'])
+            print('{:<20} {:<8} {:<45} {}'.format(name, size_name, json.dumps(params, sort_keys=True), outcome))
+
+    skipped = ['{} {} {}: {}'.format(record['name'], record['size'], json.dumps(record['params'], sort_keys=True),
+                                     record['skipped']) for record in results if 'skipped' in record]
+    report = {'meta': _meta(), 'results': results, 'skipped': skipped}
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    return report
+
+
+def main(argv):
+    """
+    :return: exit status, 1 if a benchmark was skipped without --allow-skip.
+    """
+    argv = list(argv)
+    allow_skip = '--allow-skip' in argv
+    argv = [arg for arg in argv if arg != '--allow-skip']
+    if not argv:
+        sys.stderr.write(__doc__)
+        return 2
+
+    report = run_benchmarks(argv[0], argv[1:] or ['small'])
+    if report['skipped']:
+        sys.stderr.write('\n{} benchmark(s) SKIPPED, their timings are missing from {}:\n{}\n'.format(
+            len(report['skipped']), argv[0], '\n'.join('  ' + line for line in report['skipped'])))
+        if not allow_skip:
+            sys.stderr.write('Install the missing dependencies or pass --allow-skip.\n')
+            return 1
+    return 0
+
+
+def _meta():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                           cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': revision, 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'platform': platform.platform()}
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
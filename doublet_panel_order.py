@@ -1,54 +1,171 @@
+import multiprocessing
 import os
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-from scipy.stats import linregress
 
-from ktreff_aerofoil import KarmanTrefftzAerofoil
+from ktreff_aerofoil import KarmanTrefftzAerofoil, evaluate_aerofoils
+from lazy_import import lazy_module
+from matlab_pool import init_worker
+from plot_render import LinePlot, PlotRenderer
+from result_writer import BACKENDS, ResultWriter, get_default_backend
+from tracing import traced
 
+pd = lazy_module('pandas')
+stats = lazy_module('scipy.stats')
 
+
+ORDER_COLUMNS = ['alpha', 'eps', 'beta', 'tau', 'n',
+                 'cl', 'dpan_cl', 'error',
+                 'log_n', 'log_error']
+
+
+@traced('dpan_order')
 def dpan_order(folder_path, **kwargs):
     """
     Function to identify order of accuracy of doublet panel method.
+    Optional arguments:
+    processes - evaluate panel counts concurrently in a pool of this many worker processes.
+    adaptive - choose panel counts from the error estimate, starting at n_list[0], until the fitted order settles.
+    tol - relative change in fitted order treated as settled (adaptive only).
+    n_max - largest panel count (adaptive only), defaults to the last entry of n_list.
     """
     n_list = kwargs['n_list'].split(' ') if type(kwargs['n_list']) is str else kwargs['n_list']
     kwargs.pop('n_list')
+    processes = int(kwargs.pop('processes', 0) or 0)
+    adaptive = kwargs.pop('adaptive', False)
+    tol = float(kwargs.pop('tol', 0.02))
+    n_max = int(kwargs.pop('n_max', n_list[-1]))
+
+    if adaptive:
+        rows, names, order, richardson_cl = _adaptive_order(kwargs, int(n_list[0]), n_max, tol, processes)
+    else:
+        rows, names = _evaluate_cases([dict(kwargs, n=n) for n in n_list], processes)
+    table = pd.DataFrame(rows, columns=ORDER_COLUMNS)
+
+    label = 'n={}'.format(table['n'][0])
+    title = _title(names[0], label)
+    writer = ResultWriter(os.path.join(folder_path, '{}_order'.format(title)))
+    if adaptive:
+        writer.write('richardson', pd.DataFrame([[order, richardson_cl, table['cl'].iloc[-1]]],
+                                                columns=['order', 'richardson_cl', 'cl']))
 
-    table = pd.DataFrame(columns=['alpha', 'eps', 'beta', 'tau', 'n',
-                                  'cl', 'dpan_cl', 'error',
-                                  'log_n', 'log_error'],
-                         index=[i for i in range(len(n_list))])
-
-    for idx, n in enumerate(n_list):
-        kwargs['n'] = n
-        aerofoil = KarmanTrefftzAerofoil(**kwargs)
-        aerofoil()
-        label = 'n={}'.format(n)
-        if idx == 0:
-            title = ''.join([elem.strip(',') for elem in aerofoil.get_name().split(label)])
-            writer = pd.ExcelWriter(os.path.join(folder_path, '{}_order.xlsx'.format(title)))
-        error = aerofoil.dpan_cl - aerofoil.Cl
-        table.loc[idx] = [aerofoil.alpha, aerofoil.eps, aerofoil.beta, aerofoil.tau, aerofoil.n,
-                          aerofoil.Cl, aerofoil.dpan_cl, error,
-                          np.log(int(n)), np.log(error)]
-
-    table.to_excel(writer, 'Cl_error')
+    writer.write('Cl_error', table)
+    writer.close()
     log_n = table['log_n'].values.tolist()
     log_error = table['log_error'].values.tolist()
-    slope, intercept, r_value, p_value, std_err = linregress(log_n, log_error)
-
-    plt.plot(log_n, log_error, 'k-')
-    plt.title(title)
-    plt.xlabel('log n')
-    plt.ylabel('log Cl error')
-    plt.annotate('y={}x+{}'.format(slope, intercept),
-                 xy=(1, 1),
-                 xytext=(0.5, 0.8),
-                 xycoords='axes fraction',
-                 textcoords='axes fraction')
-    plt.savefig('{}_order.png'.format(title))
+    slope, intercept = _fit(log_n, log_error)
+
+    renderer = PlotRenderer(processes=1)
+    plot = renderer.add(LinePlot(os.path.join(folder_path, '{}_order.png'.format(title)), title, 'log n', 'log Cl error'))
+    plot.line(log_n, log_error, 'k-')
+    plot.annotate('y={}x+{}'.format(slope, intercept),
+                  xy=(1, 1),
+                  xytext=(0.5, 0.8),
+                  xycoords='axes fraction',
+                  textcoords='axes fraction')
+    renderer.render()
+    return table
+
+
+def order_outputs(folder_path, **kwargs):
+    """
+    :return: paths of the files dpan_order writes for the same arguments, e.g. to declare as pipeline stage outputs.
+    """
+    n_list = kwargs['n_list'].split(' ') if type(kwargs['n_list']) is str else kwargs['n_list']
+    n = int(n_list[0])
+    title = _title(KarmanTrefftzAerofoil(**dict(kwargs, n=n)).get_name(), 'n={}'.format(n))
+    return [os.path.join(folder_path, '{}_order{}'.format(title, BACKENDS[get_default_backend()].extension)),
+            os.path.join(folder_path, '{}_order.png'.format(title))]
+
+
+def _title(name, label):
+    """
+    :return: aerofoil name without the varied parameter, naming the output files.
+    """
+    return ''.join([elem.strip(',') for elem in name.split(label)])
+
+
+def _order_row(aerofoil):
+    error = aerofoil.dpan_cl - aerofoil.Cl
+    return [aerofoil.alpha, aerofoil.eps, aerofoil.beta, aerofoil.tau, aerofoil.n,
+            aerofoil.Cl, aerofoil.dpan_cl, error,
+            np.log(aerofoil.n), np.log(abs(error)) if error else np.nan]
+
+
+def _dpan_case(kwargs):
+    """
+    Function to evaluate a single panel count in a worker process.
+    """
+    aerofoil = KarmanTrefftzAerofoil(**kwargs)
+    aerofoil()
+    return _order_row(aerofoil), aerofoil.get_name()
+
+
+def _evaluate_cases(cases, processes):
+    """
+    Function to evaluate a list of aerofoil kwargs, in worker processes if processes is set.
+    :return: list of order table rows and list of aerofoil names.
+    """
+    if processes and len(cases) > 1:
+        pool = multiprocessing.Pool(min(processes, len(cases)), initializer=init_worker)
+        try:
+            results = pool.map(_dpan_case, cases)
+        finally:
+            pool.close()
+            pool.join()
+        return [row for row, name in results], [name for row, name in results]
+
+    aerofoils = evaluate_aerofoils([KarmanTrefftzAerofoil(**case) for case in cases])
+    return [_order_row(aerofoil) for aerofoil in aerofoils], [aerofoil.get_name() for aerofoil in aerofoils]
+
+
+def _fit(log_n, log_error):
+    """
+    Function to fit log error against log n by least squares, leaving out panel counts with zero error.
+    :return: slope and intercept, NaN with fewer than two usable points.
+    """
+    log_n, log_error = np.asarray(log_n, dtype=float), np.asarray(log_error, dtype=float)
+    finite = np.isfinite(log_error)
+    if finite.sum() < 2:
+        return np.nan, np.nan
+    slope, intercept, r_value, p_value, std_err = stats.linregress(log_n[finite], log_error[finite])
+    return slope, intercept
+
+
+def _fitted_order(rows):
+    return -_fit([row[8] for row in rows], [row[9] for row in rows])[0]
+
+
+def _adaptive_order(kwargs, n_start, n_max, tol, processes, reduction=4.0):
+    """
+    Function to refine the panel count until the fitted order of accuracy (the least squares slope of log error
+    against log n over every panel count so far, as reported by dpan_order) settles.
+    Each new n is chosen so the current order predicts the error falls by the reduction factor.
+    :return: order table rows, aerofoil names, fitted order and Richardson extrapolated Cl (NaN unless the order is
+    positive).
+    """
+    n_start += n_start % 2      # Lower/upper surfaces are split at n/2
+    rows, names = _evaluate_cases([dict(kwargs, n=n_start * 2 ** i) for i in range(3)], processes)
+    orders = [_fitted_order(rows[:2]), _fitted_order(rows)]
+
+    while not (np.isfinite(orders[-2]) and np.isfinite(orders[-1]) and
+               abs(orders[-1] - orders[-2]) <= tol * abs(orders[-1])):
+        order = orders[-1] if np.isfinite(orders[-1]) and orders[-1] > 0.0 else 1.0
+        ratio = np.clip(reduction ** (1.0 / order), 1.25, 4.0)
+        n = 2 * int(round(rows[-1][4] * ratio / 2.0))
+        if n > n_max:
+            break
+        new_rows, new_names = _evaluate_cases([dict(kwargs, n=n)], processes)
+        rows += new_rows
+        names += new_names
+        orders.append(_fitted_order(rows))
+
+    ratio = float(rows[-1][4]) / rows[-2][4]
+    richardson_cl = np.nan
+    if np.isfinite(orders[-1]) and orders[-1] > 0.0:
+        richardson_cl = rows[-1][6] + (rows[-1][6] - rows[-2][6]) / (ratio ** orders[-1] - 1.0)
+    return rows, names, orders[-1], richardson_cl
 
 
 if __name__ == '__main__':
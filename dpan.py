@@ -0,0 +1,104 @@
+import numpy as np
+
+from lazy_import import lazy_module
+
+linalg = lazy_module('scipy.linalg')
+
+
+class DoubletPanelSolver(object):
+    """
+    Object to represent a constant strength doublet panel method (Dirichlet formulation) for a closed aerofoil.
+    The influence matrix depends only on the geometry so it is built and LU factorised once,
+    then any number of incidences are solved by back substitution.
+    """
+    def __init__(self, x, y):
+        """
+        :param x: x coordinates of the panel end points, starting at the trailing edge along the lower surface.
+        :param y: y coordinates of the panel end points, the first and last points are the trailing edge.
+        """
+        self._init_geometry(x, y)
+        self.lu = linalg.lu_factor(self._calc_influence())
+
+    def _init_geometry(self, x, y):
+        self.nodes = np.asarray(x, dtype=float) + 1j * np.asarray(y, dtype=float)
+        self.n = len(self.nodes) - 1
+        self.colloc = 0.5 * (self.nodes[:-1] + self.nodes[1:])
+        self.chord = np.max(self.nodes.real) - np.min(self.nodes.real)
+        self.arc_length = self._calc_arc_length()
+
+    def _calc_arc_length(self):
+        panel_length = np.abs(np.diff(self.nodes))
+        return np.concatenate(([0.5 * panel_length[0]], 0.5 * (panel_length[:-1] + panel_length[1:]))).cumsum()
+
+    def _calc_influence(self):
+        """
+        Function to build the influence matrix with the Kutta condition folded into the first and last columns.
+        """
+        target = self.colloc[:, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            influence = -np.angle((target - self.nodes[np.newaxis, 1:]) /
+                                  (target - self.nodes[np.newaxis, :-1])) / (2.0 * np.pi)
+        np.fill_diagonal(influence, 0.5)
+
+        # Semi-infinite wake along the x axis with strength mu_n - mu_1
+        wake = self.wake_influence(self.colloc)
+        influence[:, -1] += wake
+        influence[:, 0] -= wake
+        return influence
+
+    def wake_influence(self, target):
+        """
+        Function to evaluate the potential induced at target by a unit strength wake doublet.
+        """
+        te = self.nodes[0]
+        return (np.angle(target - te) - np.pi * np.sign(target.imag - te.imag)) / (2.0 * np.pi)
+
+    def rhs(self, alpha):
+        """
+        :param alpha: array of angles of incidence (radians).
+        :return: right hand sides (n, len(alpha)) cancelling the free stream potential inside the aerofoil.
+        """
+        alpha = np.atleast_1d(alpha)
+        return -(self.colloc.real[:, np.newaxis] * np.cos(alpha) + self.colloc.imag[:, np.newaxis] * np.sin(alpha))
+
+    def solve_strengths(self, alpha):
+        """
+        :param alpha: array of angles of incidence (radians).
+        :return: doublet strengths (n, len(alpha)), one column per incidence.
+        """
+        return linalg.lu_solve(self.lu, self.rhs(alpha))
+
+    def __call__(self, alpha):
+        """
+        :param alpha: angle or array of angles of incidence (radians).
+        :return: Cp at the collocation points and Cl, with a leading dimension per incidence if alpha is an array.
+        """
+        mu = self.solve_strengths(alpha)
+        cp, cl = self.surface_data(mu)
+        if np.ndim(alpha):
+            return cp, cl
+        return cp[0], float(cl[0])
+
+    def surface_data(self, mu):
+        """
+        Function to convert doublet strengths to pressure and lift coefficients.
+        The total potential outside the aerofoil is -mu, so the surface velocity is its arc length derivative.
+        """
+        velocity = np.gradient(mu, self.arc_length, axis=0)
+        cp = 1.0 - velocity.T ** 2
+        cl = 2.0 * (mu[0] - mu[-1]) / self.chord
+        return cp, cl
+
+
+def dpan(n, alpha, x, y):
+    """
+    NumPy transcription of the MATLAB dpan function.
+    :param n: number of panels.
+    :param alpha: angle or array of angles of incidence (radians).
+    :param x: x coordinates of the n + 1 panel end points.
+    :param y: y coordinates of the n + 1 panel end points.
+    :return: Cp at the panel mid points and Cl.
+    """
+    x = np.asarray(x, dtype=float)[:int(n) + 1]
+    y = np.asarray(y, dtype=float)[:int(n) + 1]
+    return DoubletPanelSolver(x, y)(alpha)
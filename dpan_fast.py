@@ -0,0 +1,188 @@
+import sys
+import time
+
+import numpy as np
+
+from dpan import DoubletPanelSolver
+from ktreff import ktreff
+from lazy_import import lazy_module
+
+sparse = lazy_module('scipy.sparse')
+sparse_linalg = lazy_module('scipy.sparse.linalg')
+
+
+class FastDoubletPanelSolver(DoubletPanelSolver):
+    """
+    Object to represent the doublet panel method solved by GMRES without forming the influence matrix.
+    Influence sums use a treecode over contiguous runs of panels: clusters far from a collocation point
+    are summed through a multipole expansion of the panel potential, near panels directly, giving
+    O(n log n) work per product and O(n) storage. The number of multipole terms grows with n so the far field error
+    stays well below the O(1 / n^2) discretisation error of the panel method, see far_field_order.
+    """
+    def __init__(self, x, y, leaf_size=32, theta=0.5, order=None, tol=1e-12):
+        """
+        :param leaf_size: maximum number of panels in a leaf cluster.
+        :param theta: cluster radius to distance ratio below which the multipole expansion is used.
+        :param order: number of multipole terms, defaults to far_field_order(n, theta).
+        :param tol: GMRES relative residual tolerance.
+        """
+        self._init_geometry(x, y)
+        self.order = int(order) if order is not None else far_field_order(self.n, theta)
+        self.tol = tol
+        self.levels = max(int(np.ceil(np.log2(float(self.n) / leaf_size))), 0)
+        self._build_tree()
+        self._build_interactions(theta)
+        self.wake = self.wake_influence(self.colloc)
+        self.operator = sparse_linalg.LinearOperator((self.n, self.n), matvec=self.matvec, dtype=float)
+        self.preconditioner = self._build_preconditioner()
+        self.iterations = 0
+        self._basis = None
+
+    def _build_tree(self):
+        """
+        Function to bisect the panel index range into clusters, storing bounds, centres and radii per level.
+        """
+        self.bounds, self.centres, self.radii = [], [], []
+        z1, z2 = self.nodes[:-1], self.nodes[1:]
+        for level in range(self.levels + 1):
+            bounds = (self.n * np.arange(2 ** level + 1)) // 2 ** level
+            counts = np.diff(bounds)
+            centres = np.add.reduceat(self.colloc, bounds[:-1]) / counts
+            panel_centres = np.repeat(centres, counts)
+            radii = np.maximum.reduceat(np.maximum(np.abs(z1 - panel_centres), np.abs(z2 - panel_centres)),
+                                        bounds[:-1])
+            self.bounds.append(bounds)
+            self.centres.append(centres)
+            self.radii.append(radii)
+
+    def _build_interactions(self, theta):
+        """
+        Function to traverse the tree once for every collocation point, recording far field (target, cluster)
+        pairs per level and assembling the near field as a sparse matrix.
+        """
+        self.far = []
+        targets = np.arange(self.n)
+        clusters = np.zeros(self.n, dtype=int)
+        near_targets, near_clusters = [], []
+        for level in range(self.levels + 1):
+            distance = np.abs(self.colloc[targets] - self.centres[level][clusters])
+            accept = self.radii[level][clusters] < theta * distance
+            self.far.append((targets[accept], clusters[accept]))
+            targets, clusters = targets[~accept], clusters[~accept]
+            if level == self.levels:
+                near_targets, near_clusters = targets, clusters
+            else:
+                targets = np.repeat(targets, 2)
+                clusters = (2 * np.repeat(clusters, 2) + np.tile([0, 1], len(clusters)))
+
+        # Expand each near (target, leaf) pair into (target, panel) entries
+        bounds = self.bounds[-1]
+        counts = np.diff(bounds)[near_clusters]
+        rows = np.repeat(near_targets, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cols = np.repeat(bounds[near_clusters], counts) + offsets
+        target = self.colloc[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = -np.angle((target - self.nodes[cols + 1]) / (target - self.nodes[cols])) / (2.0 * np.pi)
+        values[rows == cols] = 0.5
+        self.near = sparse.csr_matrix((values, (rows, cols)), shape=(self.n, self.n))
+
+    def _build_preconditioner(self):
+        """
+        Function to build an incomplete LU preconditioner from the near field and wake (Kutta) terms.
+        """
+        rows = np.tile(np.arange(self.n), 2)
+        cols = np.repeat([self.n - 1, 0], self.n)
+        kutta = sparse.csr_matrix((np.concatenate([self.wake, -self.wake]), (rows, cols)), shape=(self.n, self.n))
+        ilu = sparse_linalg.spilu((self.near + kutta).tocsc(), drop_tol=1e-5, fill_factor=20)
+        return sparse_linalg.LinearOperator((self.n, self.n), matvec=ilu.solve, dtype=float)
+
+    def matvec(self, mu):
+        """
+        Function to evaluate the influence matrix product with mu without forming the matrix.
+        """
+        mu = np.ravel(mu)
+        result = self.near.dot(mu) + self.wake * (mu[-1] - mu[0])
+        z1, z2 = self.nodes[:-1], self.nodes[1:]
+        for level, (targets, clusters) in enumerate(self.far):
+            if not len(targets):
+                continue
+            bounds = self.bounds[level]
+            panel_centres = np.repeat(self.centres[level], np.diff(bounds))
+            u1, u2 = z1 - panel_centres, z2 - panel_centres
+            p1, p2 = np.ones_like(u1), np.ones_like(u2)
+            coefficients = []
+            for k in range(1, self.order + 1):
+                p1, p2 = p1 * u1, p2 * u2
+                coefficients.append(np.add.reduceat(mu * (p2 - p1), bounds[:-1]) / k)
+
+            # Horner evaluation of sum_k a_k / (z - c)^k for every accepted pair
+            w = 1.0 / (self.colloc[targets] - self.centres[level][clusters])
+            series = np.zeros(len(targets), dtype=complex)
+            for coefficient in coefficients[::-1]:
+                series = (series + coefficient[clusters]) * w
+            result += np.bincount(targets, weights=series.imag, minlength=self.n) / (2.0 * np.pi)
+        return result
+
+    def _solve(self, rhs):
+        self.iterations = 0
+
+        def count(residual):
+            self.iterations += 1
+
+        try:
+            mu, info = sparse_linalg.gmres(self.operator, rhs, rtol=self.tol, atol=0.0, restart=50, maxiter=200,
+                                           M=self.preconditioner, callback=count, callback_type='pr_norm')
+        except TypeError:   # SciPy < 1.12
+            mu, info = sparse_linalg.gmres(self.operator, rhs, tol=self.tol, restart=50, maxiter=200,
+                                           M=self.preconditioner, callback=count)
+        if info:
+            raise RuntimeError('GMRES did not converge ({} iterations)'.format(self.iterations))
+        return mu
+
+    def solve_strengths(self, alpha):
+        """
+        The right hand side is linear in (cos(alpha), sin(alpha)), so two GMRES solves cover every incidence.
+        """
+        if self._basis is None:
+            basis = self.rhs([0.0, 0.5 * np.pi])
+            self._basis = np.column_stack([self._solve(basis[:, 0]), self._solve(basis[:, 1])])
+        alpha = np.atleast_1d(alpha)
+        return self._basis.dot(np.vstack([np.cos(alpha), np.sin(alpha)]))
+
+
+def far_field_order(n, theta, margin=1e-3):
+    """
+    Function to choose the number of multipole terms for n panels. The truncation error of a far field sum is
+    bounded by theta^(order + 1) relative to the sum, kept below margin / n^2.
+    :return: number of multipole terms, at least 20.
+    """
+    return max(int(np.ceil(np.log(margin / float(n) ** 2) / np.log(theta))) - 1, 20)
+
+
+def benchmark(n_list, alpha=3.0, eps=0.06, beta=0.02, tau=0.15, dense_limit=8000):
+    """
+    Function to time the dense and fast doublet solvers on Karman-Trefftz aerofoils of increasing panel count.
+    :param dense_limit: largest panel count attempted with the dense solver.
+    :return: list of (n, dense time, fast time, dense Cl, fast Cl, GMRES iterations).
+    """
+    results = []
+    for n in n_list:
+        x, y, cp, cl = ktreff(np.radians(alpha), eps, beta, tau, int(n))
+        dense_time, dense_cl = np.nan, np.nan
+        if n <= dense_limit:
+            start = time.time()
+            dense_cl = DoubletPanelSolver(x, y)(np.radians(alpha))[1]
+            dense_time = time.time() - start
+        start = time.time()
+        solver = FastDoubletPanelSolver(x, y)
+        fast_cl = solver(np.radians(alpha))[1]
+        fast_time = time.time() - start
+        results.append((int(n), dense_time, fast_time, dense_cl, fast_cl, solver.iterations))
+        print('n={:>7d}  dense {:8.3f}s  fast {:8.3f}s  dense Cl {:.10f}  fast Cl {:.10f}  '
+              'GMRES iterations {}'.format(*results[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    benchmark([int(n) for n in sys.argv[1:]] or [500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000])
@@ -0,0 +1,32 @@
+"""
+Deterministic stand-in for a MATLAB engine running ktreff.m and dpan.m, used to run and benchmark the 'matlab'
+backend without MATLAB, e.g. MatlabEnginePool(size, start=start_matlab).
+Arrays are returned as nested lists (1, n) like matlab.double row vectors.
+"""
+from dpan import dpan
+from ktreff import ktreff
+
+
+class FakeMatlabEngine(object):
+    """
+    Object to represent a MATLAB engine session with the ktreff and dpan functions on its path.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def ktreff(self, alpha, eps, beta, tau, n, nargout=4):
+        self.calls += 1
+        x, y, cp, cl = ktreff(alpha, eps, beta, tau, int(n))
+        return [x.tolist()], [y.tolist()], [cp.tolist()], float(cl)
+
+    def dpan(self, n, alpha, x, y, nargout=2):
+        self.calls += 1
+        cp, cl = dpan(n, alpha, x, y)
+        return [cp.tolist()], float(cl)
+
+    def quit(self):
+        pass
+
+
+def start_matlab():
+    return FakeMatlabEngine()
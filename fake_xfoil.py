@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Deterministic stand-in for the XFOIL binary, used to run and benchmark the XFOIL tooling without XFOIL.
+Reads XFOIL commands from stdin and writes polar, .cp and .bl files in the layouts XFoilPost reads,
+using thin aerofoil theory with a simple stall model.
+Environment variables:
+FAKE_XFOIL_DELAY - seconds spent on each Alfa command.
+FAKE_XFOIL_FAIL - space separated alphas that fail to converge.
+FAKE_XFOIL_FLAKY - space separated alphas that fail to converge the first time they are run.
+FAKE_XFOIL_CRASH - alpha at which the process exits, as if Xfoil crashed.
+"""
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from naca_aerofoil import naca4
+
+POLAR_HEADER = """
+       XFOIL         Version 6.99
+
+ Calculated polar for: {name}
+
+ 1 1 Reynolds number fixed          Mach number fixed
+
+ xtrf =   1.000 (top)        1.000 (bottom)
+ Mach = {mach:7.3f}     Re = {re:9.3f} e 6     Ncrit =   9.000
+
+   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr
+  ------ -------- --------- --------- -------- -------- --------
+"""
+
+
+class FakeXFoil(object):
+    """
+    Object to represent the state of a fake XFOIL session.
+    """
+    def __init__(self, out):
+        self.out = out
+        self.name = 'aerofoil'
+        self.coords = naca4(0, 0, 12, 161)
+        self.camber = 0.0
+        self.reynolds_number = 0.0
+        self.viscous = False
+        self.mach_number = 0.0
+        self.menu = 'top'
+        self.polar_file = None
+        self.pending = None
+        self.delay = float(os.environ.get('FAKE_XFOIL_DELAY', 0.0))
+        self.fail = set(round(float(alpha), 2) for alpha in os.environ.get('FAKE_XFOIL_FAIL', '').split())
+        self.flaky = set(round(float(alpha), 2) for alpha in os.environ.get('FAKE_XFOIL_FLAKY', '').split())
+        self.crash = set(round(float(alpha), 2) for alpha in os.environ.get('FAKE_XFOIL_CRASH', '').split())
+        self.point = None
+
+    def prompt(self, text):
+        self.out.write(text)
+        self.out.flush()
+
+    def menu_prompt(self):
+        if self.menu == 'oper':
+            self.prompt('\n.OPERv   c>  ' if self.viscous else '\n.OPERi   c>  ')
+        elif self.menu == 'plop':
+            self.prompt('\n  ..PLOP   c>  ')
+        else:
+            self.prompt('\n XFOIL   c>  ')
+
+    def command(self, line):
+        words = line.split()
+        if self.pending is not None:
+            handler, self.pending = self.pending, None
+            return handler(line.strip())
+        if not words:
+            self.menu = 'top'   # Blank line leaves OPER/PLOP
+            self.menu_prompt()
+            return True
+        name, args = words[0].lower(), words[1:]
+        if name == 'quit':
+            return False
+        if name == 'naca':
+            digits = args[0]
+            self.name = 'NACA {}'.format(digits)
+            self.coords = naca4(int(digits[0]), int(digits[1]), int(digits[2:]), 161)
+            self.camber = int(digits[0]) / 100.0
+        elif name == 'load':
+            if not self._load(args[0]):
+                self.pending = self._set_name
+                self.prompt(' Enter airfoil name   s>  ')
+                return True
+        elif name in ('oper', 'plop'):
+            self.menu = name
+        elif name in ('visc', 'v'):
+            self.viscous = not self.viscous
+            if self.viscous and args:
+                self.reynolds_number = float(args[0])
+        elif name == 're':
+            self.reynolds_number = float(args[0])
+        elif name == 'm':
+            self.mach_number = float(args[0])
+        elif name == 'pacc':
+            if self.polar_file is not None:
+                self.polar_file.close()
+                self.polar_file = None
+                self.out.write('\n Polar accumulation disabled\n')
+            else:
+                self.pending = self._open_polar
+                self.prompt(' Enter  polar save filename  OR  <return> for no file   s>  ')
+                return True
+        elif name == 'alfa':
+            self._alfa(float(args[0]))
+        elif name == 'dump':
+            self._dump(args[0])
+        elif name == 'cpwr':
+            self._cpwr(args[0])
+        self.menu_prompt()
+        return True
+
+    def _set_name(self, name):
+        self.name = name or 'aerofoil'
+        self.menu_prompt()
+        return True
+
+    def _load(self, path):
+        """
+        :return: True if the file names the aerofoil, otherwise Xfoil asks for a name.
+        """
+        lines = open(path).read().splitlines()
+        named = True
+        try:
+            [float(value) for value in lines[0].split()]
+            named = False
+        except ValueError:
+            self.name = lines[0].strip()
+            lines = lines[1:]
+        self.coords = np.array([[float(value) for value in line.split()] for line in lines if line.strip()])
+        self.camber = 0.5 * (self.coords[:, 1].max() + self.coords[:, 1].min())
+        return named
+
+    def _open_polar(self, path):
+        if path:
+            self.polar_file = open(path, 'a')
+            if not self.polar_file.tell():
+                re = self.reynolds_number / 1e6
+                self.polar_file.write(POLAR_HEADER.format(name=self.name, mach=self.mach_number, re=re))
+            self.polar_file.flush()
+        self.pending = self._open_dump
+        self.prompt(' Enter  polar dump filename  OR  <return> for no file   s>  ')
+        return True
+
+    def _open_dump(self, path):
+        self.menu_prompt()
+        return True
+
+    def coefficients(self, alpha):
+        """
+        :return: CL, CD, CDp, CM, top and bottom transition locations at alpha (degrees).
+        """
+        alpha_0 = -100.0 * self.camber
+        cl_linear = 0.11 * (alpha - alpha_0)
+        stall = max(alpha - 14.0, 0.0)
+        cl = cl_linear * math.exp(-stall ** 2 / 60.0)
+        cd = 0.006 + 0.008 * (alpha / 10.0) ** 2 + 0.01 * stall ** 1.5
+        cdp = 0.4 * cd
+        cm = -0.25 * self.camber * 10.0
+        top_xtr = min(max(0.6 - 0.04 * alpha, 0.02), 1.0)
+        bot_xtr = min(max(0.6 + 0.04 * alpha, 0.02), 1.0)
+        return cl, cd, cdp, cm, top_xtr, bot_xtr
+
+    def _alfa(self, alpha):
+        time.sleep(self.delay)
+        if round(alpha, 2) in self.crash:
+            self.out.flush()
+            os._exit(1)
+        if round(alpha, 2) in self.fail or round(alpha, 2) in self.flaky:
+            self.flaky.discard(round(alpha, 2))
+            self.out.write('\n VISCAL:  Convergence failed\n')
+            self.point = None
+            return
+        cl, cd, cdp, cm, top_xtr, bot_xtr = self.coefficients(alpha)
+        self.point = alpha, cl
+        self.out.write('\n Side 1  free  transition at x/c = {:7.4f}   40\n'.format(top_xtr))
+        self.out.write(' Side 2  free  transition at x/c = {:7.4f}   90\n'.format(bot_xtr))
+        self.out.write('\n       a = {:7.3f}      CL = {:7.4f}\n'.format(alpha, cl))
+        self.out.write('      Cm = {:7.4f}     CD = {:9.5f}   =>   CDf = {:9.5f}    CDp = {:9.5f}\n'.format(
+            cm, cd, cd - cdp, cdp))
+        if self.polar_file is not None:
+            self.polar_file.write('{:8.3f}{:9.4f}{:10.5f}{:10.5f}{:9.4f}{:9.4f}{:9.4f}\n'.format(
+                alpha, cl, cd, cdp, cm, top_xtr, bot_xtr))
+            self.polar_file.flush()
+
+    def _surface(self):
+        x, y = self.coords[:, 0], self.coords[:, 1]
+        alpha, cl = self.point if self.point is not None else (0.0, 0.0)
+        upper = np.arange(len(x)) <= np.argmin(x)
+        loading = cl * np.sqrt(np.clip(1.0 - x, 0.0, 1.0) / np.clip(x, 1e-3, 1.0)) / math.pi
+        cp = np.where(upper, -loading, loading) - 4.0 * np.abs(y)
+        return x, y, cp
+
+    def _dump(self, path):
+        x, y, cp = self._surface()
+        s = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+        ue = np.sqrt(np.clip(1.0 - cp, 0.0, None))
+        theta = 0.001 + 0.002 * x
+        dstar = 2.5 * theta
+        cf = 0.004 * (1.0 - 0.5 * x)
+        with open(path, 'w') as dump:
+            dump.write('#    s        x        y     Ue/Vinf    Dstar     Theta      Cf       H\n')
+            for row in zip(s, x, y, ue, dstar, theta, cf, dstar / theta):
+                dump.write(''.join('{:9.5f}'.format(value) for value in row) + '\n')
+
+    def _cpwr(self, path):
+        x, y, cp = self._surface()
+        with open(path, 'w') as cp_file:
+            cp_file.write('#    x        Cp  \n')
+            for row in zip(x, cp):
+                cp_file.write(''.join('{:9.5f}'.format(value) for value in row) + '\n')
+
+
+def main():
+    xfoil = FakeXFoil(sys.stdout)
+    xfoil.prompt('\n XFOIL   c>  ')
+    while True:
+        line = sys.stdin.readline()
+        if not line or not xfoil.command(line):
+            break
+    if xfoil.polar_file is not None:
+        xfoil.polar_file.close()
+
+
+if __name__ == '__main__':
+    main()
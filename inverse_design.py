@@ -0,0 +1,162 @@
+"""
+Inverse design: the Karman-Trefftz parameters (eps, beta, tau) that best reproduce a target section, a NACA 4 digit
+name such as 2412 or NACA2412 or the path of a .dat coordinate file.
+Usage: python inverse_design.py <output folder> <target> [<target> ...]
+"""
+import functools
+import multiprocessing
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from aerofoil_geometry import AerofoilGeometry
+from ktreff import ktreff
+from lazy_import import lazy_module
+from naca_aerofoil import naca4
+from result_writer import ResultWriter
+from tracing import span, traced
+
+pd = lazy_module('pandas')
+
+PARAMETERS = ['eps', 'beta', 'tau']
+BOUNDS = [(0.0, 0.3), (-0.1, 0.2), (0.0, 0.6)]
+
+Fit = namedtuple('Fit', ['target', 'eps', 'beta', 'tau', 'distance', 'evaluations'])
+
+
+def load_section(file_path):
+    """
+    Function to read x, y coordinates from a .dat file, skipping name and header lines.
+    :return: array (n, 2) of coordinates in file order, which must run around the section from the trailing edge.
+    """
+    rows = []
+    with open(file_path) as dat:
+        for line in dat:
+            try:
+                row = [float(value) for value in line.split()[:2]]
+            except ValueError:
+                continue
+            if len(row) == 2:
+                rows.append(row)
+    return np.array(rows)
+
+
+def target_surfaces(target, n=150, m=201):
+    """
+    :param target: NACA 4 digit name or path of a .dat file.
+    :return: upper and lower surface y of the target on the chord grid of AerofoilGeometry with m points.
+    """
+    if os.path.exists(str(target)):
+        coords = load_section(target)
+    else:
+        digits = str(target).upper().replace('NACA', '').strip()
+        if len(digits) != 4 or not digits.isdigit():
+            raise ValueError('target must be a NACA 4 digit name or a .dat file, got {}'.format(target))
+        coords = naca4(int(digits[0]), int(digits[1]), int(digits[2:]), n)
+    geometry = AerofoilGeometry(coords, m)
+    return geometry.upper[0], geometry.lower[0]
+
+
+def shape_distance(params, upper, lower, n=150, m=201):
+    """
+    Function to measure candidate sections against a target, all candidates in one ktreff batch.
+    :param params: array (k, 3) of eps, beta, tau.
+    :param upper: target upper surface y on the chord grid, see target_surfaces.
+    :param lower: target lower surface y on the chord grid.
+    :return: array (k,) of RMS distance between the surfaces (in chords), inf for degenerate candidates.
+    """
+    params = np.atleast_2d(params)
+    x, y, cp, cl = ktreff(0.0, params[:, 0], params[:, 1], params[:, 2], n - 1)
+    geometry = AerofoilGeometry.from_xy(x, y, m)
+    with np.errstate(invalid='ignore'):
+        distance = np.sqrt(0.5 * (np.mean((geometry.upper - upper) ** 2, axis=1) +
+                                  np.mean((geometry.lower - lower) ** 2, axis=1)))
+    return np.where(np.isfinite(distance), distance, np.inf)
+
+
+def cross_entropy_minimise(objective, bounds, starts=4, population=48, elite=0.2, iterations=60, tol=1e-4,
+                           smoothing=0.7, seed=0):
+    """
+    Function to minimise a vectorised objective with the cross entropy method. Each start keeps a normal sampling
+    distribution, moved to the mean and spread of its best (elite) samples every iteration; the samples of all starts
+    are evaluated together in one objective call.
+    :param objective: function of an array (k, d) of parameters returning an array (k,) of values.
+    :param bounds: list of (min, max) for each of the d parameters.
+    :param tol: stop once every spread is below tol of its bounds.
+    :param smoothing: weight of the elite statistics against the previous distribution.
+    :return: best parameters, best value and number of evaluations.
+    """
+    random = np.random.RandomState(seed)
+    low, high = np.array(bounds, dtype=float).T
+    mean = low + (high - low) * (np.arange(starts)[:, np.newaxis] + random.uniform(size=(starts, len(low)))) / starts
+    std = np.tile(0.25 * (high - low), (starts, 1))
+    n_elite = max(2, int(round(elite * population)))
+    best, best_value, evaluations = None, np.inf, 0
+    for idx in range(iterations):
+        samples = mean[:, np.newaxis] + std[:, np.newaxis] * random.standard_normal((starts, population, len(low)))
+        samples[:, 0] = mean
+        samples = np.clip(samples, low, high)
+        values = objective(samples.reshape(-1, len(low))).reshape(starts, population)
+        evaluations += values.size
+
+        order = np.argsort(values, axis=1)[:, :n_elite]
+        elites = np.take_along_axis(samples, order[..., np.newaxis], axis=1)
+        mean = smoothing * elites.mean(axis=1) + (1.0 - smoothing) * mean
+        std = smoothing * elites.std(axis=1) + (1.0 - smoothing) * std
+
+        start, sample = np.unravel_index(np.argmin(values), values.shape)
+        if values[start, sample] < best_value:
+            best, best_value = samples[start, sample].copy(), values[start, sample]
+        if (std < tol * (high - low)).all():
+            break
+    return best, best_value, evaluations
+
+
+@traced('inverse_design.fit')
+def fit_section(target, bounds=BOUNDS, n=150, m=201, **kwargs):
+    """
+    Function to fit (eps, beta, tau) to one target section.
+    :param target: NACA 4 digit name or path of a .dat file.
+    :param kwargs: passed to cross_entropy_minimise (starts, population, iterations, seed...).
+    :return: Fit.
+    """
+    upper, lower = target_surfaces(target, n, m)
+    params, distance, evaluations = cross_entropy_minimise(
+        lambda candidates: shape_distance(candidates, upper, lower, n, m), bounds, **kwargs)
+    return Fit(str(target), params[0], params[1], params[2], distance, evaluations)
+
+
+def fit_sections(targets, processes=None, chunksize=1, **kwargs):
+    """
+    Function to fit many targets, spread over a pool of processes.
+    :param processes: worker processes, defaults to the number of CPUs, 1 fits in this process.
+    :param kwargs: passed to fit_section.
+    :return: list of Fit in the order of targets.
+    """
+    fit = functools.partial(fit_section, **kwargs)
+    with span('inverse_design.fit_sections', targets=len(targets)):
+        if processes == 1 or len(targets) < 2:
+            return [fit(target) for target in targets]
+        pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(targets)))
+        try:
+            return pool.map(fit, targets, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def write_fits(folder_path, fits):
+    """
+    Function to write a table of fits to <folder_path>/inverse_design.
+    :return: path written.
+    """
+    table = pd.DataFrame(list(fits), columns=Fit._fields)
+    with ResultWriter(os.path.join(folder_path, 'inverse_design')) as writer:
+        writer.write('fits', table)
+    return writer.path
+
+
+if __name__ == '__main__':
+    write_fits(sys.argv[1], fit_sections(sys.argv[2:]))
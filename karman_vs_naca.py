@@ -1,79 +1,79 @@
 import os
 import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
 from ktreff_aerofoil import KarmanTrefftzAerofoil
+from lazy_import import lazy_module
 from naca_aerofoil import Naca4DigitAerofoil
+from plot_render import LinePlot, PlotRenderer
+from result_writer import ResultWriter
+from shape_compare import METRICS, Sections, compare, naca_library, rank
 
+pd = lazy_module('pandas')
 
-def compare_ktreff_naca(folder_path, alpha=0.0, eps=0.06, beta=0.02, tau=0.15, n=150, output_naca=False):
+
+def compare_ktreff_naca(folder_path, alpha=0.0, eps=0.06, beta=0.02, tau=0.15, n=150, output_naca=False,
+                        backend='matlab'):
     """
     Function to compare a Karman-Trefftz aerofoil against the most similar 4 digit NACA aerofoil.
+    Writes the shape metrics against the NACA section from rounding and the closest sections of the NACA library.
     :param folder_path: path of folder to save plots.
     :param alpha: angle of incidence.
     :param eps:
     :param beta:
     :param tau:
     :param n: number of points to generate aerofoils with.
+    :param backend: 'matlab' or 'numpy' evaluation of ktreff.
     :return:
     """
     # Initialise and call ktreff and naca aerofoils objects and methods.
-    ktreff = KarmanTrefftzAerofoil(alpha=alpha, eps=eps, beta=beta, tau=tau, n=n)
+    ktreff = KarmanTrefftzAerofoil(alpha=alpha, eps=eps, beta=beta, tau=tau, n=n, backend=backend)
     ktreff()
     naca_camber, naca_camber_x, naca_thickness = ktreff.get_naca_digits()
     naca = Naca4DigitAerofoil(naca_camber, naca_camber_x, naca_thickness, int(n))
     naca()
 
-    # Generate and save geometry comparison plot
+    # Compare the shapes on a common chord grid
     ktreff_data = ktreff.get_data(True)
-    naca_data = naca.get_data()[:-1]    # Fudge to avoid line back to (0, 0)
-    naca_data[0][1] = 0.0               # Fudge to remove -0.0
+    naca_data = naca.get_data()
+    design = Sections(ktreff_data, names=[ktreff.get_name()])
+    metrics = compare(design, Sections(naca_data, names=[naca.get_name()]))
+    comparison = pd.DataFrame([[metrics[name][0, 0] for name in METRICS]], columns=METRICS, index=[naca.get_name()])
+    nearest = rank(design, naca_library(int(n))).head(10)
 
-    # Generate xlsx file
-    writer = pd.ExcelWriter(os.path.join(folder_path, '{}.xlsx'.format(ktreff.get_name())))
+    # Write data tables
     data, camber, thickness = ktreff.get_excel()
-    data.to_excel(writer, 'data')
-    camber.to_excel(writer, 'camber')
-    thickness.to_excel(writer, 'thickness')
+    with ResultWriter(os.path.join(folder_path, ktreff.get_name())) as writer:
+        writer.write('data', data)
+        writer.write('camber', camber)
+        writer.write('thickness', thickness)
+        writer.write('comparison', comparison)
+        writer.write('nearest_naca', nearest)
 
     # Write .dat files of coordinates for both aerofoils
-    np.savetxt('aerofoil.dat', ktreff_data)
-    np.savetxt('{}.dat'.format(naca.get_name()), naca_data)
+    np.savetxt(os.path.join(folder_path, 'aerofoil.dat'), ktreff_data)
+    np.savetxt(os.path.join(folder_path, '{}.dat'.format(naca.get_name())), naca_data)
 
+    renderer = PlotRenderer()
     title = '{} vs {}'.format(ktreff.get_name(), naca.get_name())
-    plt.plot(ktreff_data[:, 0], ktreff_data[:, 1], 'k-', label='ktreff')
-    plt.plot(naca_data[:, 0], naca_data[:, 1], 'b-', label='naca')
-    plt.xlabel('x/c')
-    plt.ylabel('y/c')
-    plt.title(title)
-    plt.legend(loc='best', fontsize='small')
-    plt.savefig(os.path.join(folder_path, '{}.png'.format(title)))
-    plt.gcf().clear()
+    plot = renderer.add(LinePlot(os.path.join(folder_path, '{}.png'.format(title)), title, 'x/c', 'y/c'))
+    plot.line(ktreff_data[:, 0], ktreff_data[:, 1], 'k-', label='ktreff')
+    plot.line(naca_data[:, 0], naca_data[:, 1], 'b-', label='naca')
 
     # Generate and save ktreff plot
     title = ktreff.get_name()
-    plt.plot(ktreff.lower[:, 0], ktreff.lower[:, 1], 'b-', label='lower')
-    plt.plot(ktreff.upper[:, 0], ktreff.upper[:, 1], 'g-', label='upper')
-    plt.plot(ktreff.camber[:, 0], ktreff.camber[:, 1], 'r-', label='camber')
-    plt.xlabel('x/c')
-    plt.ylabel('y/c')
-    plt.title(title)
-    plt.legend(loc='best', fontsize='small')
-    plt.savefig(os.path.join(folder_path, '{}.png'.format(title)))
-    plt.gcf().clear()
+    plot = renderer.add(LinePlot(os.path.join(folder_path, '{}.png'.format(title)), title, 'x/c', 'y/c'))
+    plot.line(ktreff.lower[:, 0], ktreff.lower[:, 1], 'b-', label='lower')
+    plot.line(ktreff.upper[:, 0], ktreff.upper[:, 1], 'g-', label='upper')
+    plot.line(ktreff.camber[:, 0], ktreff.camber[:, 1], 'r-', label='camber')
 
     # Generate and save ktreff Cp distribution
     ktreff_data = ktreff.get_data(False)
     title = '{}_Cp'.format(ktreff.get_name())
-    plt.plot(ktreff_data[:, 0], ktreff_data[:, 2], 'k-')
-    plt.xlabel('x/c')
-    plt.ylabel('Cp')
-    plt.title(title)
-    plt.savefig(os.path.join(folder_path, '{}.png'.format(title)))
-    plt.gcf().clear()
+    plot = renderer.add(LinePlot(os.path.join(folder_path, '{}.png'.format(title)), title, 'x/c', 'Cp'))
+    plot.line(ktreff_data[:, 0], ktreff_data[:, 2], 'k-')
+    renderer.render()
 
     if output_naca:
         return '{}{}{}'.format(naca.camber, naca.camber_x, naca.thickness)
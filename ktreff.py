@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def ktreff(alpha, eps, beta, tau, n):
+    """
+    NumPy transcription of the MATLAB ktreff function.
+    Maps a circle through zeta=1 onto a Karman-Trefftz aerofoil and evaluates the potential flow about it.
+    Arguments may be scalars or equal length arrays, in which case a batch of aerofoils is returned.
+    :param alpha: angle of incidence (radians).
+    :param eps: circle centre offset along the real axis (thickness).
+    :param beta: circle centre offset along the imaginary axis (camber).
+    :param tau: trailing edge angle (radians).
+    :param n: number of panels, n + 1 points are returned starting at the trailing edge along the lower surface.
+    :return: x, y, Cp and Cl, with a leading batch dimension if any argument is an array.
+    """
+    batch = any(np.ndim(arg) for arg in (alpha, eps, beta, tau))
+    alpha, eps, beta, tau = [np.atleast_1d(np.asarray(arg, dtype=float))[:, np.newaxis]
+                             for arg in np.broadcast_arrays(alpha, eps, beta, tau)]
+
+    # Circle in the zeta plane passing through the trailing edge at zeta=1
+    power = 2.0 - tau / np.pi
+    centre = -eps + 1j * beta
+    radius = np.abs(1.0 - centre)
+    beta_0 = np.arcsin(beta / radius)
+    theta = -beta_0 - np.linspace(0.0, 2.0 * np.pi, int(n) + 1)
+    zeta = centre + radius * np.exp(1j * theta)
+    zeta[:, [0, -1]] = 1.0
+
+    # Karman-Trefftz map written with the ratio ((zeta-1)/(zeta+1))^power to keep the branch cut off the circle
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = ((zeta - 1.0) / (zeta + 1.0)) ** power
+        z = power * (1.0 + ratio) / (1.0 - ratio)
+        dz_dzeta = 4.0 * power ** 2 * ratio / ((zeta ** 2 - 1.0) * (1.0 - ratio) ** 2)
+
+        # Flow about the circle with the Kutta condition applied at zeta=1
+        gamma = 4.0 * np.pi * radius * np.sin(alpha + beta_0)
+        w = np.exp(-1j * alpha) - radius ** 2 * np.exp(1j * alpha) / (zeta - centre) ** 2 \
+            + 1j * gamma / (2.0 * np.pi * (zeta - centre))
+        velocity = np.abs(w) / np.abs(dz_dzeta)
+
+    # Trailing edge is a stagnation point unless it is cusped
+    te_velocity = np.where(tau > 0.0, 0.0, 0.5 * (velocity[:, [1]] + velocity[:, [-2]]))
+    velocity[:, [0, -1]] = te_velocity
+
+    # Normalise to unit chord with the leading edge at the origin
+    x_le = np.min(z.real, axis=1)[:, np.newaxis]
+    chord = z.real[:, [0]] - x_le
+    x = (z.real - x_le) / chord
+    y = z.imag / chord
+    y[:, [0, -1]] = 0.0
+    cp = 1.0 - velocity ** 2
+    cl = (2.0 * gamma / chord)[:, 0]
+
+    if batch:
+        return x, y, cp, cl
+    return x[0], y[0], cp[0], float(cl[0])
@@ -1,14 +1,27 @@
 import math
 
-import matlab.engine
 import numpy as np
-import pandas as pd
-from scipy.interpolate import griddata
+
+from aerofoil_geometry import AerofoilGeometry
+from dpan import DoubletPanelSolver
+from dpan_fast import FastDoubletPanelSolver
+from ktreff import ktreff
+from lazy_import import lazy_module
+from matlab_pool import get_pool
+from result_cache import get_default_cache
+from tracing import span
+
+pd = lazy_module('pandas')
+matlab = lazy_module('matlab')     # MATLAB only required for the 'matlab' backend
+
+BACKENDS = ('matlab', 'numpy')
+BACKEND_VERSIONS = {'matlab': 'matlab', 'numpy': 'numpy-1'}     # Bump to invalidate cached results
+DPAN_SOLVERS = {'dense': DoubletPanelSolver, 'fast': FastDoubletPanelSolver}
 
 
 class KarmanTrefftzAerofoil(object):
     """
-    Object to represent Karman-Trefftz aerofoil generated by MATLAB.
+    Object to represent Karman-Trefftz aerofoil generated by MATLAB or the NumPy transcription of ktreff.
     """
     def __init__(self, **kwargs):
         self.alpha = float(kwargs['alpha']) * math.pi / 180.0   # Input in degrees, MATLAB requires radians
@@ -22,38 +35,138 @@ class KarmanTrefftzAerofoil(object):
         self.upper = None
         self.camber = None
         self.thickness = None
+        self.max_camber = None
+        self.max_thickness = None
+        self.geometry = None
         self.dpan = True if 'dpan' in kwargs.keys() else False
+        self.backend = kwargs.get('backend', 'matlab')
+        if self.backend not in BACKENDS:
+            raise ValueError('backend must be one of {}, got {}'.format(BACKENDS, self.backend))
+        self.pool = kwargs.get('pool')
+        self.dpan_method = kwargs.get('dpan_solver', 'dense')   # 'fast' for very high panel counts
+        if self.dpan_method not in DPAN_SOLVERS:
+            raise ValueError('dpan_solver must be one of {}, got {}'.format(sorted(DPAN_SOLVERS),
+                                                                            self.dpan_method))
+        if self.dpan_method != 'dense' and self.backend == 'matlab':
+            raise ValueError("dpan_solver='{}' needs backend='numpy', MATLAB dpan is dense".format(self.dpan_method))
+        self.dpan_solver = None
+        self.cache = kwargs.get('cache')     # ResultCache, False to disable, defaults to the shared cache
 
     def __call__(self, *args, **kwargs):
-        self._get_ktreff_data_matlab()
-        self._calc_lower_upper()
-        self._calc_camber()
-        self._calc_thickness()
+        with span('aerofoil', backend=self.backend, n=self.n, dpan=self.dpan):
+            cache = self._get_cache()
+            key = cache.key(self.get_cache_params()) if cache else None
+            with span('aerofoil.cache_load'):
+                cached = cache and self._load_cached(cache.load(key))
+            if not cached:
+                self._evaluate()
+                if cache:
+                    with span('aerofoil.cache_store'):
+                        cache.store(key, **self._cached_arrays())
+            with span('aerofoil.geometry'):
+                self._calc_lower_upper()
+                self._calc_camber()
+                self._calc_thickness()
+        self.max_camber = None
+        self.max_thickness = None
+        self.geometry = None
+
+    def _evaluate(self):
+        with span('ktreff.{}'.format(self.backend)):
+            if self.backend == 'numpy':
+                self._get_ktreff_data_numpy()
+            else:
+                self._get_ktreff_data_matlab()
+        if self.dpan:
+            with span('dpan.{}'.format(self.backend), solver=self.dpan_method):
+                if self.backend == 'numpy':
+                    self._get_doublet_data_numpy()
+                else:
+                    self._get_doublet_data_matlab()
+
+    def _get_cache(self):
+        if self.cache is False:
+            return None
+        return self.cache if self.cache is not None else get_default_cache()
+
+    def get_cache_params(self):
+        """
+        :return: dict of every parameter that determines the evaluated data.
+        """
+        return {'alpha': self.alpha, 'eps': self.eps, 'beta': self.beta, 'tau': self.tau, 'n': self.n,
+                'dpan': self.dpan, 'dpan_solver': self.dpan_method if self.dpan else None,
+                'backend': BACKEND_VERSIONS[self.backend]}
+
+    def _cached_arrays(self):
+        arrays = {'data': self.data, 'Cl': self.Cl}
+        if self.dpan:
+            arrays['dpan_cl'] = self.dpan_cl
+            arrays['dpan_cp'] = np.asarray(self.dpan_cp, dtype=float)
+        return arrays
+
+    def _load_cached(self, arrays):
+        if arrays is None:
+            return False
+        self.data = arrays['data']
+        self.Cl = float(arrays['Cl'])
         if self.dpan:
-            self._get_doublet_data_matlab()
+            self.dpan_cl = float(arrays['dpan_cl'])
+            self.dpan_cp = arrays['dpan_cp']
+        return True
 
     def _get_ktreff_data_matlab(self):
         """
         Function to call MATLAB ktreff function and store data in object.
         """
-        eng = matlab.engine.start_matlab()
-        x, y, cp, cl = eng.ktreff(self.alpha, self.eps, self.beta, self.tau, float(self.n - 1), nargout=4)
+        with self._get_pool().engine() as eng:
+            x, y, cp, cl = eng.ktreff(self.alpha, self.eps, self.beta, self.tau, float(self.n - 1), nargout=4)
         self.data[:, 0] = x[0]
         self.data[:, 1] = y[0]
         self.data[:, 2] = cp[0]
         self.Cl = cl
 
+    def _get_ktreff_data_numpy(self):
+        """
+        Function to evaluate ktreff with NumPy and store data in object.
+        """
+        x, y, cp, cl = ktreff(self.alpha, self.eps, self.beta, self.tau, self.n - 1)
+        self.data[:, 0] = x
+        self.data[:, 1] = y
+        self.data[:, 2] = cp
+        self.Cl = cl
+
     def _get_doublet_data_matlab(self):
         """
         Function to call MATLAB dpan function and store data in object.
         """
         x = matlab.double(self.data[:, 0].tolist())[0]
         y = matlab.double(self.data[:, 1].tolist())[0]
-        eng = matlab.engine.start_matlab()
-        cp, cl = eng.dpan(float(self.n - 1), self.alpha, x, y, nargout=2)
+        with self._get_pool().engine() as eng:
+            cp, cl = eng.dpan(float(self.n - 1), self.alpha, x, y, nargout=2)
         self.dpan_cl = cl
         self.dpan_cp = cp[0]
 
+    def _get_doublet_data_numpy(self):
+        """
+        Function to solve the doublet panel method with NumPy and store data in object.
+        """
+        cp, cl = self.get_dpan_polar([self.alpha * 180.0 / math.pi])
+        self.dpan_cl = cl[0]
+        self.dpan_cp = cp[0]
+
+    def get_dpan_polar(self, alphas):
+        """
+        Function to solve the doublet panel method at many incidences from one factorisation of the geometry.
+        :param alphas: list of angles of incidence in degrees.
+        :return: array of dpan Cp (one row per alpha) and array of dpan Cl.
+        """
+        if self.dpan_solver is None:
+            self.dpan_solver = DPAN_SOLVERS[self.dpan_method](self.data[:, 0], self.data[:, 1])
+        return self.dpan_solver(np.radians(np.atleast_1d(np.asarray(alphas, dtype=float))))
+
+    def _get_pool(self):
+        return self.pool if self.pool is not None else get_pool()
+
     def get_excel(self):
         """
         Function to write .xlsx file containing x, y, camber, thickness and Cp.
@@ -102,10 +215,13 @@ class KarmanTrefftzAerofoil(object):
         return self.camber
 
     def get_max_camber(self):
-        return self.camber[np.argmax(self.camber[:, 1])]
+        if self.max_camber is None:
+            self.max_camber = self.camber[np.argmax(self.camber[:, 1])]
+        return self.max_camber
 
     def _calc_thickness(self):
-        interp_upper = griddata(self.upper[:, 0], self.upper[:, 1], self.lower[:, 0], method='linear')
+        interp_upper = np.interp(self.lower[:, 0], self.upper[::-1, 0], self.upper[::-1, 1],
+                                 left=np.nan, right=np.nan)
         thickness = interp_upper - self.lower[:, 1]
         thickness = thickness[np.where(np.logical_not(np.isnan(thickness)))]
         self.thickness = thickness
@@ -114,7 +230,17 @@ class KarmanTrefftzAerofoil(object):
         return self.thickness
 
     def get_max_thickness(self):
-        return np.max(self.thickness)
+        if self.max_thickness is None:
+            self.max_thickness = np.max(self.thickness)
+        return self.max_thickness
+
+    def get_geometry(self):
+        """
+        :return: AerofoilGeometry of the aerofoil resampled onto a cosine spaced chord grid.
+        """
+        if self.geometry is None:
+            self.geometry = AerofoilGeometry(self.get_data(True))
+        return self.geometry
 
     def get_naca_digits(self):
         max_camber_x, max_camber = self.get_max_camber()
@@ -125,3 +251,15 @@ class KarmanTrefftzAerofoil(object):
         return 'ktreff(alpha={},eps={},beta={},tau={},n={})'.format(np.round(self.alpha * math.pi / 180.0, 1),
                                                                     self.eps, self.beta, self.tau,
                                                                     self.n)
+
+
+def evaluate_aerofoils(aerofoils, pool=None):
+    """
+    Function to call each aerofoil, running up to one aerofoil per pooled MATLAB engine at a time.
+    :param aerofoils: list of KarmanTrefftzAerofoil objects.
+    :param pool: MatlabEnginePool, defaults to the shared pool.
+    :return: list of called aerofoils.
+    """
+    pool = pool if pool is not None else get_pool()
+    pool.map(lambda aerofoil: aerofoil(), aerofoils)
+    return aerofoils
@@ -0,0 +1,298 @@
+"""
+Tabulated surrogate of Karman-Trefftz aerofoil properties, answering Cl, maximum camber and thickness (and so the
+NACA 4 digits) for millions of (eps, beta, tau, alpha) points by interpolation instead of one conformal map each.
+The geometry does not depend on alpha and Cl = A(eps, beta, tau) sin(alpha + beta_0(eps, beta)) exactly, so only
+A and the geometric quantities are tabulated, on a (eps, beta, tau) grid refined where they vary quickly.
+"""
+import math
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from aerofoil_geometry import batch_interp
+from ktreff import ktreff
+from tracing import span, traced
+
+AXES = ['eps', 'beta', 'tau']
+QUANTITIES = ['cl_amplitude', 'max_camber', 'max_camber_x', 'max_thickness', 'max_thickness_x']
+TOLERANCES = {'cl_amplitude': 1e-3, 'max_camber': 1e-4, 'max_camber_x': 2e-2, 'max_thickness': 1e-4,
+              'max_thickness_x': 2e-2}     # Absolute, well inside the rounding of NACA 4 digits
+DIGIT_SCALES = OrderedDict([('max_camber', 100.0), ('max_camber_x', 10.0), ('max_thickness', 100.0)])
+ERROR_MARGIN = 2.0     # Safety factor on the interpolation error estimates
+BATCH_SIZE = 512
+
+
+def zero_lift_alpha(eps, beta):
+    """
+    :return: angle of zero lift (radians) of the Karman-Trefftz aerofoil, -beta_0.
+    """
+    return -np.arcsin(beta / np.hypot(1.0 + np.asarray(eps, dtype=float), beta))
+
+
+def exact_properties(eps, beta, tau, n=150):
+    """
+    Function to evaluate the tabulated quantities with ktreff, in batches, using the camber and thickness definitions
+    of KarmanTrefftzAerofoil: the contour is split in half at n / 2, camber is the mean of the two halves point by
+    point and thickness the upper surface interpolated at the lower surface x less the lower surface. Maxima are the
+    largest samples, so the NACA digits match KarmanTrefftzAerofoil.get_naca_digits.
+    :param n: number of points on each aerofoil, as KarmanTrefftzAerofoil.
+    :return: array (..., len(QUANTITIES)) for the broadcast shape of eps, beta and tau.
+    """
+    eps, beta, tau = [np.asarray(arg, dtype=float) for arg in np.broadcast_arrays(eps, beta, tau)]
+    shape = eps.shape
+    eps, beta, tau = eps.ravel(), beta.ravel(), tau.ravel()
+    values = np.empty((len(eps), len(QUANTITIES)))
+    with span('surrogate.exact', points=len(eps)):
+        for start in range(0, len(eps), BATCH_SIZE):
+            batch = slice(start, start + BATCH_SIZE)
+            alpha = 0.5 * math.pi + zero_lift_alpha(eps[batch], beta[batch])    # sin(alpha + beta_0) = 1, Cl = A
+            x, y, cp, cl = ktreff(alpha, eps[batch], beta[batch], tau[batch], n - 1)
+            (lower_x, lower_y), (upper_x, upper_y) = _halves(np.atleast_2d(x), np.atleast_2d(y), n)
+            max_camber, max_camber_x = _peak(0.5 * (lower_x + upper_x), 0.5 * (lower_y + upper_y))
+            # Upper surface interpolated at the lower surface x, points beyond the upper surface are left out
+            interp_upper = batch_interp(lower_x, upper_x[:, ::-1], upper_y[:, ::-1])
+            outside = (lower_x < upper_x[:, [-1]]) | (lower_x > upper_x[:, [0]])
+            max_thickness, max_thickness_x = _peak(lower_x, np.where(outside, -np.inf, interp_upper - lower_y))
+            values[batch] = np.column_stack([cl, max_camber, max_camber_x, max_thickness, max_thickness_x])
+    return values.reshape(shape + (len(QUANTITIES),))
+
+
+def _halves(x, y, n):
+    """
+    Function to split each contour at n / 2 into lower and upper halves sorted by decreasing x, as
+    KarmanTrefftzAerofoil.
+    :return: (x, y) arrays of the lower and of the upper half.
+    """
+    halves = []
+    for half in (slice(0, n // 2), slice(n // 2, n)):
+        order = np.argsort(x[:, half], axis=1)[:, ::-1]
+        halves.append((np.take_along_axis(x[:, half], order, axis=1), np.take_along_axis(y[:, half], order, axis=1)))
+    return halves
+
+
+def _peak(x, values):
+    """
+    :return: arrays of the largest value of each row and its x.
+    """
+    rows = np.arange(len(values))
+    idx = np.argmax(values, axis=1)
+    return values[rows, idx], x[rows, idx]
+
+
+def _interval_max(error, axis):
+    """
+    :return: array (len axis - 1, len(QUANTITIES)) of the largest error over the other axes of each interval.
+    """
+    return np.moveaxis(error, axis, 0).reshape(error.shape[axis], -1, len(QUANTITIES)).max(axis=1)
+
+
+def _dilate(error):
+    """
+    :return: array of the largest error of each edge and its neighbours along every axis of the grid.
+    """
+    for axis in range(error.ndim - 1):
+        padded = np.concatenate([np.take(error, [0], axis=axis), error, np.take(error, [-1], axis=axis)], axis=axis)
+        size = error.shape[axis]
+        error = np.maximum(np.maximum(np.take(padded, np.arange(size), axis=axis),
+                                      np.take(padded, np.arange(1, size + 1), axis=axis)),
+                           np.take(padded, np.arange(2, size + 2), axis=axis))
+    return error
+
+
+class KarmanTrefftzSurrogate(object):
+    """
+    Object to represent a table of QUANTITIES on a tensor grid of (eps, beta, tau), interpolated trilinearly.
+    Each axis keeps the error of linear interpolation at the midpoint of every grid edge along it. The error estimate
+    of a point is ERROR_MARGIN times the sum over the axes of the largest of these errors on the edges of its cell and
+    of the neighbouring cells, since the error inside a cell can exceed that at the midpoints of its own edges.
+    """
+    def __init__(self, axes, values, errors, n=150):
+        """
+        :param axes: list of node arrays for eps, beta and tau.
+        :param values: array (len eps, len beta, len tau, len(QUANTITIES)).
+        :param errors: list, per axis, of arrays shaped as values with one point fewer along that axis, of edge
+        error estimates.
+        """
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.values = np.asarray(values, dtype=float)
+        self.errors = [np.asarray(error, dtype=float) for error in errors]
+        self.n = int(n)
+        self._neighbour_errors = [_dilate(error) for error in self.errors]
+
+    @classmethod
+    @traced('surrogate.build')
+    def build(cls, eps=(0.0, 0.15), beta=(0.0, 0.1), tau=(0.0, 0.3), nodes=5, tol=None, max_nodes=65,
+              max_passes=6, n=150):
+        """
+        Function to tabulate the quantities on a grid of nodes points per axis and refine it. Each pass evaluates
+        the midpoints of every interval of each axis exactly and inserts those where linear interpolation misses
+        by more than tol, until no interval needs refining, an axis has max_nodes points or after max_passes.
+        :param eps: range of eps, beta and tau as (min, max).
+        :param tol: dict of absolute tolerance per quantity, defaults to TOLERANCES.
+        :return: KarmanTrefftzSurrogate.
+        """
+        tol = np.array([dict(TOLERANCES, **(tol or {}))[quantity] for quantity in QUANTITIES])
+        axes = [np.linspace(low, high, nodes) for low, high in (eps, beta, tau)]
+        values = exact_properties(*np.meshgrid(*axes, indexing='ij'), n=n)
+        errors = [np.full(values.shape[:axis] + (len(axes[axis]) - 1,) + values.shape[axis + 1:], np.inf)
+                  for axis in range(len(axes))]
+        for idx in range(max_passes):
+            refined = False
+            for axis in range(len(axes)):
+                mids = 0.5 * (axes[axis][:-1] + axes[axis][1:])
+                exact = exact_properties(*np.meshgrid(*[mids if a == axis else axes[a] for a in range(len(axes))],
+                                                      indexing='ij'), n=n)
+                linear = 0.5 * (np.delete(values, -1, axis=axis) + np.delete(values, 0, axis=axis))
+                error = np.abs(exact - linear)
+                # Locations of the maxima are arbitrary on (nearly) symmetric or flat sections and refining cannot
+                # resolve them, their error is kept in the estimate but does not ask for more nodes
+                resolvable = np.ones(error.shape, dtype=bool)
+                for quantity in ('max_camber', 'max_thickness'):
+                    resolvable[..., QUANTITIES.index(quantity + '_x')] = \
+                        exact[..., QUANTITIES.index(quantity)] >= 0.005
+                errors[axis] = error
+                refine = np.flatnonzero((_interval_max(np.where(resolvable, error, 0.0), axis) > tol).any(axis=1))
+                refine = refine[:max(max_nodes - len(axes[axis]), 0)]
+                if not len(refine):
+                    continue
+                refined = True
+                # Insert the midpoints and their exact values, the halves inherit the interval's error and the edges
+                # of the other axes through the new nodes the larger error of their neighbours
+                positions = refine + 1
+                axes[axis] = np.insert(axes[axis], positions, mids[refine])
+                values = np.insert(values, positions, np.take(exact, refine, axis=axis), axis=axis)
+                for other in range(len(axes)):
+                    if other == axis:
+                        errors[other] = np.insert(errors[other], refine, np.take(errors[other], refine, axis=axis),
+                                                  axis=axis)
+                    else:
+                        errors[other] = np.insert(errors[other], positions, np.maximum(
+                            np.take(errors[other], refine, axis=axis), np.take(errors[other], positions, axis=axis)),
+                            axis=axis)
+            if not refined:
+                break
+        return cls(axes, values, errors, n)
+
+    def _locate(self, points):
+        """
+        :return: per axis, interval index and fractional position of each point, and mask of points inside.
+        """
+        indices, weights = [], []
+        inside = np.ones(len(points[0]), dtype=bool)
+        for axis, coord in zip(self.axes, points):
+            idx = np.clip(np.searchsorted(axis, coord, side='right') - 1, 0, len(axis) - 2)
+            indices.append(idx)
+            weights.append((coord - axis[idx]) / (axis[idx + 1] - axis[idx]))
+            inside &= (coord >= axis[0]) & (coord <= axis[-1])
+        return indices, weights, inside
+
+    def interpolate(self, eps, beta, tau):
+        """
+        Function to interpolate the tabulated quantities trilinearly.
+        :return: arrays (k, len(QUANTITIES)) of values and of error estimates and mask of points inside the table.
+        """
+        indices, weights, inside = self._locate([eps, beta, tau])
+        shape = self.values.shape[:3]
+        table = self.values.reshape(-1, len(QUANTITIES))
+        base = np.ravel_multi_index(indices, shape)
+        values = np.zeros((len(eps), len(QUANTITIES)))
+        for corner in np.ndindex(2, 2, 2):
+            weight = np.ones(len(eps))
+            for offset, t in zip(corner, weights):
+                weight *= t if offset else 1.0 - t
+            values += weight[:, np.newaxis] * np.take(table, base + np.ravel_multi_index(corner, shape), axis=0)
+        errors = np.zeros((len(eps), len(QUANTITIES)))
+        for axis, error in enumerate(self._neighbour_errors):
+            # Largest of the four edges of the cell along axis
+            base = np.ravel_multi_index(indices, error.shape[:3])
+            table = error.reshape(-1, len(QUANTITIES))
+            worst = np.zeros((len(eps), len(QUANTITIES)))
+            for corner in np.ndindex(2, 2):
+                corner = corner[:axis] + (0,) + corner[axis:]
+                worst = np.maximum(worst, np.take(table, base + np.ravel_multi_index(corner, error.shape[:3]), axis=0))
+            errors += worst
+        return values, ERROR_MARGIN * errors, inside
+
+    def query(self, eps, beta, tau, alpha=None, tol=None, fallback=True):
+        """
+        Function to answer Cl (if alpha is given, degrees), maximum camber and thickness and their locations.
+        The arguments are broadcast against each other.
+        :param tol: dict of absolute tolerance per quantity; points whose error estimate exceeds it (and points
+        outside the table) are evaluated exactly if fallback, otherwise they are NaN outside the table.
+        :return: dict of quantity to array, 'error' dict of error estimates (0 where exact) and 'exact' mask.
+        """
+        args = [np.asarray(arg, dtype=float) for arg in np.broadcast_arrays(eps, beta, tau,
+                                                                              0.0 if alpha is None else alpha)]
+        shape = args[0].shape
+        lift = alpha is not None
+        eps, beta, tau, alpha = [arg.ravel() for arg in args]
+        with span('surrogate.query', points=len(eps)):
+            values, errors, inside = self.interpolate(eps, beta, tau)
+            exact = ~inside
+            if tol is not None:
+                limits = np.array([tol.get(quantity, np.inf) for quantity in QUANTITIES])
+                exact |= (errors > limits).any(axis=1)
+            if fallback and exact.any():
+                values[exact] = exact_properties(eps[exact], beta[exact], tau[exact], self.n)
+                errors[exact] = 0.0
+            elif exact.any():
+                values[~inside] = np.nan
+                exact = np.zeros_like(exact)
+
+        result = dict((quantity, values[:, idx].reshape(shape)) for idx, quantity in enumerate(QUANTITIES))
+        result['error'] = dict((quantity, errors[:, idx].reshape(shape)) for idx, quantity in enumerate(QUANTITIES))
+        if lift:
+            lift = np.sin(np.radians(alpha) - zero_lift_alpha(eps, beta))
+            result['Cl'] = (values[:, 0] * lift).reshape(shape)
+            result['error']['Cl'] = (errors[:, 0] * np.abs(lift)).reshape(shape)
+        result['exact'] = exact.reshape(shape)
+        return result
+
+    def naca_digits(self, eps, beta, tau):
+        """
+        Function to round maximum camber, its location and maximum thickness to NACA 4 digits as
+        KarmanTrefftzAerofoil.get_naca_digits. Points whose error estimate straddles a rounding boundary are
+        evaluated exactly.
+        :return: integer arrays of camber, camber location and thickness digits.
+        """
+        result = self.query(eps, beta, tau)
+        columns = [QUANTITIES.index(quantity) for quantity in DIGIT_SCALES]
+        scales = np.array(list(DIGIT_SCALES.values()))
+        values = np.stack([result[quantity] for quantity in DIGIT_SCALES], axis=-1) * scales
+        errors = np.stack([result['error'][quantity] for quantity in DIGIT_SCALES], axis=-1) * scales
+        doubtful = (np.round(values - errors) != np.round(values + errors)).any(axis=-1)
+        if doubtful.any():
+            points = [np.broadcast_to(arg, doubtful.shape)[doubtful] for arg in (eps, beta, tau)]
+            values[doubtful] = exact_properties(*points, n=self.n)[:, columns] * scales
+        digits = np.round(values).astype(int)
+        return digits[..., 0], digits[..., 1], digits[..., 2]
+
+    def save(self, file_path):
+        """
+        Function to write the table to a .npz file.
+        """
+        arrays = dict(values=self.values, n=self.n, quantities=np.array(QUANTITIES))
+        for name, axis, error in zip(AXES, self.axes, self.errors):
+            arrays[name] = axis
+            arrays['{}_errors'.format(name)] = error
+        np.savez_compressed(file_path, **arrays)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        :return: KarmanTrefftzSurrogate read from a file written by save.
+        """
+        with np.load(file_path) as table:
+            if [str(quantity) for quantity in table['quantities']] != QUANTITIES:
+                raise ValueError('{} holds {}, expected {}'.format(file_path, list(table['quantities']), QUANTITIES))
+            if table['{}_errors'.format(AXES[0])].ndim != table['values'].ndim:
+                raise ValueError('{} holds per interval error estimates, rebuild it'.format(file_path))
+            return cls([table[name] for name in AXES], table['values'],
+                       [table['{}_errors'.format(name)] for name in AXES], int(table['n']))
+
+
+if __name__ == '__main__':
+    surrogate = KarmanTrefftzSurrogate.build()
+    surrogate.save(sys.argv[1])
+    print('{} nodes'.format(' x '.join(str(len(axis)) for axis in surrogate.axes)))
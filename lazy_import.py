@@ -0,0 +1,55 @@
+"""
+Deferred imports of heavy dependencies (pandas, scipy, matplotlib, MATLAB). lazy_module(name) returns a stand in that
+imports the module on first attribute access, so importing a module of this package only costs the dependencies its
+caller actually uses. Each import is recorded as an 'import' span and in IMPORT_TIMES.
+"""
+import importlib
+import threading
+import time
+
+from tracing import span
+
+IMPORT_TIMES = {}   # Module name to seconds taken by the deferred import
+_MODULES = {}
+_LOCK = threading.RLock()   # Importing one module may load another
+
+
+class LazyModule(object):
+    """
+    Object to stand in for a module until one of its attributes is used.
+    """
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            with _LOCK:
+                if self._module is None:
+                    start = time.time()
+                    with span('import', module=self._name):
+                        module = importlib.import_module(self._name)
+                    IMPORT_TIMES[self._name] = time.time() - start
+                    self.__dict__['_module'] = module
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self):
+        return '<lazy module {}{}>'.format(self._name, '' if self._module is None else ' (loaded)')
+
+
+def lazy_module(name):
+    """
+    :param name: module to import on first use, e.g. 'pandas' or 'scipy.interpolate'.
+    :return: LazyModule, shared by every caller asking for name.
+    """
+    with _LOCK:
+        if name not in _MODULES:
+            _MODULES[name] = LazyModule(name)
+        return _MODULES[name]
+
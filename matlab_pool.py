@@ -0,0 +1,150 @@
+import atexit
+import threading
+from contextlib import contextmanager
+from multiprocessing import util
+from multiprocessing.pool import ThreadPool
+
+from lazy_import import lazy_module
+from tracing import span
+
+matlab_engine = lazy_module('matlab.engine')    # MATLAB only required for the 'matlab' backend
+
+
+class MatlabEnginePool(object):
+    """
+    Object to share MATLAB engine sessions between aerofoils.
+    Engines are started lazily, up to size, handed out one caller at a time and shut down at exit. Engines start
+    outside the lock, so several can warm up at once while other callers borrow and return idle ones.
+    """
+    def __init__(self, size=1, start=None):
+        """
+        :param start: callable returning a new engine, defaults to matlab.engine.start_matlab.
+        """
+        self.size = int(size)
+        self.start = start
+        self._engines = []
+        self._idle = []
+        self._lent = 0
+        self._starting = 0     # Slots reserved by engines being started
+        self._condition = threading.Condition()
+        atexit.register(self.shutdown)
+
+    @contextmanager
+    def engine(self):
+        """
+        Context manager lending an engine from the pool, starting one if none are idle and the pool is not full.
+        """
+        eng = self._acquire()
+        try:
+            yield eng
+        finally:
+            self._release(eng)
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle and len(self._engines) + self._starting >= self.size:
+                self._condition.wait()
+            if self._idle:
+                self._lent += 1
+                return self._idle.pop()
+            self._starting += 1
+        try:
+            with span('matlab.start'):
+                eng = (self.start or _start_matlab)()
+        except Exception:
+            with self._condition:
+                self._starting -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._starting -= 1
+            self._engines.append(eng)
+            self._lent += 1
+        return eng
+
+    def _release(self, eng):
+        with self._condition:
+            self._lent -= 1
+            if any(eng is engine for engine in self._engines):     # Not quit by shutdown while on loan
+                self._idle.append(eng)
+            self._condition.notify()
+
+    def map(self, func, items):
+        """
+        Function to apply func to each item with one thread per pooled engine.
+        """
+        if self.size == 1 or len(items) < 2:
+            return [func(item) for item in items]
+        threads = ThreadPool(min(self.size, len(items)))
+        try:
+            return threads.map(func, items)
+        finally:
+            threads.close()
+            threads.join()
+
+    def resize(self, size):
+        """
+        Function to change the number of engines, quitting the running ones.
+        Refused while engines are on loan or starting, as they would be quit under their callers.
+        """
+        with self._condition:
+            if self._lent or self._starting:
+                raise RuntimeError('Cannot resize the MATLAB engine pool while {} engines are in use'.format(
+                    self._lent + self._starting))
+            self._quit_engines()
+            self.size = int(size)
+            self._condition.notify_all()
+
+    def shutdown(self):
+        """
+        Function to quit every engine started by the pool.
+        """
+        with self._condition:
+            self._quit_engines()
+            self._condition.notify_all()
+
+    def _quit_engines(self):
+        while self._engines:
+            eng = self._engines.pop()
+            try:
+                eng.quit()
+            except Exception:
+                pass
+        self._idle = []
+
+
+_pool = None
+
+
+def get_pool(size=None):
+    """
+    Function to return the engine pool shared by every aerofoil in the process.
+    :param size: number of engines, resizes the shared pool if given (not while its engines are in use).
+    """
+    global _pool
+    if _pool is None:
+        _pool = MatlabEnginePool(size or 1)
+    elif size is not None and size != _pool.size:
+        _pool.resize(size)
+    return _pool
+
+
+def init_worker():
+    """
+    Function to pass as multiprocessing.Pool(initializer=init_worker). Pool workers leave through os._exit, which
+    skips atexit, so the engines a worker starts are quit by a multiprocessing finaliser instead.
+    """
+    util.Finalize(None, _shutdown_pool, exitpriority=10)
+
+
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown()
+
+
+def _start_matlab():
+    try:
+        start = matlab_engine.start_matlab
+    except ImportError:
+        raise ImportError('matlab.engine is required for the MATLAB backend')
+    return start()
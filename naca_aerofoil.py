@@ -1,17 +1,21 @@
-import urllib2
-
 import numpy as np
-from bs4 import BeautifulSoup
+
+from lru import LRUCache
+
+SOURCES = ('local', 'airfoiltools')
+
+_sections = LRUCache(maxsize=256)
 
 
 class Naca4DigitAerofoil(object):
     """
-    Object to represent 4 digit NACA aerofoil generated by airfoiltools.com
+    Object to represent 4 digit NACA aerofoil generated locally or by airfoiltools.com
     """
-    def __init__(self, camber, camber_x, thickness, n):
+    def __init__(self, camber, camber_x, thickness, n, source='local'):
         self.camber = camber
         self.camber_x = camber_x
         self.thickness = thickness
+        self.n = n
         self.url = "http://airfoiltools.com/airfoil/naca4digit?" \
                    "MNaca4DigitForm%5Bcamber%5D={}" \
                    "&MNaca4DigitForm%5Bposition%5D={}" \
@@ -21,15 +25,31 @@ class Naca4DigitAerofoil(object):
                    "&MNaca4DigitForm%5BcloseTe%5D=1&yt0=Plot".format(self.camber, self.camber_x, self.thickness, n - 1)
         self.data = np.empty((n, 2))
         self.page = None
+        if source not in SOURCES:
+            raise ValueError('source must be one of {}, got {}'.format(SOURCES, source))
+        self.source = source
 
     def __call__(self, *args, **kwargs):
-        self._get_html()
-        self._parse_data()
+        if self.source == 'local':
+            self._generate_data()
+        else:
+            self._get_html()
+            self._parse_data()
+
+    def _generate_data(self):
+        key = (self.camber, self.camber_x, self.thickness, self.n)
+        data = _sections.get(key)
+        if data is None:
+            data = naca4(self.camber, self.camber_x, self.thickness, self.n)
+            _sections.put(key, data)
+        self.data = data.copy()
 
     def _get_html(self):
+        import urllib2
         self.page = urllib2.urlopen(self.url)
 
     def _parse_data(self):
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(self.page, 'html.parser')
         dat = soup.find('pre')
         dat = dat.text.split('\n')
@@ -52,4 +72,42 @@ class Naca4DigitAerofoil(object):
         return self.data
 
     def get_name(self):
-        return 'NACA{}{}{}'.format(self.camber, self.camber_x, self.thickness)
\ No newline at end of file
+        return 'NACA{}{}{}'.format(self.camber, self.camber_x, self.thickness)
+
+
+def naca4(camber, camber_x, thickness, n):
+    """
+    Function to generate NACA 4 digit sections with cosine spacing and a closed trailing edge.
+    Digits may be scalars or equal length arrays, in which case a batch of sections is returned.
+    :param camber: maximum camber in percent of chord (first digit).
+    :param camber_x: position of maximum camber in tenths of chord (second digit).
+    :param thickness: maximum thickness in percent of chord (last two digits).
+    :param n: number of points, ordered from the trailing edge over the upper surface and back along the lower.
+    :return: array of x, y coordinates (n, 2), or (k, n, 2) for a batch.
+    """
+    batch = any(np.ndim(arg) for arg in (camber, camber_x, thickness))
+    m, p, t = [np.atleast_1d(np.asarray(arg, dtype=float))[:, np.newaxis]
+               for arg in np.broadcast_arrays(camber, camber_x, thickness)]
+    m, p, t = m / 100.0, p / 10.0, t / 100.0
+
+    theta = np.linspace(0.0, 2.0 * np.pi, int(n))
+    x = 0.5 * (1.0 + np.cos(theta))
+    side = np.where(theta <= np.pi, 1.0, -1.0)
+
+    yt = 5.0 * t * (0.2969 * np.sqrt(x) - 0.1260 * x - 0.3516 * x ** 2 + 0.2843 * x ** 3 - 0.1036 * x ** 4)
+
+    # Camber line in front of and behind the position of maximum camber, p=0 for symmetric sections
+    front = x < p
+    p_front = np.where(p > 0.0, p, 1.0)
+    p_back = np.where(p < 1.0, p, 0.0)
+    yc = np.where(front, m / p_front ** 2 * (2.0 * p * x - x ** 2),
+                  m / (1.0 - p_back) ** 2 * (1.0 - 2.0 * p + 2.0 * p * x - x ** 2))
+    dyc_dx = np.where(front, 2.0 * m / p_front ** 2 * (p - x), 2.0 * m / (1.0 - p_back) ** 2 * (p - x))
+    slope = np.arctan(dyc_dx)
+
+    data = np.empty(yc.shape + (2,))
+    data[..., 0] = x - side * yt * np.sin(slope)
+    data[..., 1] = yc + side * yt * np.cos(slope)
+    data[:, [0, -1]] = [1.0, 0.0]
+
+    return data if batch else data[0]
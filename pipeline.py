@@ -0,0 +1,227 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import types
+from multiprocessing.pool import ThreadPool
+
+try:
+    import queue
+except ImportError:     # Python 2
+    import Queue as queue
+
+import numpy as np
+
+STATE_NAME = '.pipeline_state.json'
+PACKAGE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+class Stage(object):
+    """
+    Object to represent one step of a Pipeline: func(*args, **kwargs) reading the files inputs and writing outputs.
+    """
+    def __init__(self, name, func, args=(), kwargs=None, inputs=(), outputs=(), after=()):
+        """
+        :param inputs: files read by the stage, a stage writing one of them is run first.
+        :param outputs: files written by the stage, the stage is rerun if any is missing.
+        :param after: names of further stages that must finish first.
+        """
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+
+    def fingerprint(self, upstream):
+        """
+        :param upstream: fingerprints of the stages this stage depends on.
+        :return: hex digest of the function and the source files it depends on, parameters, input files and
+        upstream stages.
+        """
+        spec = [self.func.__module__, self.func.__name__,
+                [(path, _file_state(path)) for path in source_files(self.func.__module__)],
+                self.args, sorted(self.kwargs.items()),
+                [(path, _file_state(path)) for path in self.inputs], sorted(upstream)]
+        return hashlib.sha1(json.dumps(spec, default=_json_default).encode('utf-8')).hexdigest()
+
+
+class Pipeline(object):
+    """
+    Object to run Stages as a dependency graph. Stages whose dependencies have finished run concurrently on a
+    thread pool, and a stage is skipped when its fingerprint matches the last successful run recorded in
+    <folder_path>/.pipeline_state.json and all of its outputs exist.
+    """
+    def __init__(self, folder_path, processes=4):
+        self.state_path = os.path.join(folder_path, STATE_NAME)
+        self.processes = processes
+        self.stages = []
+        self.timings = {}
+
+    def add(self, stage):
+        if stage.name in [existing.name for existing in self.stages]:
+            raise ValueError('Duplicate pipeline stage {}'.format(stage.name))
+        self.stages.append(stage)
+        return stage
+
+    def dependencies(self):
+        """
+        :return: dict of stage name to set of names of the stages it waits for.
+        """
+        producers = dict((os.path.abspath(path), stage.name) for stage in self.stages for path in stage.outputs)
+        names = set(stage.name for stage in self.stages)
+        dependencies = {}
+        for stage in self.stages:
+            unknown = set(stage.after) - names
+            if unknown:
+                raise ValueError('Stage {} runs after unknown stages {}'.format(stage.name, sorted(unknown)))
+            inferred = set(producers[os.path.abspath(path)] for path in stage.inputs
+                           if os.path.abspath(path) in producers)
+            dependencies[stage.name] = (inferred | set(stage.after)) - set([stage.name])
+        return dependencies
+
+    def run(self, force=False, verbose=True):
+        """
+        Function to run every stage that is out of date.
+        :param force: run every stage regardless of the recorded state.
+        :return: dict of stage name to return value, for stages that ran.
+        """
+        dependencies = self.dependencies()
+        stages = dict((stage.name, stage) for stage in self.stages)
+        state = _read_state(self.state_path)
+        fingerprints, results, errors = {}, {}, {}
+        self.timings = {}
+        done = queue.Queue()
+        pending = set(stages)
+        running = set()
+
+        def execute(stage):
+            start = time.time()
+            try:
+                results[stage.name] = stage.func(*stage.args, **stage.kwargs)
+            except Exception as error:
+                errors[stage.name] = error
+            done.put((stage.name, time.time() - start))
+
+        pool = ThreadPool(self.processes)
+        start = time.time()
+        try:
+            while pending or running:
+                ready = [name for name in sorted(pending) if not dependencies[name] & (pending | running)]
+                for name in ready:
+                    pending.discard(name)
+                    stage = stages[name]
+                    if dependencies[name] & set(errors):
+                        errors[name] = None     # Blocked by a failed dependency
+                        self.timings[name] = ('blocked', 0.0)
+                        continue
+                    fingerprints[name] = stage.fingerprint([fingerprints[dependency]
+                                                            for dependency in dependencies[name]])
+                    if not force and state.get(name) == fingerprints[name] and \
+                            all(os.path.exists(path) for path in stage.outputs):
+                        self.timings[name] = ('skipped', 0.0)
+                        continue
+                    running.add(name)
+                    pool.apply_async(execute, (stage,))
+                if ready and not running:
+                    continue
+                if not running:
+                    raise ValueError('Pipeline has a dependency cycle between {}'.format(sorted(pending)))
+                name, seconds = done.get()
+                running.discard(name)
+                self.timings[name] = ('failed' if name in errors else 'ran', seconds)
+                if name not in errors:
+                    state[name] = fingerprints[name]
+                    _write_state(self.state_path, state)
+        finally:
+            pool.close()
+            pool.join()
+        self.timings['total'] = ('', time.time() - start)
+
+        if verbose:
+            print(self.summary())
+        failed = [error for error in errors.values() if error is not None]
+        if failed:
+            raise failed[0]
+        return results
+
+    def summary(self):
+        """
+        :return: table of the status and wall time of each stage in the last run.
+        """
+        lines = ['{:<30} {:>8} {:>10}'.format('stage', 'status', 'seconds')]
+        for name in [stage.name for stage in self.stages] + ['total']:
+            if name in self.timings:
+                status, seconds = self.timings[name]
+                lines.append('{:<30} {:>8} {:>10.2f}'.format(name, status, seconds))
+        return '\n'.join(lines)
+
+
+def source_files(module_name):
+    """
+    Function to find the source file of a module and of every module of this package it uses, directly or through
+    other modules of the package. Modules are found through the functions, classes and modules named in each module,
+    so deferred imports (lazy_import) of other packages are not loaded.
+    :return: sorted list of source file paths.
+    """
+    paths = set()
+    pending, seen = [module_name], set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        path = _source_path(getattr(sys.modules.get(name), '__file__', None))
+        if path is None or (name != module_name and os.path.dirname(path) != PACKAGE_FOLDER):
+            continue
+        paths.add(path)
+        for value in list(vars(sys.modules[name]).values()):
+            if isinstance(value, types.ModuleType):
+                pending.append(value.__name__)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                pending.append(value.__module__)
+    return sorted(paths)
+
+
+def _source_path(path):
+    if path is None:
+        return None
+    path = os.path.abspath(path)
+    if path.endswith('.pyc') and os.path.exists(path[:-1]):
+        path = path[:-1]
+    return path
+
+
+def _file_state(path):
+    if path is None or not os.path.exists(path):
+        return None
+    if path.endswith('.pyc') and os.path.exists(path[:-1]):
+        path = path[:-1]
+    stat = os.stat(path)
+    return [stat.st_mtime, stat.st_size]
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+def _read_state(state_path):
+    try:
+        with open(state_path) as state:
+            return json.load(state)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_state(state_path, state):
+    temp_path = '{}.{}.tmp'.format(state_path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.rename(temp_path, state_path)
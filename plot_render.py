@@ -0,0 +1,175 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+from lazy_import import lazy_module
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:     # Windows, concurrent renderers may drop each other's manifest entries
+    fcntl = None
+
+backend_agg = lazy_module('matplotlib.backends.backend_agg')
+mpl_figure = lazy_module('matplotlib.figure')
+
+MANIFEST_NAME = '.plot_manifest.json'
+MANIFEST_LOCK = '.plot_manifest.lock'
+
+
+class LinePlot(object):
+    """
+    Object to describe a line plot saved to path, rendered later by a PlotRenderer.
+    Only holds data, so it can be hashed and sent to worker processes.
+    """
+    def __init__(self, path, title='', xlabel='', ylabel='', legend=True):
+        self.path = path
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.legend = legend
+        self.lines = []
+        self.annotations = []
+
+    def line(self, x, y, fmt='-', label=None):
+        self.lines.append((np.asarray(x, dtype=float), np.asarray(y, dtype=float), fmt, label))
+        return self
+
+    def annotate(self, text, **kwargs):
+        self.annotations.append((text, kwargs))
+        return self
+
+    def digest(self):
+        """
+        :return: hex digest of everything drawn, used to skip figures whose data has not changed.
+        """
+        sha = hashlib.sha1(json.dumps([self.title, self.xlabel, self.ylabel, self.legend,
+                                       [[fmt, label] for x, y, fmt, label in self.lines],
+                                       self.annotations], sort_keys=True).encode('utf-8'))
+        for x, y, fmt, label in self.lines:
+            sha.update(np.ascontiguousarray(x).tobytes())
+            sha.update(np.ascontiguousarray(y).tobytes())
+        return sha.hexdigest()
+
+
+def render(plot):
+    """
+    Function to draw a LinePlot on its own Agg figure and save it, without touching pyplot state.
+    :return: path written.
+    """
+    with span('plot.figure', path=os.path.basename(plot.path)):
+        figure = mpl_figure.Figure()
+        backend_agg.FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        for x, y, fmt, label in plot.lines:
+            axes.plot(x, y, fmt, label=label)
+        for text, kwargs in plot.annotations:
+            axes.annotate(text, **kwargs)
+        axes.set_title(plot.title)
+        axes.set_xlabel(plot.xlabel)
+        axes.set_ylabel(plot.ylabel)
+        if plot.legend and any(label is not None for x, y, fmt, label in plot.lines):
+            axes.legend(loc='best', fontsize='small')
+        figure.savefig(plot.path)
+    return plot.path
+
+
+class PlotRenderer(object):
+    """
+    Object to collect LinePlots and render them together.
+    Figures whose file exists and whose digest matches the .plot_manifest.json of their folder are skipped,
+    the rest are spread over a pool of processes. The digests rendered are merged into the manifest under a file
+    lock, so renderers writing to the same folder at once keep each other's entries.
+    """
+    def __init__(self, processes=None, force=False):
+        """
+        :param processes: worker processes, defaults to the number of CPUs, 1 renders in this process.
+        :param force: render every figure regardless of the manifest.
+        """
+        self.processes = processes
+        self.force = force
+        self.plots = []
+
+    def add(self, plot):
+        self.plots.append(plot)
+        return plot
+
+    def render(self):
+        """
+        Function to render the figures added since the last call.
+        :return: list of paths rendered, skipped figures are not included.
+        """
+        plots, self.plots = self.plots, []
+        manifests = {}
+        updates = {}
+        stale = []
+        for plot in plots:
+            folder = os.path.dirname(os.path.abspath(plot.path))
+            manifest = manifests.setdefault(folder, _read_manifest(folder))
+            digest = plot.digest()
+            name = os.path.basename(plot.path)
+            if self.force or manifest.get(name) != digest or not os.path.exists(plot.path):
+                stale.append(plot)
+                updates.setdefault(folder, {})[name] = digest
+
+        with span('plot.render', figures=len(plots), stale=len(stale)):
+            paths = self._render(stale)
+
+        for folder, digests in updates.items():
+            _update_manifest(folder, digests)
+        return paths
+
+    def _render(self, stale):
+        if len(stale) > 1 and self.processes != 1:
+            pool = multiprocessing.Pool(min(self.processes or multiprocessing.cpu_count(), len(stale)))
+            try:
+                paths = pool.map(render, stale)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            paths = [render(plot) for plot in stale]
+        return paths
+
+
+def _read_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _update_manifest(folder, digests):
+    """
+    Function to merge digests into the manifest of folder, read again under the lock as another renderer may have
+    written it since.
+    """
+    with _locked(os.path.join(folder, MANIFEST_LOCK)):
+        manifest = _read_manifest(folder)
+        manifest.update(digests)
+        _write_manifest(folder, manifest)
+
+
+@contextmanager
+def _locked(lock_path):
+    with open(lock_path, 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _write_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST_NAME)
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.rename(temp_path, path)
@@ -0,0 +1,194 @@
+"""
+Local SQLite store of Xfoil polars keyed by aerofoil, Reynolds number, Mach number and alpha, queried by interpolating
+between the stored polars so design questions can be answered without running Xfoil again.
+"""
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+from tracing import span
+from xfoil_io import read_polar
+
+COLUMNS = ['CL', 'CD', 'CDp', 'CM', 'Top_Xtr', 'Bot_Xtr']
+CASE_SUFFIX = re.compile(r'_Re=[-+.\deE]+$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, mtime REAL, size INTEGER, aerofoil TEXT, reynolds_number REAL, mach_number REAL);
+CREATE TABLE IF NOT EXISTS points (
+    aerofoil TEXT NOT NULL, reynolds_number REAL NOT NULL, mach_number REAL NOT NULL, alpha REAL NOT NULL,
+    cl REAL, cd REAL, cdp REAL, cm REAL, top_xtr REAL, bot_xtr REAL,
+    PRIMARY KEY (aerofoil, reynolds_number, mach_number, alpha));
+"""
+
+
+class PolarDatabase(object):
+    """
+    Object to represent a database of polars.
+    Polar files are ingested once and again only when they change. For queries the polars of an aerofoil are read
+    once, on first use, and indexed by (log10 Re, M).
+    """
+    def __init__(self, path=':memory:'):
+        """
+        :param path: SQLite database file, by default held in memory.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._grids = {}
+
+    def ingest(self, file_path, aerofoil=None):
+        """
+        Function to store the points of a polar file, replacing those of any earlier version of the file.
+        :param aerofoil: name to store the polar under, defaults to the file name without _polar.dat and _Re=...
+        :return: number of points stored, 0 if the file has not changed since it was last ingested.
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        source = self.connection.execute('SELECT mtime, size, aerofoil, reynolds_number, mach_number FROM sources '
+                                         'WHERE path = ?', (path,)).fetchone()
+        if source is not None and tuple(source[:2]) == (stat.st_mtime, stat.st_size):
+            return 0
+
+        headers, data, conditions = read_polar(path)
+        aerofoil = aerofoil or polar_name(path)
+        reynolds_number = conditions.get('reynolds_number', 0.0)
+        mach_number = conditions.get('mach_number', 0.0)
+        data = data[:, [headers.index(header) for header in ['alpha'] + COLUMNS]]
+        rows = [(aerofoil, reynolds_number, mach_number) + tuple(row) for row in data.tolist()]
+        with self.connection:
+            if source is not None:
+                self.connection.execute('DELETE FROM points WHERE aerofoil = ? AND reynolds_number = ? AND '
+                                        'mach_number = ?', source[2:])
+                self._grids.pop(source[2], None)
+            self.connection.executemany('INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)',
+                                    (path, stat.st_mtime, stat.st_size, aerofoil, reynolds_number, mach_number))
+        self._grids.pop(aerofoil, None)
+        return len(rows)
+
+    def ingest_folder(self, folder_path, folder_names=None):
+        """
+        Function to ingest <folder_name>/<folder_name>_polar.dat for each folder, as written by run_xfoil.
+        :param folder_names: defaults to every folder in folder_path with a polar.
+        :return: number of points stored.
+        """
+        if folder_names is None:
+            folder_names = [name for name in sorted(os.listdir(folder_path))
+                            if os.path.exists(os.path.join(folder_path, name, '{}_polar.dat'.format(name)))]
+        return sum(self.ingest(os.path.join(folder_path, name, '{}_polar.dat'.format(name)), polar_name(name))
+                   for name in folder_names)
+
+    def aerofoils(self):
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT aerofoil FROM points ORDER BY aerofoil')]
+
+    def conditions(self, aerofoil):
+        """
+        :return: list of (Reynolds number, Mach number) with a polar stored for aerofoil.
+        """
+        return self.connection.execute('SELECT DISTINCT reynolds_number, mach_number FROM points WHERE aerofoil = ? '
+                                        'ORDER BY reynolds_number, mach_number', (aerofoil,)).fetchall()
+
+    def polar(self, aerofoil, reynolds_number, mach_number=0.0):
+        """
+        :return: array of the stored points (alpha and COLUMNS) of one polar, sorted by alpha.
+        """
+        rows = self.connection.execute('SELECT alpha, cl, cd, cdp, cm, top_xtr, bot_xtr FROM points WHERE '
+                                       'aerofoil = ? AND reynolds_number = ? AND mach_number = ? ORDER BY alpha',
+                                       (aerofoil, reynolds_number, mach_number)).fetchall()
+        return np.array(rows, dtype=float).reshape(-1, len(COLUMNS) + 1)
+
+    def query(self, aerofoil, reynolds_number, mach_number, alpha, columns=COLUMNS):
+        """
+        Function to interpolate between the stored polars of aerofoil. Each polar is interpolated linearly in alpha,
+        then the polars at the corners of the (log10 Re, M) cell around the point are blended bilinearly, over the
+        corners whose polar covers alpha only. At a stored (Re, M) the stored polar is returned. The stored cases need
+        not form a full Re x M grid, a missing combination is left out of the cells it bounds like a polar that does
+        not cover alpha. Re or M with a single stored value are not interpolated over, so e.g. a database of one Mach
+        number answers for any mach_number. Outside the stored Re and M ranges, or where no corner covers alpha, the
+        result is NaN.
+        The arguments are broadcast against each other.
+        :return: dict of column name to array of the broadcast shape of the arguments.
+        """
+        axes, cases, polars = self._polars(aerofoil)
+        coords = [np.ravel(coord) for coord in np.broadcast_arrays(
+            np.log10(np.maximum(np.asarray(reynolds_number, dtype=float), 1.0)), np.asarray(mach_number, dtype=float),
+            np.asarray(alpha, dtype=float))]
+        shape = np.broadcast(reynolds_number, mach_number, alpha).shape
+        with span('polar_db.query', aerofoil=aerofoil, points=len(coords[2])):
+            indices, fractions = [], []
+            inside = np.ones(len(coords[2]), dtype=bool)
+            for axis, coord in zip(axes, coords):
+                if len(axis) == 1:
+                    indices.append(np.zeros(len(coord), dtype=int))
+                    fractions.append(np.zeros(len(coord)))
+                    continue
+                idx = np.clip(np.searchsorted(axis, coord, side='right') - 1, 0, len(axis) - 2)
+                indices.append(idx)
+                fractions.append((coord - axis[idx]) / (axis[idx + 1] - axis[idx]))
+                inside &= (coord >= axis[0]) & (coord <= axis[-1])
+
+            values = np.zeros((len(coords[2]), len(COLUMNS)))
+            total = np.zeros(len(coords[2]))
+            for corner in np.ndindex(2, 2):
+                if any(offset and len(axis) == 1 for offset, axis in zip(corner, axes)):
+                    continue
+                weight = np.ones(len(coords[2]))
+                for offset, fraction in zip(corner, fractions):
+                    weight *= fraction if offset else 1.0 - fraction
+                case = cases[indices[0] + corner[0], indices[1] + corner[1]]
+                used = inside & (weight > 0.0) & (case >= 0)
+                for idx in np.unique(case[used]):
+                    points = np.flatnonzero(used & (case == idx))
+                    polar = polars[idx]
+                    covered = (coords[2][points] >= polar[0, 0]) & (coords[2][points] <= polar[-1, 0])
+                    points = points[covered]
+                    for k in range(len(COLUMNS)):
+                        values[points, k] += weight[points] * np.interp(coords[2][points], polar[:, 0],
+                                                                        polar[:, 1 + k])
+                    total[points] += weight[points]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.where(total[:, np.newaxis] > 0.0, values / total[:, np.newaxis], np.nan)
+        return dict((column, values[:, COLUMNS.index(column)].reshape(shape)) for column in columns)
+
+    def _polars(self, aerofoil):
+        """
+        :return: (log10 Re, M) axes, array (len Re, len M) of the index of the polar stored for each combination
+        (-1 where none is) and list of polar arrays (alpha and COLUMNS).
+        """
+        if aerofoil not in self._grids:
+            with span('polar_db.grid', aerofoil=aerofoil):
+                conditions = self.conditions(aerofoil)
+                if not conditions:
+                    raise KeyError('No polars stored for {}'.format(aerofoil))
+                conditions = np.array(conditions, dtype=float)
+                log_re = np.log10(np.maximum(conditions[:, 0], 1.0))
+                axes = [np.unique(log_re), np.unique(conditions[:, 1])]
+                cases = np.full([len(axis) for axis in axes], -1, dtype=int)
+                cases[np.searchsorted(axes[0], log_re), np.searchsorted(axes[1], conditions[:, 1])] = \
+                    np.arange(len(conditions))
+                polars = [self.polar(aerofoil, reynolds_number, mach_number)
+                          for reynolds_number, mach_number in conditions]
+                self._grids[aerofoil] = axes, cases, polars
+        return self._grids[aerofoil]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def polar_name(path):
+    """
+    :return: aerofoil name of a polar file or case folder, e.g. naca1510 for naca1510_Re=1000000.0_polar.dat.
+    """
+    name = os.path.basename(path)
+    if name.endswith('_polar.dat'):
+        name = name[:-len('_polar.dat')]
+    return CASE_SUFFIX.sub('', name)
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class ResultCache(object):
+    """
+    Object to represent a content addressed on-disk cache of aerofoil results.
+    Entries are compressed .npz files named by a hash of the evaluation parameters.
+    Once the folder exceeds max_bytes the least recently used entries are evicted. The size of the folder is
+    counted once and then kept up to date by each store, so the folder is only listed again when it is over the cap
+    (entries stored by other processes are counted at that point). One cache may be shared between threads.
+    """
+    def __init__(self, folder_path, max_bytes=512 * 2 ** 20):
+        self.folder_path = folder_path
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None  # Size of the folder, counted on the first store
+        self._lock = threading.Lock()   # Guards the counters and the size of the folder
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+
+    @staticmethod
+    def key(params):
+        """
+        :param params: dict of JSON serialisable parameters identifying an evaluation.
+        :return: hex digest used as the entry name.
+        """
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder_path, '{}.npz'.format(key))
+
+    def load(self, key):
+        """
+        :return: dict of arrays stored under key, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                arrays = dict((name, entry[name]) for name in entry.files)
+            os.utime(path, None)    # Modification time orders entries for eviction
+        except (IOError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return arrays
+
+    def store(self, key, **arrays):
+        """
+        Function to write arrays under key, written to a temporary file first so readers never see partial entries.
+        """
+        path = self._path(key)
+        # A unique temporary file per call, threads and processes may store the same key at once
+        handle, temp_path = tempfile.mkstemp(dir=self.folder_path, prefix='.tmp', suffix='.npz')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez_compressed(temp_file, **arrays)
+            with self._lock:
+                if self._bytes is None:
+                    self._bytes = sum(size for mtime, size, name in self._entries())
+                try:
+                    self._bytes -= os.path.getsize(path)    # Replacing an entry
+                except OSError:
+                    pass
+                self._bytes += os.path.getsize(temp_path)
+                os.rename(temp_path, path)
+                if self._bytes > self.max_bytes:
+                    self._evict()
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.folder_path):
+            if name.endswith('.npz') and '.tmp' not in name:
+                try:
+                    stat = os.stat(os.path.join(self.folder_path, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.folder_path, name))
+            except OSError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def stats(self):
+        entries = self._entries()
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(entries), 'bytes': sum(size for mtime, size, name in entries)}
+
+    def clear(self):
+        with self._lock:
+            for mtime, size, name in self._entries():
+                os.remove(os.path.join(self.folder_path, name))
+            self._bytes = 0
+
+
+_default_cache = None
+
+
+def set_default_cache(cache):
+    """
+    Function to set the cache used by aerofoils not given one explicitly, None to disable caching.
+    """
+    global _default_cache
+    _default_cache = cache
+
+
+def get_default_cache():
+    return _default_cache
@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+from lazy_import import lazy_module
+from tracing import span
+
+try:
+    import queue
+except ImportError:     # Python 2
+    import Queue as queue
+
+pd = lazy_module('pandas')
+
+
+class ExcelBackend(object):
+    """
+    One .xlsx workbook, a sheet per table. Slowest backend, kept for reports.
+    """
+    extension = '.xlsx'
+
+    def __init__(self, path):
+        self.writer = pd.ExcelWriter(path + self.extension)
+
+    def write(self, name, frame):
+        frame.to_excel(self.writer, name)
+
+    def close(self):
+        self.writer.close()
+
+
+class CsvBackend(object):
+    """
+    A folder with one <table>.csv per table.
+    """
+    extension = ''
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def write(self, name, frame):
+        frame.to_csv(os.path.join(self.path, '{}.csv'.format(_safe_name(name))))
+
+    def close(self):
+        pass
+
+
+class NpzBackend(object):
+    """
+    One uncompressed .npz archive holding the values, columns and index of every table, read back by read_npz.
+    """
+    extension = '.npz'
+
+    def __init__(self, path):
+        self.path = path
+        self.arrays = {}
+        self.names = []
+
+    def write(self, name, frame):
+        values = frame.values
+        if values.dtype == object:
+            try:
+                values = values.astype(float)
+            except (TypeError, ValueError):
+                pass
+        key = 'table{}'.format(len(self.names))
+        self.names.append(name)
+        self.arrays[key + '_values'] = values
+        self.arrays[key + '_columns'] = np.array([str(column) for column in frame.columns])
+        self.arrays[key + '_index'] = np.asarray(frame.index)
+
+    def close(self):
+        np.savez(self.path + self.extension, names=np.array(self.names, dtype=str), **self.arrays)
+
+
+class Hdf5Backend(object):
+    """
+    One .h5 store with a node per table, needs PyTables.
+    """
+    extension = '.h5'
+
+    def __init__(self, path):
+        self.store = pd.HDFStore(path + self.extension, mode='w')
+
+    def write(self, name, frame):
+        self.store.put(_safe_name(name), frame)
+
+    def close(self):
+        self.store.close()
+
+
+BACKENDS = {'excel': ExcelBackend, 'csv': CsvBackend, 'npz': NpzBackend, 'hdf5': Hdf5Backend}
+
+
+class ResultWriter(object):
+    """
+    Object to write named tables (DataFrames) through an interchangeable backend.
+    Tables are queued and serialised in batches by a background thread, so callers only pay for the
+    serialisation at close(). Frames must not be modified after they are passed to write().
+    """
+    def __init__(self, path, backend=None, buffer_size=64):
+        """
+        :param path: output path without extension, the backend adds its own.
+        :param backend: key of BACKENDS, defaults to the process default (see set_default_backend).
+        :param buffer_size: number of tables queued before write() blocks.
+        """
+        self.backend_name = backend or get_default_backend()
+        self.backend = BACKENDS[self.backend_name](path)
+        self.path = path + self.backend.extension
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(buffer_size,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, buffer_size):
+        finished = False
+        while not finished:
+            batch = [self._queue.get()]
+            while len(batch) < buffer_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with span('write.{}'.format(self.backend_name), tables=len(batch)):
+                for item in batch:
+                    if item is None:
+                        finished = True
+                    elif self._error is None:
+                        try:
+                            self.backend.write(*item)
+                        except Exception as error:
+                            self._error = error
+
+    def write(self, name, frame):
+        """
+        Function to queue frame to be written as table name.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((name, frame))
+
+    def close(self):
+        """
+        Function to wait for queued tables and finalise the output file.
+        :return: path written.
+        """
+        with span('write.close', path=self.path):
+            if self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            if self._error is not None:
+                raise self._error
+            self.backend.close()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_npz(file_path):
+    """
+    Function to read an archive written by the npz backend.
+    :return: dict of table name to DataFrame.
+    """
+    with np.load(file_path, allow_pickle=True) as archive:
+        return dict((str(name), pd.DataFrame(archive['table{}_values'.format(idx)],
+                                             columns=archive['table{}_columns'.format(idx)],
+                                             index=archive['table{}_index'.format(idx)]))
+                    for idx, name in enumerate(archive['names']))
+
+
+def _safe_name(name):
+    return re.sub(r'[^\w.=+-]', '_', str(name))
+
+
+_default_backend = 'excel'
+
+
+def set_default_backend(backend):
+    """
+    Function to choose the backend used by every stage that does not ask for one, e.g. 'npz' for large runs.
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown result backend {}, expected one of {}'.format(backend, sorted(BACKENDS)))
+    global _default_backend
+    _default_backend = backend
+
+
+def get_default_backend():
+    return _default_backend
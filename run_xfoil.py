@@ -1,9 +1,19 @@
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
-XFOIL_PATH = '/Applications/University/Xfoil.app/Contents/Resources/xfoil'
+from tracing import span
+from xfoil_io import read_polar
+from xfoil_session import XFoilSession
+
+XFOIL_PATH = os.environ.get('XFOIL_PATH', '/Applications/University/Xfoil.app/Contents/Resources/xfoil')
+POLAR_HEADER_LINES = 12
 
 
 def run_xfoil(folder_path,
@@ -14,21 +24,387 @@ def run_xfoil(folder_path,
     """
     Function to generate commands.in file and then run Xfoil.
     """
+    name, output_folder, load_data = _prepare_case(folder_path, aerofoil_filename, naca_4_name)
+
+    command_filepath = os.path.abspath(os.path.join(output_folder, 'commands.in'))
+    output_file = os.path.abspath(os.path.join(output_folder, '{}_polar.dat'.format(name)))
+
+    _write_commands(command_filepath, load_data, reynolds_number, mach_number, iterations, output_file,
+                    _alpha_range(min_alpha, max_alpha, step_alpha), output_folder, name)
+
+    run_command = '{} < {}'.format(XFOIL_PATH, command_filepath)
+
+    with span('xfoil.run', aerofoil=name, reynolds_number=reynolds_number):
+        os.system(run_command)
+
+
+def run_xfoil_parallel(folder_path,
+                       reynolds_numbers, mach_number,
+                       min_alpha, max_alpha, step_alpha,
+                       iterations,
+                       aerofoil_filenames=(), naca_4_names=(),
+                       processes=4, chunks=None, timeout=600.0, xfoil_path=None):
+    """
+    Function to run Xfoil for several aerofoils and Reynolds numbers with the alpha range of each case split
+    across a pool of Xfoil processes. Every process works in its own directory and writes a partial polar,
+    the partial polars are merged into <name>/<name>_polar.dat in the layout written by run_xfoil.
+    With more than one Reynolds number each case is named <name>_Re=<reynolds_number>.
+    :param chunks: number of alpha partitions per case, defaults to processes.
+    :param timeout: seconds before a single Xfoil process is killed.
+    :param xfoil_path: Xfoil executable (or argument list), e.g. fake_xfoil.py for testing.
+    :return: dict of case name to list of (first alpha, last alpha, return code) per partition.
+    :raises RuntimeError: if every partition of a case failed, after the other cases are merged.
+    """
+    reynolds_numbers = np.atleast_1d(reynolds_numbers).tolist()
+    alphas = _alpha_range(min_alpha, max_alpha, step_alpha)
+    partitions = [chunk for chunk in np.array_split(alphas, chunks or processes) if len(chunk)]
+
+    cases = []
+    for aerofoil_filename, naca_4_name in [(filename, None) for filename in aerofoil_filenames] + \
+                                          [(None, naca) for naca in naca_4_names]:
+        for reynolds_number in reynolds_numbers:
+            suffix = '_Re={}'.format(reynolds_number) if len(reynolds_numbers) > 1 else ''
+            cases.append(_prepare_case(folder_path, aerofoil_filename, naca_4_name, suffix) + (reynolds_number,))
+
+    jobs = [(case, partition) for case in cases for partition in partitions]
+
+    def run_job(job):
+        (name, output_folder, load_data, reynolds_number), partition = job
+        work_folder = os.path.abspath(tempfile.mkdtemp(prefix='.xfoil_', dir=output_folder))  # Xfoil runs in it
+        command_filepath = os.path.join(work_folder, 'commands.in')
+        partial_polar = os.path.join(work_folder, 'polar.dat')
+        _write_commands(command_filepath, load_data, reynolds_number, mach_number, iterations, partial_polar,
+                        _seed_alphas(partition[0]) + partition.tolist(), output_folder, name, dump_alphas=partition)
+        with span('xfoil.job', aerofoil=name, first_alpha=float(partition[0]), last_alpha=float(partition[-1])):
+            return_code = _run_with_timeout(xfoil_path or XFOIL_PATH, command_filepath, work_folder, timeout)
+        return work_folder, return_code
+
+    pool = ThreadPool(processes)
+    try:
+        results = pool.map(run_job, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    status, failures = {}, []
+    for case in cases:
+        name, output_folder = case[:2]
+        case_results = [(partition, result)
+                        for (job_case, partition), result in zip(jobs, results) if job_case is case]
+        partial_polars = [(os.path.join(work_folder, 'polar.dat'), partition)
+                          for partition, (work_folder, return_code) in case_results]
+        with span('xfoil.merge', aerofoil=name):
+            merge_polars(partial_polars, os.path.join(output_folder, '{}_polar.dat'.format(name)))
+        status[name] = [(partition[0], partition[-1], return_code)
+                        for partition, (work_folder, return_code) in case_results]
+        if all(return_code != 0 for partition, (work_folder, return_code) in case_results):
+            failures.append('{} (return codes {}):\n{}'.format(
+                name, [return_code for partition, (work_folder, return_code) in case_results],
+                _log_tail(case_results[0][1][0])))
+        for partition, (work_folder, return_code) in case_results:
+            shutil.rmtree(work_folder, ignore_errors=True)
+    if failures:
+        raise RuntimeError('Every Xfoil partition failed for {}'.format('\n'.join(failures)))
+    return status
+
+
+def run_xfoil_session(folder_path,
+                      reynolds_numbers, mach_number,
+                      min_alpha, max_alpha, step_alpha,
+                      iterations,
+                      aerofoil_filenames=(), naca_4_names=(),
+                      stall_drop=0.1, xfoil_path=None, session=None,
+                      adaptive=False, max_step=1.0, tol=0.01):
+    """
+    Function to run several aerofoils and Reynolds numbers through one persistent Xfoil session, writing
+    <name>/<name>_polar.dat and the cp/bl files at every 0.5 degrees as run_xfoil does.
+    Each polar stops once CL has dropped stall_drop (fraction) below its maximum, None runs to max_alpha.
+    With more than one Reynolds number each case is named <name>_Re=<reynolds_number>.
+    :param session: XFoilSession to reuse, by default one is started and closed here.
+    :param adaptive: march alpha with steps between step_alpha and max_step chosen from the CL-alpha curve
+    (see XFoilSession.adaptive_polar) rather than every step_alpha.
+    :param tol: CL error allowed from linear extrapolation before an adaptive step is refined.
+    :return: dict of case name to list of Points in the order they were run.
+    """
+    reynolds_numbers = np.atleast_1d(reynolds_numbers).tolist()
+    alphas = _alpha_range(min_alpha, max_alpha, step_alpha)
+    owned = session is None
+    session = session or XFoilSession(xfoil_path or XFOIL_PATH, cwd=folder_path)
+    results = {}
+    try:
+        for aerofoil_filename, naca_4_name in [(filename, None) for filename in aerofoil_filenames] + \
+                                              [(None, naca) for naca in naca_4_names]:
+            if aerofoil_filename is not None:
+                session.load(os.path.join(folder_path, aerofoil_filename))
+            else:
+                session.naca(naca_4_name)
+            for reynolds_number in reynolds_numbers:
+                suffix = '_Re={}'.format(reynolds_number) if len(reynolds_numbers) > 1 else ''
+                name, output_folder, load_data = _prepare_case(folder_path, aerofoil_filename, naca_4_name, suffix)
+                polar_file = os.path.join(output_folder, '{}_polar.dat'.format(name))
+                if os.path.exists(polar_file):
+                    os.remove(polar_file)   # Xfoil appends to an existing polar
+                with span('xfoil.session_polar', aerofoil=name, reynolds_number=reynolds_number):
+                    session.oper(reynolds_number, mach_number, iterations)
+                    session.accumulate(polar_file)
+                    results[name] = []
+                    if adaptive:
+                        points = session.adaptive_polar(min_alpha, alphas[-1], step_alpha, max_step, tol,
+                                                        stall_drop=stall_drop,
+                                                        required=[alpha for alpha in alphas if _is_dump_alpha(alpha)])
+                    else:
+                        points = session.polar(alphas, stall_drop)
+                    for point in points:
+                        results[name].append(point)
+                        if point.converged and _is_dump_alpha(point.alpha):
+                            alpha = np.round(point.alpha, 2)
+                            session.dump(os.path.join(output_folder, '{}_alpha={}.bl'.format(name, alpha)))
+                            session.cpwr(os.path.join(output_folder, '{}_alpha={}.cp'.format(name, alpha)))
+                    session.accumulate(None)
+                if adaptive:
+                    merge_polars([], polar_file, append=True)     # Sort the points by alpha
+    finally:
+        if owned:
+            session.close()
+    return results
+
+
+def resume_xfoil(folder_path,
+                 reynolds_numbers, mach_number,
+                 min_alpha, max_alpha, step_alpha,
+                 iterations,
+                 aerofoil_filenames=(), naca_4_names=(),
+                 retries=2, stall_drop=0.1, xfoil_path=None, session=None):
+    """
+    Function to complete the output of an interrupted or partly failed run_xfoil, run_xfoil_parallel or
+    run_xfoil_session call with the same arguments. Only alphas missing from <name>/<name>_polar.dat (Xfoil only
+    writes converged points) or missing a cp/bl file are rerun, each seeded from the nearest converged alpha, and the
+    new points are merged into the polar. Alphas past the stall_drop cut-off of the polar (including the new points)
+    are not rerun.
+    A point that fails is retried up to retries times after reinitialising the boundary layer, re-solving the seed
+    and approaching the point in more steps each time. A session that exits is restarted.
+    :return: dict of case name to (alphas rerun, alphas still missing).
+    """
+    reynolds_numbers = np.atleast_1d(reynolds_numbers).tolist()
+    alphas = _alpha_range(min_alpha, max_alpha, step_alpha)
+    owned = session is None
+    status = {}
+    try:
+        for aerofoil_filename, naca_4_name in [(filename, None) for filename in aerofoil_filenames] + \
+                                              [(None, naca) for naca in naca_4_names]:
+            for reynolds_number in reynolds_numbers:
+                suffix = '_Re={}'.format(reynolds_number) if len(reynolds_numbers) > 1 else ''
+                name, output_folder, load_data = _prepare_case(folder_path, aerofoil_filename, naca_4_name, suffix)
+                polar_file = os.path.join(output_folder, '{}_polar.dat'.format(name))
+                converged, missing = _missing_alphas(polar_file, output_folder, name, alphas, stall_drop)
+                if not missing:
+                    status[name] = ([], [])
+                    continue
+
+                case = (folder_path, aerofoil_filename, naca_4_name, reynolds_number, mach_number, iterations)
+                temp_polars = [os.path.join(output_folder, '.resume_polar.dat')]
+                with span('xfoil.resume', aerofoil=name, reynolds_number=reynolds_number, missing=len(missing)):
+                    session = _start_case(session, xfoil_path, case, temp_polars[-1])
+                    rerun, failed, last = [], [], None
+                    cut_off = np.inf
+                    for alpha in _resume_order(missing, sorted(converged), step_alpha):
+                        if alpha > cut_off:
+                            continue
+                        point = None
+                        for attempt in range(retries + 1):
+                            seeds = [value for value in converged if value != alpha]
+                            if attempt == 0 and last is not None and abs(alpha - last) <= 1.5 * step_alpha:
+                                route = [alpha]     # Continue the march from the previous point
+                            elif not seeds:
+                                route = _seed_alphas(alpha) + [alpha]
+                            else:
+                                seed = min(seeds, key=lambda value: abs(value - alpha))
+                                route = np.round(np.linspace(seed, alpha, attempt + 2), 2).tolist()
+                            try:
+                                if len(route) > 1 or attempt:
+                                    session.command('init')
+                                for value in route:
+                                    point = session.alfa(value)
+                            except RuntimeError:    # Xfoil exited or hung, restart it
+                                if not owned:
+                                    raise
+                                point = None
+                                try:
+                                    session.close()
+                                finally:
+                                    session = None
+                                temp_polars.append(os.path.join(output_folder,
+                                                                '.resume_polar{}.dat'.format(len(temp_polars))))
+                                session = _start_case(None, xfoil_path, case, temp_polars[-1])
+                                continue
+                            if point.converged:
+                                break
+                        last = alpha if point is not None and point.converged else None
+                        if last is None:
+                            failed.append(alpha)
+                            continue
+                        converged[alpha] = point.cl
+                        rerun.append(alpha)
+                        cl_max = max(cl for value, cl in converged.items() if value <= alpha)
+                        if stall_drop is not None and cl_max > 0.0 and point.cl < (1.0 - stall_drop) * cl_max:
+                            cut_off = min(cut_off, alpha)
+                        if _is_dump_alpha(alpha):
+                            session.dump(os.path.join(output_folder, '{}_alpha={}.bl'.format(name, alpha)))
+                            session.cpwr(os.path.join(output_folder, '{}_alpha={}.cp'.format(name, alpha)))
+                    session.accumulate(None)
+                    merge_polars([(temp_polar, rerun) for temp_polar in temp_polars], polar_file, append=True)
+                for temp_polar in temp_polars:
+                    if os.path.exists(temp_polar):
+                        os.remove(temp_polar)
+                status[name] = (rerun, failed)
+    finally:
+        if owned and session is not None:
+            session.close()
+    return status
+
+
+def merge_polars(partial_polars, output_file, append=False):
+    """
+    Function to merge partial Xfoil polars into one polar sorted by alpha, keeping the header of the first.
+    Later files take precedence for repeated alphas.
+    :param partial_polars: list of (polar file path, alphas to keep or None for all).
+    :param output_file: path of merged polar.
+    :param append: merge into the existing output_file rather than replacing it.
+    """
+    header, rows = None, {}
+    for path, keep in ([(output_file, None)] if append else []) + list(partial_polars):
+        if not os.path.exists(path):
+            continue
+        with open(path) as polar:
+            lines = polar.readlines()
+        if len(lines) < POLAR_HEADER_LINES:
+            continue
+        header = header or lines[:POLAR_HEADER_LINES]
+        keep = None if keep is None else set(np.round(keep, 2))
+        for line in lines[POLAR_HEADER_LINES:]:
+            if line.strip():
+                alpha = round(float(line.split()[0]), 2)
+                if keep is None or alpha in keep:
+                    rows[alpha] = line
+    if header is None:
+        return
+    with open(output_file, 'w') as polar:
+        polar.writelines(header + [rows[alpha] for alpha in sorted(rows)])
+
+
+def _prepare_case(folder_path, aerofoil_filename, naca_4_name, suffix=''):
+    """
+    :return: case name, output folder (created if missing) and Xfoil command loading the aerofoil.
+    """
     folder_name = aerofoil_filename if aerofoil_filename is not None else 'naca{}'.format(naca_4_name)
-    name = folder_name.split('.dat')[0]
+    name = folder_name.split('.dat')[0] + suffix
     output_folder = os.path.join(folder_path, name)
     if not os.path.exists(output_folder):
         os.mkdir(output_folder)
 
-    command_filepath = os.path.abspath(os.path.join(output_folder, 'commands.in'))
     load_data = 'load {}\n'.format(os.path.abspath(os.path.join(folder_path, aerofoil_filename))) \
         if aerofoil_filename is not None else 'naca {}\n'.format(naca_4_name)
+    return name, output_folder, load_data
+
+
+def _missing_alphas(polar_file, output_folder, name, alphas, stall_drop=None):
+    """
+    Function to compare the output of a case with the alphas requested.
+    :return: dict of converged alpha to CL in the polar and list of requested alphas not in the polar or, at 0.5
+    degree angles, without both cp/bl files. Alphas past the stall_drop cut-off of the polar are not missing.
+    """
+    converged, cl = [], []
+    if os.path.exists(polar_file):
+        headers, data, conditions = read_polar(polar_file)
+        if len(data):
+            order = np.argsort(data[:, 0])
+            converged, cl = np.round(data[order, 0], 2).tolist(), data[order, 1]
+
+    cut_off = np.inf
+    if stall_drop is not None and len(cl):
+        stalled = (cl < (1.0 - stall_drop) * np.maximum.accumulate(cl)) & (np.maximum.accumulate(cl) > 0.0)
+        if stalled.any():
+            cut_off = converged[int(np.argmax(stalled))]
+
+    done = set(converged)
+    missing = []
+    for alpha in np.round(alphas, 2).tolist():
+        if alpha > cut_off:
+            break
+        files = [os.path.join(output_folder, '{}_alpha={}.{}'.format(name, alpha, kind)) for kind in ('bl', 'cp')]
+        if alpha not in done or (_is_dump_alpha(alpha) and
+                                 not all(os.path.exists(path) and os.path.getsize(path) for path in files)):
+            missing.append(alpha)
+    return dict(zip(converged, cl)), missing
+
+
+def _start_case(session, xfoil_path, case, polar_file):
+    """
+    Function to set up a session for a case, accumulating into polar_file.
+    :param session: XFoilSession to reuse, None to start one.
+    :param case: folder path, aerofoil filename, NACA name, Reynolds number, Mach number and iterations.
+    :return: the session.
+    """
+    folder_path, aerofoil_filename, naca_4_name, reynolds_number, mach_number, iterations = case
+    session = session or XFoilSession(xfoil_path or XFOIL_PATH, cwd=folder_path)
+    if aerofoil_filename is not None:
+        session.load(os.path.join(folder_path, aerofoil_filename))
+    else:
+        session.naca(naca_4_name)
+    session.oper(reynolds_number, mach_number, iterations)
+    if os.path.exists(polar_file):
+        os.remove(polar_file)
+    session.accumulate(polar_file)
+    return session
+
+
+def _resume_order(missing, converged, step_alpha):
+    """
+    Function to split the missing alphas into runs of consecutive alphas, each marched away from the nearer of its
+    converged neighbours.
+    :return: list of alphas in the order to run them.
+    """
+    runs = []
+    for alpha in missing:
+        if runs and alpha - runs[-1][-1] <= 1.5 * step_alpha:
+            runs[-1].append(alpha)
+        else:
+            runs.append([alpha])
+    order = []
+    for run in runs:
+        below = [value for value in converged if value < run[0]]
+        above = [value for value in converged if value > run[-1]]
+        if above and (not below or above[0] - run[-1] < run[0] - below[-1]):
+            run = run[::-1]
+        order.extend(run)
+    return order
+
+
+def _alpha_range(min_alpha, max_alpha, step_alpha):
+    return np.round(np.arange(min_alpha, max_alpha, step_alpha), 2)
 
-    output_file = os.path.abspath(os.path.join(output_folder, '{}_polar.dat'.format(name)))
 
+def _seed_alphas(alpha, step=2.0):
+    """
+    :return: coarse alphas marching from 0 towards alpha so a partition starts from a converged boundary layer.
+    """
+    return np.round(np.arange(0.0, alpha, np.sign(alpha) * step), 2).tolist() if abs(alpha) > step else []
+
+
+def _is_dump_alpha(alpha):
+    return not (np.round(alpha, 2) * 10) % 5     # Only write files for .5, .0 alpha
+
+
+def _write_commands(command_filepath, load_data, reynolds_number, mach_number, iterations, output_file,
+                    alphas, output_folder, name, dump_alphas=None):
+    """
+    Function to write an Xfoil command file running alphas and dumping cp/bl files at every 0.5 degrees.
+    :param dump_alphas: alphas eligible for cp/bl files, defaults to all alphas.
+    """
+    dump_alphas = set(np.round(dump_alphas if dump_alphas is not None else alphas, 2))
     with open(command_filepath, 'w') as command:
         command.write(load_data)
-        if aerofoil_filename is not None:
+        if load_data.startswith('load'):
             command.write('aerofoil\n')
             command.write('panel\n')
         command.write('oper\n')
@@ -38,10 +414,10 @@ def run_xfoil(folder_path,
         command.write('Pacc \n{}\n \n'.format(output_file))
         command.write('iter {}\n'.format(iterations))
 
-        for alpha in np.arange(min_alpha, max_alpha, step_alpha):
+        for alpha in alphas:
             alpha = np.round(alpha, 2)
             command.write('Alfa {}\n'.format(alpha))
-            if not (np.round(alpha, 2) * 10) % 5:   # Only write files for .5, .0 alpha (i.e 0.0, 0.5 etc)
+            if alpha in dump_alphas and _is_dump_alpha(alpha):
                 dump_file = os.path.abspath(os.path.join(output_folder, '{}_alpha={}.bl'.format(name, alpha)))
                 cp_file = os.path.abspath(os.path.join(output_folder, '{}_alpha={}.cp'.format(name, alpha)))
                 command.write('DUMP {}\n'.format(dump_file))
@@ -50,9 +426,39 @@ def run_xfoil(folder_path,
         command.write('\n')
         command.write('quit\n')
 
-    run_command = '{} < {}'.format(XFOIL_PATH, command_filepath)
 
-    os.system(run_command)
+def _run_with_timeout(xfoil_path, command_filepath, work_folder, timeout):
+    """
+    Function to run Xfoil on a command file, killing it after timeout seconds.
+    :return: Xfoil return code, None if it timed out.
+    """
+    args = list(xfoil_path) if isinstance(xfoil_path, (list, tuple)) else [xfoil_path]
+    timed_out = []
+
+    def kill(process):
+        timed_out.append(True)
+        process.kill()
+
+    with open(command_filepath) as commands, open(os.path.join(work_folder, 'xfoil.log'), 'w') as log:
+        process = subprocess.Popen(args, stdin=commands, stdout=log, stderr=subprocess.STDOUT, cwd=work_folder)
+        timer = threading.Timer(timeout, kill, [process])
+        timer.start()
+        try:
+            return_code = process.wait()
+        finally:
+            timer.cancel()
+    return None if timed_out else return_code
+
+
+def _log_tail(work_folder, lines=20):
+    """
+    :return: last lines of the Xfoil log in work_folder.
+    """
+    try:
+        with open(os.path.join(work_folder, 'xfoil.log')) as log:
+            return ''.join(log.readlines()[-lines:])
+    except (IOError, OSError):
+        return ''
 
 
 if __name__ == '__main__':
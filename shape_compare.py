@@ -0,0 +1,134 @@
+"""
+Vectorised comparison of aerofoil sections. Sections with any number of points are resampled onto one cosine spaced
+chord grid and every pair of two sets of sections is compared at once.
+"""
+import itertools
+
+import numpy as np
+
+from aerofoil_geometry import AerofoilGeometry
+from lazy_import import lazy_module
+from naca_aerofoil import naca4
+from tracing import span
+
+pd = lazy_module('pandas')
+
+METRICS = ['max_deviation', 'rms_deviation', 'camber_error', 'thickness_error', 'area_difference']
+BLOCK_ELEMENTS = 2 ** 22    # Pairs x chord points per block of the max metrics, bounds the memory used
+
+
+class Sections(object):
+    """
+    Object to represent k sections resampled onto a common chord grid of m points.
+    """
+    def __init__(self, sections, m=201, names=None):
+        """
+        :param sections: array (k, n, 2) or list of (n_i, 2) coordinate arrays starting and ending at the trailing
+        edge, in either direction.
+        :param names: list of k names, defaults to the index.
+        """
+        sections = [sections] if np.ndim(sections) == 2 else sections
+        with span('shape_compare.resample', sections=len(sections)):
+            groups = {}     # Resample sections with the same number of points together
+            for idx, section in enumerate(sections):
+                groups.setdefault(np.shape(section), []).append(idx)
+            self.upper = np.empty((len(sections), int(m)))
+            self.lower = np.empty((len(sections), int(m)))
+            for indices in groups.values():
+                geometry = AerofoilGeometry(np.stack([sections[idx] for idx in indices]), m)
+                self.upper[indices] = geometry.upper
+                self.lower[indices] = geometry.lower
+            self.x = geometry.x
+        self.names = list(names) if names is not None else list(range(len(sections)))
+        self.weights = _trapezoid_weights(self.x)
+
+    def __len__(self):
+        return len(self.upper)
+
+    @property
+    def camber(self):
+        return 0.5 * (self.upper + self.lower)
+
+    @property
+    def thickness(self):
+        return self.upper - self.lower
+
+    @property
+    def area(self):
+        """
+        Cross sectional area of each section (chord 1).
+        """
+        return self.thickness.dot(self.weights)
+
+
+def compare(sections_a, sections_b=None):
+    """
+    Function to compute every metric for every pair of sections, i.e. a of each row against b of each column.
+    max_deviation is the largest distance between either surface, rms_deviation the chordwise RMS of both, camber
+    and thickness errors the largest difference between the camber lines and thickness distributions and
+    area_difference the signed difference in area, a - b. All are in chords (chords squared for area).
+    :param sections_a: Sections.
+    :param sections_b: Sections, defaults to sections_a.
+    :return: dict of metric to array (len a, len b).
+    """
+    sections_b = sections_a if sections_b is None else sections_b
+    if not np.array_equal(sections_a.x, sections_b.x):
+        raise ValueError('Sections must share a chord grid')
+    w = sections_a.weights
+    with span('shape_compare.compare', pairs=len(sections_a) * len(sections_b)):
+        # Weighted sum of squares expanded into matrix products: sum(w (a - b)^2) = a.a + b.b - 2 a.b
+        squares = np.zeros((len(sections_a), len(sections_b)))
+        for a, b in ((sections_a.upper, sections_b.upper), (sections_a.lower, sections_b.lower)):
+            squares += (a ** 2).dot(w)[:, np.newaxis] + (b ** 2).dot(w)[np.newaxis] - 2.0 * (a * w).dot(b.T)
+        metrics = {'rms_deviation': np.sqrt(np.maximum(0.5 * squares, 0.0)),
+                   'area_difference': sections_a.area[:, np.newaxis] - sections_b.area[np.newaxis]}
+
+        pairs = [('max_deviation', sections_a.upper, sections_b.upper),
+                 ('max_deviation', sections_a.lower, sections_b.lower),
+                 ('camber_error', sections_a.camber, sections_b.camber),
+                 ('thickness_error', sections_a.thickness, sections_b.thickness)]
+        for name in ('max_deviation', 'camber_error', 'thickness_error'):
+            metrics[name] = np.zeros((len(sections_a), len(sections_b)))
+        block = max(1, BLOCK_ELEMENTS // max(len(sections_b) * len(w), 1))
+        for start in range(0, len(sections_a), block):
+            rows = slice(start, start + block)
+            for name, a, b in pairs:
+                deviation = np.abs(a[rows, np.newaxis] - b[np.newaxis]).max(axis=2)
+                metrics[name][rows] = np.maximum(metrics[name][rows], deviation)
+    return metrics
+
+
+def rank(design, library, metric='rms_deviation'):
+    """
+    Function to rank a library of sections by their distance from one design section.
+    :param design: Sections of one section.
+    :param library: Sections to rank.
+    :return: DataFrame of the metrics of each library section, indexed by name and sorted by metric (absolute).
+    """
+    metrics = compare(design, library)
+    table = pd.DataFrame(dict((name, values[0]) for name, values in metrics.items()), columns=METRICS,
+                         index=library.names)
+    return table.iloc[np.argsort(np.abs(table[metric].values), kind='mergesort')]
+
+
+def naca_library(n=150, m=201, cambers=range(0, 10), camber_xs=range(1, 10), thicknesses=range(6, 31)):
+    """
+    Function to generate every NACA 4 digit section from the digit ranges, symmetric sections once.
+    :return: Sections named NACA<digits>.
+    """
+    digits = [(camber, camber_x if camber else 0, thickness)
+              for camber, camber_x, thickness in itertools.product(cambers, camber_xs, thicknesses)]
+    digits = sorted(set(digits))
+    camber, camber_x, thickness = np.array(digits).T
+    return Sections(naca4(camber, camber_x, thickness, n), m,
+                    ['NACA{}{}{}'.format(*section) for section in digits])
+
+
+def _trapezoid_weights(x):
+    """
+    :return: weights w with w.dot(f) the trapezoidal integral of f over x.
+    """
+    weights = np.zeros_like(x)
+    weights[1:] += 0.5 * np.diff(x)
+    weights[:-1] += 0.5 * np.diff(x)
+    return weights
@@ -0,0 +1,52 @@
+"""
+Compare the NumPy ktreff with MATLAB ktreff.m. Needs MATLAB with ktreff.m on its path, so it is not part of the
+test suite.
+Usage: python tests/check_matlab_ktreff.py
+"""
+import itertools
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ktreff import ktreff
+
+N = 150
+TOL = 1e-8
+CASES = list(itertools.product(np.radians([-4.0, 0.0, 3.0, 8.0]), [0.0, 0.06, 0.12], [0.0, 0.02, 0.05],
+                               [0.0, 0.15, 0.3]))
+
+
+def matlab_ktreff():
+    """
+    Function to evaluate every case with MATLAB ktreff.m.
+    :return: x, y, cp arrays of shape (cases, N + 1) and cl of shape (cases,).
+    """
+    import matlab.engine
+    eng = matlab.engine.start_matlab()
+    try:
+        results = [eng.ktreff(alpha, eps, beta, tau, float(N), nargout=4) for alpha, eps, beta, tau in CASES]
+    finally:
+        eng.quit()
+    x, y, cp = [np.array([np.asarray(result[idx], dtype=float).ravel() for result in results]) for idx in range(3)]
+    return x, y, cp, np.array([float(result[3]) for result in results])
+
+
+def check():
+    """
+    Function to print the largest NumPy - MATLAB difference of each output.
+    :return: True when all are within TOL.
+    """
+    alpha, eps, beta, tau = np.array(CASES).T
+    matched = True
+    for name, value, reference in zip(['x', 'y', 'cp', 'cl'], ktreff(alpha, eps, beta, tau, N), matlab_ktreff()):
+        finite = np.isfinite(reference)     # cp is infinite at the trailing edge
+        difference = np.max(np.abs(value[finite] - reference[finite]) / np.maximum(np.abs(reference[finite]), 1.0))
+        print('{:3s}{:.3e}'.format(name, difference))
+        matched = matched and difference <= TOL
+    return matched
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import batch
+from batch import STAGES, Job, read_jobs, run_batch
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALLS = []
+
+
+def record(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError('job failed')
+
+
+class ReadJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder_path, 'jobs.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def _read(self, spec):
+        with open(self.file_path, 'w') as job_file:
+            json.dump(spec, job_file)
+        return read_jobs(self.file_path)
+
+    def test_defaults_and_names(self):
+        jobs = self._read({'defaults': {'eps': 0.06, 'n': 100},
+                           'jobs': [{'stage': 'compare', 'args': ['results'], 'kwargs': {'eps': 0.08}},
+                                    {'stage': 'sweep', 'name': 'tau'}]})
+        self.assertEqual(jobs, [Job('jobs.json[0]', 'compare', ['results'], {'eps': 0.08, 'n': 100}),
+                                Job('tau', 'sweep', [], {'eps': 0.06, 'n': 100})])
+        self.assertEqual(self._read([{'stage': 'xfoil'}]), [Job('jobs.json[0]', 'xfoil', [], {})])
+
+    def test_invalid_jobs(self):
+        self.assertRaises(ValueError, self._read, [{'args': []}])
+        self.assertRaises(ValueError, self._read, [{'stage': 'compare', 'kwrags': {}}])
+
+
+class RunBatchTest(unittest.TestCase):
+    def setUp(self):
+        del CALLS[:]
+        self.jobs = [Job('first', 'tests.test_batch:record', [1], {'a': 2}),
+                     Job('failing', 'tests.test_batch:fail', [], {}),
+                     Job('unknown', 'no_such_stage', [], {}),
+                     Job('last', 'tests.test_batch:record', [3], {})]
+
+    def test_continues_after_failure(self):
+        results = run_batch(self.jobs, verbose=False)
+        self.assertEqual([(result.name, result.status) for result in results],
+                         [('first', 'ran'), ('failing', 'failed'), ('unknown', 'failed'), ('last', 'ran')])
+        self.assertIn('job failed', results[1].error)
+        self.assertEqual(CALLS, [((1,), {'a': 2}), ((3,), {})])
+
+    def test_stop_on_error(self):
+        results = run_batch(self.jobs, stop_on_error=True, verbose=False)
+        self.assertEqual([result.status for result in results], ['ran', 'failed'])
+        self.assertEqual(CALLS, [((1,), {'a': 2})])
+
+    def test_main_exit_status_and_report(self):
+        folder_path = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(folder_path, 'jobs.json')
+            report_path = os.path.join(folder_path, 'report.json')
+            with open(file_path, 'w') as job_file:
+                json.dump([{'stage': job.stage, 'args': job.args, 'name': job.name} for job in self.jobs[:2]],
+                          job_file)
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            stderr, sys.stderr = sys.stderr, sys.stdout
+            try:
+                self.assertEqual(batch.main([file_path, '--report', report_path]), 1)
+                self.assertEqual(batch.main([file_path, '--stop-on-error']), 1)
+                self.assertEqual(batch.main([]), 2)
+            finally:
+                sys.stdout.close()
+                sys.stdout, sys.stderr = stdout, stderr
+            with open(report_path) as report:
+                self.assertEqual([job['status'] for job in json.load(report)['jobs']], ['ran', 'failed'])
+        finally:
+            shutil.rmtree(folder_path)
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_stage_modules_defer_heavy_imports(self):
+        modules = sorted(set(target.split(':')[0] for target in STAGES.values()))
+        script = ('import sys\n'
+                  'for name in {!r}:\n'
+                  '    __import__(name)\n'
+                  'print(" ".join(sorted(name for name in sys.modules\n'
+                  '                      if name.split(".")[0] in ("pandas", "matplotlib", "scipy", "matlab"))))\n'
+                  ).format(modules)
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=REPO_PATH)
+        self.assertEqual(output.decode().split(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+import doublet_panel_order
+from doublet_panel_order import dpan_order
+
+CASE = dict(alpha=4.0, eps=0.06, beta=0.02, tau=0.15, dpan=True, backend='numpy', cache=False)
+
+
+def synthetic_row(n, error):
+    return [0.0, 0.0, 0.0, 0.0, n, 0.5, 0.5 + error, error, np.log(n), np.log(abs(error)) if error else np.nan]
+
+
+class FittedOrderTest(unittest.TestCase):
+    def test_sign_changes_and_zero_errors(self):
+        rows = [synthetic_row(n, (-1) ** idx * 3.0 * n ** -2.0) for idx, n in enumerate([20, 40, 80, 160])]
+        rows.append(synthetic_row(320, 0.0))
+        self.assertAlmostEqual(doublet_panel_order._fitted_order(rows), 2.0)
+        self.assertTrue(np.isnan(doublet_panel_order._fitted_order(rows[3:])))
+
+
+@unittest.skipIf(sys.version_info[0] > 2, 'KarmanTrefftzAerofoil splits its contour with n / 2')
+class AdaptiveOrderTest(unittest.TestCase):
+    def test_refines_until_fitted_order_settles(self):
+        rows, names, order, richardson_cl = doublet_panel_order._adaptive_order(CASE, 40, 1000, 0.02, 0)
+        n = [row[4] for row in rows]
+        self.assertEqual(n[:3], [40, 80, 160])
+        self.assertEqual(n, sorted(n))
+        self.assertTrue(all(count % 2 == 0 and count <= 1000 for count in n))
+        self.assertEqual(order, doublet_panel_order._fitted_order(rows))
+        self.assertTrue(1.5 < order < 2.5)
+        self.assertLess(abs(richardson_cl - rows[-1][5]), abs(rows[-1][7]))
+        self.assertEqual(len(names), len(rows))
+
+
+@unittest.skipIf(sys.version_info[0] > 2, 'KarmanTrefftzAerofoil splits its contour with n / 2')
+@unittest.skipIf(pandas is None, 'needs pandas')
+class DpanOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def test_processes_match_serial(self):
+        serial = dpan_order(self.folder_path, n_list=[40, 80, 160], **CASE)
+        pooled = dpan_order(self.folder_path, n_list=[40, 80, 160], processes=2, **CASE)
+        np.testing.assert_allclose(pooled.values, serial.values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+import numpy as np
+
+from dpan import DoubletPanelSolver
+from dpan_fast import FastDoubletPanelSolver
+from ktreff import ktreff
+from ktreff_aerofoil import KarmanTrefftzAerofoil
+
+
+class FastDoubletPanelSolverTest(unittest.TestCase):
+    def test_matches_dense(self):
+        """
+        The treecode error stays far below the discretisation error, dense Cl - exact Cl.
+        """
+        alpha = np.radians([0.0, 3.0, 6.0])
+        x, y, cp, cl = ktreff(alpha[1], 0.06, 0.02, 0.15, 3000)
+        dense_cp, dense_cl = DoubletPanelSolver(x, y)(alpha)
+        fast_cp, fast_cl = FastDoubletPanelSolver(x, y)(alpha)
+        np.testing.assert_allclose(fast_cl, dense_cl, rtol=1e-9)
+        np.testing.assert_allclose(fast_cp, dense_cp, atol=1e-7)
+        self.assertLess(abs(fast_cl[1] - dense_cl[1]), 1e-3 * abs(dense_cl[1] - cl))
+
+    def test_matlab_backend_rejects_fast_solver(self):
+        with self.assertRaises(ValueError):
+            KarmanTrefftzAerofoil(alpha=3.0, eps=0.06, beta=0.02, tau=0.15, n=100, dpan=True, dpan_solver='fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from inverse_design import fit_section, target_surfaces
+from ktreff import ktreff
+
+
+class FitSectionTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def test_recovers_ktreff_parameters(self):
+        for params in [(0.08, 0.03, 0.12), (0.05, 0.0, 0.2)]:
+            x, y, cp, cl = ktreff(0.0, params[0], params[1], params[2], 149)
+            file_path = os.path.join(self.folder_path, 'ktreff.dat')
+            np.savetxt(file_path, np.column_stack([x, y]), header='ktreff', comments='')
+            fit = fit_section(file_path)
+            np.testing.assert_allclose([fit.eps, fit.beta, fit.tau], params, atol=1e-3)
+            self.assertLess(fit.distance, 1e-4)
+
+    def test_rejects_unknown_target(self):
+        self.assertRaises(ValueError, target_surfaces, 'NACA241')
+
+
+if __name__ == '__main__':
+    unittest.main()
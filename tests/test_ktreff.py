@@ -0,0 +1,48 @@
+"""
+Tests of the NumPy ktreff and dpan transcriptions. The comparison with MATLAB needs MATLAB and is run separately by
+tests/check_matlab_ktreff.py.
+"""
+import unittest
+
+import numpy as np
+
+from dpan import dpan
+from ktreff import ktreff
+
+
+class KtreffTest(unittest.TestCase):
+    def test_flat_plate_lift(self):
+        """
+        eps = beta = tau = 0 maps the circle onto a flat plate, Cl = 2 pi sin(alpha).
+        """
+        alpha = np.radians([-4.0, 0.0, 3.0, 8.0])
+        x, y, cp, cl = ktreff(alpha, 0.0, 0.0, 0.0, 200)
+        np.testing.assert_allclose(cl, 2.0 * np.pi * np.sin(alpha), rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(y, 0.0, atol=1e-12)
+        np.testing.assert_allclose([x.min(), x.max()], [0.0, 1.0], atol=1e-12)
+
+    def test_batch_matches_single(self):
+        alpha = np.radians([0.0, 3.0, 6.0])
+        eps, beta, tau = [0.02, 0.06, 0.1], [0.0, 0.02, 0.05], [0.0, 0.15, 0.3]
+        batch = ktreff(alpha, eps, beta, tau, 150)
+        for idx in range(len(alpha)):
+            single = ktreff(alpha[idx], eps[idx], beta[idx], tau[idx], 150)
+            for batch_value, single_value in zip(batch, single):
+                np.testing.assert_allclose(batch_value[idx], single_value, rtol=1e-12)
+
+    def test_dpan_converges_to_ktreff(self):
+        """
+        The dense doublet panel Cl approaches the exact Cl at second order as the panels are refined.
+        """
+        alpha = np.radians(3.0)
+        errors = []
+        for n in [40, 80, 160, 320, 640]:
+            x, y, cp, cl = ktreff(alpha, 0.06, 0.02, 0.15, n)
+            errors.append(abs(dpan(n, alpha, x, y)[1] - cl) / cl)
+        self.assertTrue(all(np.diff(errors) < 0.0), errors)
+        self.assertLess(errors[-1], 2e-3)
+        self.assertGreater(np.log2(errors[-2] / errors[-1]), 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from ktreff_aerofoil import KarmanTrefftzAerofoil
+from ktreff_surrogate import QUANTITIES, KarmanTrefftzSurrogate, exact_properties
+
+RANGES = [(0.02, 0.12), (0.0, 0.08), (0.05, 0.25)]
+
+
+class KarmanTrefftzSurrogateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.surrogate = KarmanTrefftzSurrogate.build(*RANGES, nodes=5, max_nodes=17, max_passes=2)
+        rng = np.random.RandomState(0)
+        cls.points = [rng.uniform(low, high, 300) for low, high in RANGES]
+
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def _aerofoils(self, count):
+        for eps, beta, tau in list(zip(*self.points))[:count]:
+            aerofoil = KarmanTrefftzAerofoil(alpha=0.0, eps=eps, beta=beta, tau=tau, n=150, backend='numpy',
+                                             cache=False)
+            aerofoil()
+            yield aerofoil
+
+    @unittest.skipIf(sys.version_info[0] > 2, 'KarmanTrefftzAerofoil splits its contour with n / 2')
+    def test_exact_matches_aerofoil(self):
+        exact = exact_properties(*[points[:20] for points in self.points])
+        for values, aerofoil in zip(exact, self._aerofoils(20)):
+            max_camber_x, max_camber = aerofoil.get_max_camber()
+            np.testing.assert_allclose(values[1:4], [max_camber, max_camber_x, aerofoil.get_max_thickness()],
+                                       atol=1e-12)
+
+    @unittest.skipIf(sys.version_info[0] > 2, 'KarmanTrefftzAerofoil splits its contour with n / 2')
+    def test_naca_digits_match_aerofoil(self):
+        digits = list(zip(*self.surrogate.naca_digits(*[points[:100] for points in self.points])))
+        self.assertEqual([tuple(int(digit) for digit in point) for point in digits],
+                         [aerofoil.get_naca_digits() for aerofoil in self._aerofoils(100)])
+
+    def test_error_estimates_bound_error(self):
+        result = self.surrogate.query(*self.points)
+        exact = exact_properties(*self.points)
+        self.assertFalse(result['exact'].any())
+        for idx, quantity in enumerate(QUANTITIES):
+            error = np.abs(result[quantity] - exact[:, idx])
+            self.assertTrue((error <= result['error'][quantity]).all(), quantity)
+
+    def test_save_load(self):
+        file_path = os.path.join(self.folder_path, 'table.npz')
+        self.surrogate.save(file_path)
+        loaded = KarmanTrefftzSurrogate.load(file_path)
+        for name in QUANTITIES:
+            np.testing.assert_array_equal(loaded.query(*self.points)[name], self.surrogate.query(*self.points)[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
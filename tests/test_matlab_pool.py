@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import matlab_pool
+from fake_matlab import FakeMatlabEngine, start_matlab
+from matlab_pool import MatlabEnginePool, init_worker
+
+QUIT_FOLDER = tempfile.gettempdir()
+
+
+class RecordingEngine(FakeMatlabEngine):
+    def quit(self):
+        open(os.path.join(QUIT_FOLDER, str(os.getpid())), 'w').close()
+
+
+def _worker_case(idx):
+    if matlab_pool._pool is None:
+        matlab_pool._pool = MatlabEnginePool(1, start=RecordingEngine)
+    with matlab_pool.get_pool().engine():
+        pass
+    return os.getpid()
+
+
+class MatlabEnginePoolTest(unittest.TestCase):
+    def test_engines_are_reused(self):
+        pool = MatlabEnginePool(2, start=start_matlab)
+        with pool.engine() as first:
+            pass
+        with pool.engine() as second:
+            self.assertIs(first, second)
+        pool.shutdown()
+
+    def test_resize_refused_while_on_loan(self):
+        pool = MatlabEnginePool(1, start=start_matlab)
+        with pool.engine():
+            self.assertRaises(RuntimeError, pool.resize, 2)
+        pool.resize(2)
+        self.assertEqual(pool.size, 2)
+        pool.shutdown()
+
+    def test_engine_returned_after_shutdown_is_not_reused(self):
+        pool = MatlabEnginePool(1, start=start_matlab)
+        with pool.engine() as stale:
+            pool.shutdown()
+        with pool.engine() as fresh:
+            self.assertIsNot(stale, fresh)
+        pool.shutdown()
+
+    def test_waiters_get_returned_engines(self):
+        pool = MatlabEnginePool(2, start=start_matlab)
+        engines = []
+
+        def borrow():
+            with pool.engine() as eng:
+                engines.append(eng)
+
+        threads = [threading.Thread(target=borrow) for idx in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(engines), 8)
+        self.assertLessEqual(len(set(id(eng) for eng in engines)), 2)
+        pool.shutdown()
+
+    def test_engines_start_concurrently(self):
+        both_starting = threading.Event()
+        starting = []
+        overlapped = []
+
+        def slow_start():
+            starting.append(1)
+            if len(starting) == 2:
+                both_starting.set()
+            overlapped.append(both_starting.wait(5.0))
+            return start_matlab()
+
+        pool = MatlabEnginePool(2, start=slow_start)
+        threads = [threading.Thread(target=pool._acquire) for idx in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlapped, [True, True])
+        self.assertEqual((len(pool._engines), pool._lent, pool._starting), (2, 2, 0))
+        pool.shutdown()
+
+    def test_failed_start_frees_its_slot(self):
+        attempts = []
+
+        def flaky_start():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError('MATLAB failed to start')
+            return start_matlab()
+
+        pool = MatlabEnginePool(1, start=flaky_start)
+        with self.assertRaises(RuntimeError):
+            with pool.engine():
+                pass
+        self.assertEqual(pool._starting, 0)
+        with pool.engine() as eng:
+            self.assertIsNotNone(eng)
+        pool.shutdown()
+
+    def test_worker_engines_quit_on_pool_exit(self):
+        global QUIT_FOLDER
+        QUIT_FOLDER = tempfile.mkdtemp()
+        parent_pool, matlab_pool._pool = matlab_pool._pool, None
+        try:
+            workers = multiprocessing.Pool(2, initializer=init_worker)
+            pids = set(workers.map(_worker_case, range(4)))
+            workers.close()
+            workers.join()
+            self.assertEqual(set(int(name) for name in os.listdir(QUIT_FOLDER)), pids)
+        finally:
+            matlab_pool._pool = parent_pool
+            shutil.rmtree(QUIT_FOLDER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import pipeline
+import plot_render
+from doublet_panel_order import dpan_order
+from pipeline import PACKAGE_FOLDER, Pipeline, Stage, source_files
+from plot_render import MANIFEST_NAME, LinePlot, PlotRenderer
+
+
+def slow_touch(plot):
+    """
+    Stand-in for plot_render.render, slow enough for concurrent stages to overlap.
+    """
+    time.sleep(0.05)
+    open(plot.path, 'w').close()
+    return plot.path
+
+
+def plot_stage(folder_path, name, figures=3):
+    renderer = PlotRenderer(processes=1)
+    for idx in range(figures):
+        renderer.add(LinePlot(os.path.join(folder_path, '{}_{}.png'.format(name, idx)))).line([0.0, 1.0], [0.0, idx])
+    return renderer.render()
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.render = plot_render.render
+        plot_render.render = slow_touch
+
+    def tearDown(self):
+        plot_render.render = self.render
+        shutil.rmtree(self.folder_path)
+
+    def _pipeline(self):
+        pipeline = Pipeline(self.folder_path, processes=4)
+        for name in ['compare', 'sweep_eps', 'sweep_beta', 'xfoil_post']:
+            pipeline.add(Stage(name, plot_stage, (self.folder_path, name)))
+        return pipeline
+
+    def test_unchanged_stages_are_skipped(self):
+        self.assertEqual(len(self._pipeline().run(verbose=False)), 4)
+        self.assertEqual(self._pipeline().run(verbose=False), {})
+
+    def test_concurrent_stages_share_the_plot_manifest(self):
+        results = self._pipeline().run(verbose=False)
+        self.assertEqual(sum(len(paths) for paths in results.values()), 12)
+        with open(os.path.join(self.folder_path, MANIFEST_NAME)) as manifest:
+            self.assertEqual(len(json.load(manifest)), 12)
+        results = self._pipeline().run(force=True, verbose=False)
+        self.assertEqual(sum(len(paths) for paths in results.values()), 0)     # No figure rendered again
+
+    def test_source_files_follow_package_imports(self):
+        paths = source_files(dpan_order.__module__)
+        for name in ['doublet_panel_order.py', 'ktreff_aerofoil.py', 'ktreff.py', 'dpan.py']:
+            self.assertIn(os.path.join(PACKAGE_FOLDER, name), paths)
+
+    def test_fingerprint_changes_with_imported_module(self):
+        stage = Stage('doublet_order', dpan_order, (self.folder_path,), dict(n_list=[10, 20]))
+        fingerprint = stage.fingerprint([])
+        file_state = pipeline._file_state
+        ktreff_path = os.path.join(PACKAGE_FOLDER, 'ktreff.py')
+        pipeline._file_state = lambda path: [0.0, 0] if path == ktreff_path else file_state(path)
+        try:
+            self.assertNotEqual(stage.fingerprint([]), fingerprint)
+        finally:
+            pipeline._file_state = file_state
+
+
+if __name__ == '__main__':
+    unittest.main()
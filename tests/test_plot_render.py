@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import plot_render
+from plot_render import MANIFEST_NAME, LinePlot, PlotRenderer
+
+
+def touch(plot):
+    """
+    Stand-in for plot_render.render writing an empty file, so the tests do not need matplotlib.
+    """
+    open(plot.path, 'w').close()
+    return plot.path
+
+
+class PlotRendererTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.render = plot_render.render
+        plot_render.render = touch
+
+    def tearDown(self):
+        plot_render.render = self.render
+        shutil.rmtree(self.folder_path)
+
+    def _renderer(self, name, value=1.0):
+        renderer = PlotRenderer(processes=1)
+        renderer.add(LinePlot(os.path.join(self.folder_path, name))).line([0.0, 1.0], [0.0, value])
+        return renderer
+
+    def _manifest(self):
+        with open(os.path.join(self.folder_path, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+
+    def test_unchanged_figures_are_skipped(self):
+        self.assertEqual(len(self._renderer('a.png').render()), 1)
+        self.assertEqual(self._renderer('a.png').render(), [])
+        self.assertEqual(len(self._renderer('a.png', 2.0).render()), 1)
+
+    def test_interleaved_renderers_keep_each_others_entries(self):
+        first, second = self._renderer('a.png'), self._renderer('b.png')
+        render_first = first._render
+
+        def render_second_meanwhile(stale):
+            second.render()     # Reads and writes the manifest after first has read it
+            return render_first(stale)
+
+        first._render = render_second_meanwhile
+        first.render()
+        self.assertEqual(sorted(self._manifest()), ['a.png', 'b.png'])
+        self.assertEqual(self._renderer('a.png').render() + self._renderer('b.png').render(), [])
+
+    def test_concurrent_renderers(self):
+        renderers = [self._renderer('{}.png'.format(idx)) for idx in range(16)]
+        threads = [threading.Thread(target=renderer.render) for renderer in renderers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self._manifest()), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from fake_xfoil import POLAR_HEADER
+from polar_db import PolarDatabase
+
+
+def lift(alpha, reynolds_number, mach_number):
+    return 0.1 * alpha + 0.05 * np.log10(reynolds_number) + 0.2 * mach_number
+
+
+def write_polar(file_path, reynolds_number, alphas, mach_number=0.0):
+    with open(file_path, 'w') as polar:
+        polar.write(POLAR_HEADER.format(name='naca', mach=mach_number, re=reynolds_number / 1e6))
+        for alpha in alphas:
+            polar.write('{:8.3f}{:9.4f}{:10.5f}{:10.5f}{:9.4f}{:9.4f}{:9.4f}\n'.format(
+                alpha, lift(alpha, reynolds_number, mach_number), 0.01, 0.004, -0.05, 0.5, 0.6))
+
+
+class PolarDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.database = PolarDatabase()
+
+    def tearDown(self):
+        self.database.close()
+        shutil.rmtree(self.folder_path)
+
+    def _ingest(self, reynolds_number, alphas, mach_number=0.0):
+        file_path = os.path.join(self.folder_path, 'naca_Re={}_M={}_polar.dat'.format(reynolds_number, mach_number))
+        write_polar(file_path, reynolds_number, alphas, mach_number)
+        return self.database.ingest(file_path, 'naca')
+
+    def test_ingest_and_reingest(self):
+        self.assertEqual(self._ingest(1e6, np.arange(-5.0, 15.5, 1.0)), 21)
+        file_path = os.path.join(self.folder_path, 'naca_Re=1000000.0_M=0.0_polar.dat')
+        self.assertEqual(self.database.ingest(file_path, 'naca'), 0)
+        self.assertEqual(self.database.query('naca', 1e6, 0.0, 15.0)['CL'], lift(15.0, 1e6, 0.0))
+
+        self.assertEqual(self._ingest(1e6, np.arange(-5.0, 10.5, 1.0)), 16)
+        np.testing.assert_array_equal(self.database.polar('naca', 1e6)[:, 0], np.arange(-5.0, 10.5, 1.0))
+        self.assertTrue(np.isnan(self.database.query('naca', 1e6, 0.0, 15.0)['CL']))
+        self.assertEqual(self.database.conditions('naca'), [(1e6, 0.0)])
+
+    def test_query_at_stored_polar_with_mismatched_alpha_ranges(self):
+        self._ingest(1e6, np.arange(-5.0, 15.5, 0.5))
+        self._ingest(3e6, np.arange(-5.0, 10.5, 0.5))
+        result = self.database.query('naca', [1e6, 1e6, 3e6], 0.0, [12.0, 3.0, 3.0])
+        np.testing.assert_allclose(result['CL'], [lift(12.0, 1e6, 0.0), lift(3.0, 1e6, 0.0), lift(3.0, 3e6, 0.0)],
+                                   atol=1e-4)
+        self.assertTrue(np.isnan(self.database.query('naca', 3e6, 0.0, 12.0)['CL']))
+
+    def test_blend_over_covering_polars(self):
+        self._ingest(1e6, np.arange(-5.0, 15.5, 0.5))
+        self._ingest(4e6, np.arange(-5.0, 10.5, 0.5))
+        result = self.database.query('naca', 2e6, 0.0, [3.0, 3.25, 12.0])
+        np.testing.assert_allclose(result['CL'], [lift(3.0, 2e6, 0.0), lift(3.25, 2e6, 0.0), lift(12.0, 1e6, 0.0)],
+                                   atol=1e-4)
+        self.assertTrue(np.isnan(self.database.query('naca', 8e6, 0.0, 3.0)['CL']))
+        self.assertTrue(np.isnan(self.database.query('naca', 2e6, 0.0, 20.0)['CL']))
+
+    def test_scattered_cases(self):
+        alphas = np.arange(-5.0, 10.5, 1.0)
+        for reynolds_number, mach_number in [(1e6, 0.0), (4e6, 0.0), (1e6, 0.4)]:
+            self._ingest(reynolds_number, alphas, mach_number)
+        result = self.database.query('naca', [4e6, 1e6, 2e6, 2e6], [0.0, 0.4, 0.0, 0.2], 2.0)
+        np.testing.assert_allclose(result['CL'][:3], [lift(2.0, 4e6, 0.0), lift(2.0, 1e6, 0.4), lift(2.0, 2e6, 0.0)],
+                                   atol=1e-4)
+        self.assertTrue(np.isfinite(result['CL'][3]))
+        self.assertEqual(self.database.query('naca', 4e6, 0.4, 2.0)['CL'].shape, ())
+
+    def test_single_mach_number(self):
+        self._ingest(1e6, np.arange(-5.0, 10.5, 1.0))
+        self._ingest(3e6, np.arange(-5.0, 10.5, 1.0))
+        np.testing.assert_allclose(self.database.query('naca', 1e6, [0.0, 0.3], 2.0)['CL'], lift(2.0, 1e6, 0.0),
+                                   atol=1e-4)
+
+    def test_unknown_aerofoil(self):
+        with self.assertRaises(KeyError):
+            self.database.query('naca0012', 1e6, 0.0, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
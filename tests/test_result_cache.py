@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from result_cache import ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def test_round_trip(self):
+        cache = ResultCache(self.folder_path)
+        key = cache.key({'eps': 0.06})
+        self.assertIsNone(cache.load(key))
+        cache.store(key, x=np.arange(5.0))
+        np.testing.assert_array_equal(cache.load(key)['x'], np.arange(5.0))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_folder_listed_only_over_cap(self):
+        cache = ResultCache(self.folder_path, max_bytes=10 ** 9)
+        scans = []
+        entries = cache._entries
+        cache._entries = lambda: scans.append(1) or entries()
+        for idx in range(20):
+            cache.store(cache.key({'case': idx}), x=np.arange(100.0))
+        self.assertEqual(len(scans), 1)
+
+    def test_eviction_keeps_size_under_cap(self):
+        cache = ResultCache(self.folder_path)
+        cache.store(cache.key({'case': -1}), x=np.random.RandomState(0).uniform(size=1000))
+        entry_bytes = cache.stats()['bytes']
+        cache.max_bytes = int(3.5 * entry_bytes)
+        for idx in range(10):
+            cache.store(cache.key({'case': idx}), x=np.random.RandomState(idx + 1).uniform(size=1000))
+            self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+        self.assertEqual(cache.stats()['entries'], 3)
+        self.assertIsNotNone(cache.load(cache.key({'case': 9})))
+        self.assertEqual(cache._bytes, cache.stats()['bytes'])
+
+    def test_threads_store_same_key(self):
+        cache = ResultCache(self.folder_path)
+        key = cache.key({'eps': 0.06, 'beta': 0.02})
+        errors = []
+
+        def store_and_load():
+            try:
+                for idx in range(20):
+                    cache.store(key, x=np.arange(1000.0))
+                    cache.load(key)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=store_and_load) for idx in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.hits + cache.misses, 120)
+        self.assertEqual(sorted(os.listdir(self.folder_path)), ['{}.npz'.format(key)])
+        self.assertEqual(cache._bytes, cache.stats()['bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+import run_xfoil
+from run_xfoil import resume_xfoil, run_xfoil_parallel, run_xfoil_session
+from xfoil_io import read_polar
+from xfoil_session import XFoilSession
+
+FAKE_XFOIL = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                           'fake_xfoil.py')]
+
+
+class RunXfoilParallelTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp_path = tempfile.mkdtemp()
+        os.chdir(self.temp_path)
+        os.mkdir('out')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp_path)
+
+    def test_relative_folder(self):
+        """
+        Xfoil runs in each work folder, so the partial polar paths must not be relative to the caller.
+        """
+        status = run_xfoil_parallel('out', 1e6, 0.0, -2.0, 4.0, 0.5, 100, naca_4_names=['1510'], processes=2,
+                                    xfoil_path=FAKE_XFOIL)
+        self.assertEqual([code for first, last, code in status['naca1510']], [0, 0])
+        headers, data, conditions = read_polar(os.path.join('out', 'naca1510', 'naca1510_polar.dat'))
+        np.testing.assert_allclose(data[:, headers.index('alpha')], np.arange(-2.0, 4.0, 0.5))
+        self.assertEqual([name for name in os.listdir(os.path.join('out', 'naca1510')) if name.startswith('.xfoil_')],
+                         [])
+
+    def test_every_partition_failing_raises(self):
+        failing_xfoil = [sys.executable, '-c', 'import sys; sys.exit(1)']
+        self.assertRaises(RuntimeError, run_xfoil_parallel, 'out', 1e6, 0.0, -2.0, 4.0, 0.5, 100,
+                          naca_4_names=['1510'], processes=2, xfoil_path=failing_xfoil)
+
+
+
+class RunXfoilSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_path)
+
+    def _run(self, max_alpha=30.0, **kwargs):
+        points = run_xfoil_session(self.temp_path, 1e6, 0.0, -2.0, max_alpha, 0.1, 100, naca_4_names=['1510'],
+                                   xfoil_path=FAKE_XFOIL, **kwargs)['naca1510']
+        headers, data = read_polar(os.path.join(self.temp_path, 'naca1510', 'naca1510_polar.dat'), sidecar=False)[:2]
+        dumps = sorted(float(name.split('=')[1][:-3]) for name in os.listdir(os.path.join(self.temp_path, 'naca1510'))
+                       if name.endswith('.cp') and os.path.exists(os.path.join(self.temp_path, 'naca1510',
+                                                                               name[:-3] + '.bl')))
+        return points, data[:, headers.index('alpha')], data[:, headers.index('CL')], dumps
+
+    def test_stall_cut_off(self):
+        """
+        The fake Xfoil stalls past 14 degrees, so CL peaks at 15.8 and first drops 10 % below it at 18.2.
+        """
+        points, alphas, cl, dumps = self._run()
+        np.testing.assert_allclose([point.alpha for point in points], np.arange(-2.0, 18.25, 0.1), atol=1e-9)
+        np.testing.assert_allclose(alphas, [point.alpha for point in points], atol=1e-3)
+        self.assertEqual(alphas[np.argmax(cl)], 15.8)
+        self.assertLess(cl[-1], 0.9 * cl.max())
+        self.assertTrue((cl[np.argmax(cl):-1] >= 0.9 * cl.max()).all())
+        self.assertEqual(dumps, np.arange(-2.0, 18.25, 0.5).tolist())
+
+    def test_without_cut_off(self):
+        points, alphas, cl, dumps = self._run(max_alpha=20.0, stall_drop=None)
+        np.testing.assert_allclose(alphas, np.arange(-2.0, 20.0, 0.1), atol=1e-3)
+        self.assertEqual(dumps[-1], 19.5)
+
+    def test_adaptive_steps(self):
+        """
+        The step grows to the 0.5 degree spacing of the cp/bl angles where CL is linear, is refined towards stall and
+        the maximum CL is bracketed at step_alpha, from under a third of the 203 uniform solves.
+        """
+        points, alphas, cl, dumps = self._run(adaptive=True)
+        solved = sorted(point.alpha for point in points)
+        self.assertLess(len(points), 203 / 3)
+        self.assertEqual(len(set(solved)), len(solved))
+        self.assertEqual([alpha for alpha in solved if alpha <= 14.0], np.arange(-2.0, 14.25, 0.5).tolist())
+        self.assertTrue(set([14.7, 15.7, 15.9, 16.1]) <= set(solved))
+        self.assertEqual(alphas[np.argmax(cl)], 15.8)
+        self.assertLess(cl[-1], 0.9 * cl.max())
+        np.testing.assert_allclose(alphas, solved, atol=1e-3)
+        self.assertEqual(dumps, np.arange(-2.0, alphas[-1] + 0.25, 0.5).tolist())
+
+    def test_adaptive_refines_at_failed_point(self):
+        os.environ['FAKE_XFOIL_FAIL'] = '6.0'
+        try:
+            points = self._run(adaptive=True)[0]
+        finally:
+            del os.environ['FAKE_XFOIL_FAIL']
+        self.assertEqual([point.alpha for point in points if not point.converged], [6.0])
+        self.assertTrue(set([5.7, 5.8, 5.9, 6.2]) <= set(point.alpha for point in points))
+
+
+class RecordingSession(XFoilSession):
+    sessions = []
+
+    def __init__(self, *args, **kwargs):
+        RecordingSession.sessions.append(self)
+        super(RecordingSession, self).__init__(*args, **kwargs)
+
+
+class ResumeXfoilTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_path = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        RecordingSession.sessions = []
+        run_xfoil.XFoilSession = RecordingSession
+
+    def tearDown(self):
+        run_xfoil.XFoilSession = XFoilSession
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.temp_path)
+
+    def _run(self, function, **environ):
+        os.environ.update(environ)
+        try:
+            return function(self.temp_path, 1e6, 0.0, -2.0, 8.0, 0.1, 100, naca_4_names=['1510'],
+                            xfoil_path=FAKE_XFOIL)
+        finally:
+            for name in environ:
+                del os.environ[name]
+
+    def _alphas(self):
+        headers, data, conditions = read_polar(os.path.join(self.temp_path, 'naca1510', 'naca1510_polar.dat'),
+                                               sidecar=False)
+        return data[:, headers.index('alpha')]
+
+    def test_resume_after_crash_and_failed_point(self):
+        self.assertRaises(RuntimeError, self._run, run_xfoil_session, FAKE_XFOIL_CRASH='5.3', FAKE_XFOIL_FAIL='2.0')
+        alphas = self._alphas()
+        self.assertEqual(alphas[-1], 5.2)
+        self.assertNotIn(2.0, np.round(alphas, 2))
+
+        status = self._run(resume_xfoil)
+        rerun, missing = status['naca1510']
+        self.assertEqual(rerun, [2.0] + np.round(np.arange(5.3, 8.0, 0.1), 2).tolist())
+        self.assertEqual(missing, [])
+        np.testing.assert_allclose(self._alphas(), np.arange(-2.0, 8.0, 0.1), atol=1e-9)
+        self.assertEqual(self._run(resume_xfoil), {'naca1510': ([], [])})
+
+    def test_crashed_sessions_are_closed(self):
+        self._run(run_xfoil_session, FAKE_XFOIL_FAIL='5.3 6.0')
+        status = self._run(resume_xfoil, FAKE_XFOIL_CRASH='5.3', FAKE_XFOIL_FLAKY='6.0')
+        self.assertEqual(status['naca1510'], ([6.0], [5.3]))
+        self.assertEqual(len(RecordingSession.sessions), 5)     # First run, resume and a restart per crash
+        for session in RecordingSession.sessions:
+            self.assertIsNotNone(session.process.poll())
+            self.assertTrue(session.process.stdin.closed and session.process.stdout.closed)
+        np.testing.assert_allclose(self._alphas(), [alpha for alpha in np.arange(-2.0, 8.0, 0.1)
+                                                    if abs(alpha - 5.3) > 1e-9], atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+import shape_compare
+from naca_aerofoil import naca4
+from shape_compare import METRICS, Sections, compare
+
+DIGITS = [(0, 0, 12), (2, 4, 12), (4, 4, 15), (6, 3, 9)]
+
+
+class CompareTest(unittest.TestCase):
+    def setUp(self):
+        camber, camber_x, thickness = np.array(DIGITS).T
+        self.sections = Sections(naca4(camber, camber_x, thickness, 150))
+
+    def test_self_comparison(self):
+        metrics = compare(self.sections)
+        self.assertEqual(sorted(metrics), sorted(METRICS))
+        for name in METRICS:
+            np.testing.assert_allclose(np.diag(metrics[name]), 0.0, atol=1e-7, err_msg=name)
+            sign = -1.0 if name == 'area_difference' else 1.0
+            np.testing.assert_allclose(metrics[name], sign * metrics[name].T, atol=1e-7, err_msg=name)
+            if name != 'area_difference':
+                self.assertTrue((metrics[name][~np.eye(len(DIGITS), dtype=bool)] > 1e-3).all(), name)
+
+    def test_matches_pairwise(self):
+        metrics = compare(self.sections)
+        sections = self.sections
+        for a in range(len(DIGITS)):
+            for b in range(len(DIGITS)):
+                upper, lower = sections.upper[a] - sections.upper[b], sections.lower[a] - sections.lower[b]
+                rms = np.sqrt(0.5 * (upper ** 2 + lower ** 2).dot(sections.weights))
+                self.assertAlmostEqual(metrics['rms_deviation'][a, b], rms, places=7)
+                self.assertAlmostEqual(metrics['max_deviation'][a, b], max(abs(upper).max(), abs(lower).max()))
+                self.assertAlmostEqual(metrics['thickness_error'][a, b], abs(upper - lower).max())
+
+    def test_point_order_and_blocks(self):
+        reversed_sections = Sections([section[::-1] for section in naca4(*np.array(DIGITS).T, n=150)])
+        np.testing.assert_allclose(reversed_sections.upper, self.sections.upper, atol=1e-12)
+        block_elements = shape_compare.BLOCK_ELEMENTS
+        shape_compare.BLOCK_ELEMENTS = 1
+        try:
+            blocked = compare(self.sections, reversed_sections)
+        finally:
+            shape_compare.BLOCK_ELEMENTS = block_elements
+        for name, values in compare(self.sections).items():
+            np.testing.assert_allclose(blocked[name], values, atol=1e-7, err_msg=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
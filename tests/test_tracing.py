@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import tracing
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder_path, 'trace.json')
+        tracing.enable(self.path)
+
+    def tearDown(self):
+        tracing.disable()
+        shutil.rmtree(self.folder_path)
+
+    @unittest.skipIf(tracing.resource is None, 'no resource module')
+    def test_peak_growth_is_per_span(self):
+        size_mb = tracing._peak_rss_mb() + 128.0    # Raises the process peak by at least 128 MB
+        with tracing.span('grow'):
+            block = np.ones(int(size_mb * 2 ** 17))
+            del block
+        with tracing.span('small'):
+            np.ones(10)
+        tracing.disable()
+        events = dict((event['name'], event['args']) for event in tracing.read_trace(self.path))
+        self.assertGreater(events['grow']['peak_rss_growth_mb'], 100.0)
+        self.assertLess(events['small']['peak_rss_growth_mb'], 1.0)
+        self.assertGreater(events['small']['process_peak_rss_mb'], size_mb)   # Cumulative
+        with open(self.path + '.txt') as summary:
+            self.assertIn('peak +MB', summary.readline())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+import variable_sweep_ktreff
+from variable_sweep_ktreff import design_space_sweep
+
+SWEEP = dict(alpha=[0.0, 4.0], eps=[0.04, 0.08], beta=0.02, tau=0.15, n=60, backend='numpy', cache=False)
+
+
+@unittest.skipIf(pandas is None, 'needs pandas')
+class DesignSpaceSweepTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.evaluated = []
+        self.sweep_case = variable_sweep_ktreff._sweep_case
+        variable_sweep_ktreff._sweep_case = self._count_case
+
+    def tearDown(self):
+        variable_sweep_ktreff._sweep_case = self.sweep_case
+        shutil.rmtree(self.folder_path)
+
+    def _count_case(self, indexed_case):
+        self.evaluated.append(indexed_case[0])
+        return self.sweep_case(indexed_case)
+
+    def _progress_files(self):
+        return sorted(glob.glob(os.path.join(self.folder_path, 'sweep_*.csv')))
+
+    def test_resume_evaluates_only_missing_cases(self):
+        table = design_space_sweep(self.folder_path, **SWEEP)
+        self.assertEqual(sorted(self.evaluated), [0, 1, 2, 3])
+        progress_path, = self._progress_files()
+        with open(progress_path) as progress:
+            lines = progress.readlines()
+        with open(progress_path, 'w') as progress:     # Interrupted after two cases
+            progress.writelines(lines[:3])
+
+        self.evaluated = []
+        resumed = design_space_sweep(self.folder_path, **SWEEP)
+        self.assertEqual(sorted(self.evaluated), [2, 3])
+        pandas.testing.assert_frame_equal(resumed, table)
+
+        self.evaluated = []
+        design_space_sweep(self.folder_path, **SWEEP)
+        self.assertEqual(self.evaluated, [])
+
+    def test_other_aerofoil_arguments_do_not_share_progress(self):
+        design_space_sweep(self.folder_path, **SWEEP)
+        self.evaluated = []
+        design_space_sweep(self.folder_path, **dict(SWEEP, dpan=True))
+        self.assertEqual(sorted(self.evaluated), [0, 1, 2, 3])
+        self.evaluated = []
+        design_space_sweep(self.folder_path, **dict(SWEEP, dpan=True, dpan_solver='fast'))
+        self.assertEqual(sorted(self.evaluated), [0, 1, 2, 3])
+        self.assertEqual(len(self._progress_files()), 3)
+
+    def test_processes_match_serial(self):
+        variable_sweep_ktreff._sweep_case = self.sweep_case     # Workers cannot pickle the counting method
+        serial = design_space_sweep(self.folder_path, **SWEEP)
+        pooled = design_space_sweep(self.folder_path, resume=False, processes=2, **SWEEP)
+        pandas.testing.assert_frame_equal(pooled, serial)
+
+    def test_lhs_needs_a_varied_argument(self):
+        self.assertRaises(ValueError, design_space_sweep, self.folder_path, mode='lhs', samples=4,
+                          alpha=0.0, eps=0.06, beta=0.02, tau=0.15, n=60, backend='numpy', cache=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
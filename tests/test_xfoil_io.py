@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from xfoil_io import read_dump
+
+DUMP = ['#    s        x        y     Ue/Vinf    Dstar     Theta      Cf       H\n',
+        '  0.00000  1.00000  0.00126 -0.12345  0.00210  0.00090  0.00015  2.33333\n',
+        '  0.01000  0.99000-0.00012-0.12345-0.00210  0.00090-0.00015  2.33333\n',
+        '  1.0E-05  0.98000  1.2E-04-0.12345  0.00210  0.00090  0.00015\n']
+
+
+class ReadDumpTest(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.folder_path, 'naca.bl')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder_path)
+
+    def _read(self, lines):
+        with open(self.file_path, 'w') as dump:
+            dump.writelines(lines)
+        return read_dump(self.file_path, sidecar=False)
+
+    def test_run_together_negative_values(self):
+        headers, data, conditions = self._read(DUMP[:3])
+        self.assertEqual(headers, ['s', 'x', 'y', 'Ue/Vinf', 'Dstar', 'Theta', 'Cf', 'H'])
+        np.testing.assert_array_equal(data[1], [0.01, 0.99, -0.00012, -0.12345, -0.0021, 0.0009, -0.00015, 2.33333])
+
+    def test_exponents_and_short_rows(self):
+        headers, data, conditions = self._read(DUMP)
+        np.testing.assert_array_equal(data[2, :7], [1e-05, 0.98, 1.2e-04, -0.12345, 0.0021, 0.0009, 0.00015])
+        self.assertTrue(np.isnan(data[2, 7]))
+        np.testing.assert_array_equal(data[1, 2:4], [-0.00012, -0.12345])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+from run_xfoil import run_xfoil_parallel
+from tests.test_run_xfoil import FAKE_XFOIL
+from xfoil_post import DEFAULT_ALPHAS, RENDER_BATCH, XFoilPost
+
+
+@unittest.skipIf(pandas is None, 'needs pandas')
+class XFoilPostTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder_path = tempfile.mkdtemp()
+        run_xfoil_parallel(cls.folder_path, 1e6, 0.0, -2.0, 30.0, 0.5, 100, naca_4_names=['1510', '0012'],
+                           processes=2, xfoil_path=FAKE_XFOIL)
+        cls.names = ['naca1510', 'naca0012']
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder_path)
+
+    def _run(self, **kwargs):
+        post = XFoilPost(self.folder_path, self.names, processes=1, **kwargs)
+        held = []
+
+        def render_nothing(stale):
+            held.append(len(stale))
+            return []
+
+        post.renderer._render = render_nothing
+        post.renderer.force = True
+        post()
+        return post, held
+
+    def test_default_alphas(self):
+        post, held = self._run()
+        self.assertEqual(post._get_alphas('naca1510', 'cp'), DEFAULT_ALPHAS)
+        self.assertEqual(sum(held), 5 + 2 * len(DEFAULT_ALPHAS))
+
+    def test_figures_rendered_in_bounded_batches(self):
+        post, held = self._run(alphas=None)
+        alphas = post._get_alphas('naca1510', 'cp')
+        self.assertGreater(len(alphas), len(DEFAULT_ALPHAS))
+        self.assertEqual(sum(held), 5 + 2 * len(alphas))
+        self.assertLessEqual(max(held), 5 + RENDER_BATCH)
+        self.assertTrue(os.path.exists(os.path.join(self.folder_path, 'stall_angle.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Opt-in tracing of where the time goes. Enable with the KTREFF_TRACE environment variable (path of the trace file)
+or enable(path). Spans record wall time, process CPU time, how far they raised the peak resident memory of the
+process (peak_rss_growth_mb) and that peak so far (process_peak_rss_mb, cumulative over the life of the process,
+not the span's own peak). Events are appended to the trace in Chrome trace event format (open in chrome://tracing
+or ui.perfetto.dev); worker processes append to the same file.
+A text summary per span name is written next to the trace, <path>.txt, when the main process exits.
+When disabled span() returns a shared no-op context manager.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+try:
+    import resource
+except ImportError:     # Windows, no peak memory
+    resource = None
+
+TRACE_ENV = 'KTREFF_TRACE'
+OWNER_ENV = 'KTREFF_TRACE_OWNER'
+FLUSH_EVENTS = 256
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Object to collect span events and append them to a Chrome trace (JSON array format) file.
+    The process that creates the trace owns it; other processes (forked or spawned workers) append to it.
+    """
+    def __init__(self, path, owner_pid=None):
+        self.path = os.path.abspath(path)
+        self.pid = os.getpid()
+        self.owner_pid = owner_pid or self.pid
+        self.events = []
+        self.lock = threading.Lock()
+        if self.owner_pid == self.pid:
+            with open(self.path, 'w') as trace:
+                trace.write('[\n')
+
+    def record(self, event):
+        with self.lock:
+            if os.getpid() != self.pid:     # Forked worker, the parent's buffer is not ours to write
+                self.pid = os.getpid()
+                self.events = []
+            self.events.append(event)
+            if len(self.events) >= FLUSH_EVENTS or self.pid != self.owner_pid:
+                self._flush()   # Workers flush every span as they may exit without running atexit
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.events and os.getpid() == self.pid:
+            with open(self.path, 'a') as trace:
+                trace.write(''.join(json.dumps(event) + ',\n' for event in self.events))
+        self.events = []
+
+
+class _Span(object):
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        self.cpu = _cpu_time()
+        self.peak = _peak_rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.time() - self.start
+        peak = _peak_rss_mb()
+        args = dict(self.args, cpu_ms=1e3 * (_cpu_time() - self.cpu), process_peak_rss_mb=peak,
+                    peak_rss_growth_mb=None if peak is None else peak - self.peak)
+        if exc_type is not None:
+            args['error'] = exc_type.__name__
+        self.tracer.record({'name': self.name, 'ph': 'X', 'ts': 1e6 * self.start, 'dur': 1e6 * wall,
+                            'pid': os.getpid(), 'tid': threading.current_thread().ident, 'args': args})
+        return False
+
+
+def span(name, **args):
+    """
+    Context manager timing the enclosed block as span name, with args recorded alongside.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args)
+
+
+def traced(name):
+    """
+    Decorator running the function inside span(name).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(path):
+    """
+    Function to start tracing to path (also inherited by worker processes through KTREFF_TRACE).
+    """
+    global _tracer
+    disable()
+    _tracer = Tracer(path)
+    os.environ[TRACE_ENV] = _tracer.path
+    os.environ[OWNER_ENV] = str(_tracer.owner_pid)
+
+
+def disable():
+    """
+    Function to stop tracing, flushing the trace and writing its summary.
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.flush()
+        if os.getpid() == _tracer.owner_pid:
+            with open(_tracer.path + '.txt', 'w') as f:
+                f.write(summary(_tracer.path) + '\n')
+            os.environ.pop(TRACE_ENV, None)
+            os.environ.pop(OWNER_ENV, None)
+    _tracer = None
+
+
+def enabled():
+    return _tracer is not None
+
+
+def read_trace(path):
+    """
+    :return: list of events in the trace file at path.
+    """
+    with open(path) as trace:
+        text = trace.read().rstrip().rstrip(',')
+    return json.loads(text + ']' if not text.endswith(']') else text)
+
+
+def summary(path):
+    """
+    :return: table of count, total and mean wall time, total CPU time, largest rise of the process peak memory and
+    largest process peak memory for each span name.
+    """
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+    for event in read_trace(path):
+        total = totals[event['name']]
+        total[0] += 1
+        total[1] += event['dur'] / 1e6
+        total[2] += event['args'].get('cpu_ms', 0.0) / 1e3
+        total[3] = max(total[3], event['args'].get('peak_rss_growth_mb') or 0.0)
+        total[4] = max(total[4], event['args'].get('process_peak_rss_mb') or 0.0)
+    lines = ['{:<32} {:>7} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('span', 'count', 'wall s', 'mean s', 'cpu s',
+                                                                      'peak +MB', 'process MB')]
+    for name, (count, wall, cpu, growth, peak) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append('{:<32} {:>7} {:>10.3f} {:>10.4f} {:>10.3f} {:>10.1f} {:>10.1f}'.format(
+            name, count, wall, wall / count, cpu, growth, peak))
+    return '\n'.join(lines)
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2.0 ** 20 if sys.platform == 'darwin' else peak / 2.0 ** 10     # Bytes on macOS, else KB
+
+
+_tracer = None
+if os.environ.get(TRACE_ENV):
+    _tracer = Tracer(os.environ[TRACE_ENV], int(os.environ.get(OWNER_ENV) or 0) or None)
+    os.environ[OWNER_ENV] = str(_tracer.owner_pid)
+atexit.register(disable)
@@ -1,12 +1,30 @@
+import csv
+import itertools
+import multiprocessing
 import os
 import sys
 
-import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 
-from ktreff_aerofoil import KarmanTrefftzAerofoil
+from ktreff_aerofoil import KarmanTrefftzAerofoil, evaluate_aerofoils
+from lazy_import import lazy_module
+from matlab_pool import init_worker
+from plot_render import LinePlot, PlotRenderer
+from result_cache import ResultCache
+from result_writer import BACKENDS, ResultWriter, get_default_backend
+from tracing import span, traced
 
+pd = lazy_module('pandas')
 
+SWEEP_VARIABLES = ['alpha', 'eps', 'beta', 'tau', 'n']
+UNKEYED_ARGUMENTS = ('pool', 'cache')   # Aerofoil arguments that do not change results
+SWEEP_COLUMNS = ['case'] + SWEEP_VARIABLES + ['max_camber', 'max_camber_x', 'max_thickness', 'Cl']
+SUMMARY_PLOTS = [('max_camber', 'Maximum camber', 'Maximum camber vs {}.png'),
+                 ('max_camber_x', 'Maximum camber x location', 'Maximum camber location vs {}.png'),
+                 ('max_thickness', 'Maximum thickness', 'Maximum thickness vs {}.png')]
+
+
+@traced('sweep.variable')
 def variable_sweep_ktreff(folder_path, **kwargs):
     """
     Fixture that generates Karman-Trefftz aerofoils at each of the variables.
@@ -43,51 +61,152 @@ def variable_sweep_ktreff(folder_path, **kwargs):
 
     # Generate ktreff aerofoil for each value of variable and write data to excel file.
     # Generate plot comparing aerofoils.
-    for idx, value in enumerate(sweep_variable_values):
+    aerofoils = []
+    for value in sweep_variable_values:
         kwargs[sweep_variable_name] = value
-        aerofoil = KarmanTrefftzAerofoil(**kwargs)
-        aerofoil()
+        aerofoils.append(KarmanTrefftzAerofoil(**kwargs))
+    with span('sweep.evaluate', cases=len(aerofoils)):
+        evaluate_aerofoils(aerofoils)
+
+    renderer = PlotRenderer()
+    for idx, (value, aerofoil) in enumerate(zip(sweep_variable_values, aerofoils)):
         label = '{}={}'.format(sweep_variable_name, value)
         if idx == 0:
-            title = ''.join([elem.strip(',') for elem in aerofoil.get_name().split(label)])
-            writer = pd.ExcelWriter(os.path.join(folder_path, '{}.xlsx'.format(title)), engine='xlsxwriter')
+            title = _title(aerofoil.get_name(), label)
+            writer = ResultWriter(os.path.join(folder_path, title))
+            plot = renderer.add(LinePlot(os.path.join(folder_path, '{}.png'.format(title)), title, 'x/c', 'y/c'))
+        max_camber_x, max_camber = aerofoil.get_max_camber()
         table.loc[idx] = [aerofoil.alpha, aerofoil.eps, aerofoil.beta, aerofoil.tau,
-                          aerofoil.get_max_camber()[1], aerofoil.get_max_camber()[0], aerofoil.get_max_thickness(),
+                          max_camber, max_camber_x, aerofoil.get_max_thickness(),
                           aerofoil.Cl]
         data = aerofoil.get_data(False)
         pd_data = pd.DataFrame(data, columns=['x', 'y', 'Cp'])
-        pd_data.to_excel(writer, label)
-        plt.plot(data[:, 0], data[:, 1], label=label)
-        plt.legend(loc='best', fontsize='small')
-
-    plt.title(title)
-    plt.xlabel('x/c')
-    plt.ylabel('y/c')
-    plt.savefig(os.path.join(folder_path, '{}.png'.format(title)))
-    plt.gcf().clear()
-
-    plt.title('Maximum camber vs {}'.format(sweep_variable_name))
-    plt.xlabel(sweep_variable_name)
-    plt.ylabel('Maximum camber')
-    plt.plot(list(table[sweep_variable_name]), list(table['max_camber']))
-    plt.savefig(os.path.join(folder_path, 'Maximum camber vs {}.png'.format(sweep_variable_name)))
-    plt.gcf().clear()
-
-    plt.title('Maximum camber x location vs {}'.format(sweep_variable_name))
-    plt.xlabel(sweep_variable_name)
-    plt.ylabel('Maximum camber x location')
-    plt.plot(list(table[sweep_variable_name]), list(table['max_camber_x']))
-    plt.savefig(os.path.join(folder_path, 'Maximum camber location vs {}.png'.format(sweep_variable_name)))
-    plt.gcf().clear()
-
-    plt.title('Maximum thickness vs {}'.format(sweep_variable_name))
-    plt.xlabel(sweep_variable_name)
-    plt.ylabel('Maximum thickness')
-    plt.plot(list(table[sweep_variable_name]), list(table['max_thickness']))
-    plt.savefig(os.path.join(folder_path, 'Maximum thickness vs {}.png'.format(sweep_variable_name)))
-    plt.gcf().clear()
-
-    table.to_excel(writer, 'table')
+        writer.write(label, pd_data)
+        plot.line(data[:, 0], data[:, 1], label=label)
+
+    for column, ylabel, file_name in SUMMARY_PLOTS:
+        plot = renderer.add(LinePlot(os.path.join(folder_path, file_name.format(sweep_variable_name)),
+                                     '{} vs {}'.format(ylabel, sweep_variable_name), sweep_variable_name, ylabel))
+        plot.line(list(table[sweep_variable_name]), list(table[column]))
+    renderer.render()
+
+    writer.write('table', table)
+    writer.close()
+
+
+def sweep_outputs(folder_path, **kwargs):
+    """
+    :return: paths of the files variable_sweep_ktreff writes for the same arguments, e.g. to declare as pipeline
+    stage outputs.
+    """
+    name, values = [(key, arg) for key, arg in kwargs.items() if type(arg) is list][0]
+    title = _title(KarmanTrefftzAerofoil(**dict(kwargs, **{name: values[0]})).get_name(),
+                   '{}={}'.format(name, values[0]))
+    return [os.path.join(folder_path, title + BACKENDS[get_default_backend()].extension),
+            os.path.join(folder_path, '{}.png'.format(title))] + \
+        [os.path.join(folder_path, file_name.format(name)) for column, ylabel, file_name in SUMMARY_PLOTS]
+
+
+def _title(name, label):
+    """
+    :return: aerofoil name without the swept parameter, naming the output files.
+    """
+    return ''.join([elem.strip(',') for elem in name.split(label)])
+
+
+@traced('sweep.design_space')
+def design_space_sweep(folder_path, mode='grid', samples=100, processes=None, chunksize=16, resume=True, seed=0,
+                       **kwargs):
+    """
+    Fixture that sweeps Karman-Trefftz aerofoils over any subset of alpha/eps/beta/tau/n at once.
+    mode='grid' takes the Cartesian product of every list valued argument.
+    mode='lhs' treats every list valued argument as [low, high] and draws a Latin hypercube of samples cases.
+    Cases are spread over a pool of processes in chunks of chunksize. Each result is appended to a
+    <title>.csv progress file as it arrives, so re-running the same sweep with resume=True only evaluates
+    the missing cases. Other arguments (backend, dpan, ...) are passed to every aerofoil and, apart from pool and
+    cache, are part of the name of the progress file, so sweeps that differ in any of them never share it.
+    :return: summary table with one row per case.
+    """
+    cases = _sweep_cases(mode, samples, seed, kwargs)
+    spec = dict((key, np.asarray(value).tolist() if isinstance(value, (list, tuple, np.ndarray)) else value)
+                for key, value in kwargs.items() if key not in UNKEYED_ARGUMENTS)
+    spec.update(mode=mode, samples=samples if mode == 'lhs' else None, seed=seed)
+    title = 'sweep_{}'.format(ResultCache.key(spec)[:12])
+    progress_path = os.path.join(folder_path, '{}.csv'.format(title))
+
+    done = set()
+    if resume and os.path.exists(progress_path):
+        done = set(pd.read_csv(progress_path)['case'].astype(int))
+    elif os.path.exists(progress_path):
+        os.remove(progress_path)
+    pending = [(idx, case) for idx, case in enumerate(cases) if idx not in done]
+
+    write_header = not os.path.exists(progress_path)
+    with open(progress_path, 'a') as progress:
+        writer = csv.writer(progress)
+        if write_header:
+            writer.writerow(SWEEP_COLUMNS)
+        if processes and len(pending) > 1:
+            pool = multiprocessing.Pool(processes, initializer=init_worker)
+            try:
+                for row in pool.imap_unordered(_sweep_case, pending, chunksize):
+                    writer.writerow(row)
+                    progress.flush()
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for row in map(_sweep_case, pending):
+                writer.writerow(row)
+                progress.flush()
+
+    table = pd.read_csv(progress_path).drop_duplicates('case').sort_values('case').set_index('case')
+    with ResultWriter(os.path.join(folder_path, title)) as writer:
+        writer.write('table', table)
+    return table
+
+
+def _sweep_cases(mode, samples, seed, kwargs):
+    """
+    :return: list of aerofoil kwargs, one per case.
+    """
+    varied = [key for key in SWEEP_VARIABLES if isinstance(kwargs.get(key), (list, tuple, np.ndarray))]
+    if mode == 'grid':
+        values = itertools.product(*[kwargs[key] for key in varied])
+    elif mode == 'lhs':
+        if not varied:
+            raise ValueError('mode lhs needs at least one [low, high] list argument among {}'.format(
+                SWEEP_VARIABLES))
+        random = np.random.RandomState(seed)
+        strata = np.column_stack([random.permutation(samples) for key in varied])
+        unit = (strata + random.uniform(size=np.shape(strata))) / float(samples)
+        values = [[kwargs[key][0] + (kwargs[key][1] - kwargs[key][0]) * u for key, u in zip(varied, row)]
+                  for row in unit]
+    else:
+        raise ValueError('mode must be grid or lhs, got {}'.format(mode))
+
+    cases = []
+    for value in values:
+        case = dict(kwargs)
+        case.update(zip(varied, value))
+        if 'n' in varied:
+            case['n'] = 2 * int(round(float(case['n']) / 2.0))     # Lower/upper surfaces are split at n/2
+        cases.append(case)
+    return cases
+
+
+def _sweep_case(indexed_case):
+    """
+    Function to evaluate one sweep case in a worker process.
+    :return: row of the summary table.
+    """
+    idx, case = indexed_case
+    with span('sweep.case', case=idx):
+        aerofoil = KarmanTrefftzAerofoil(**case)
+        aerofoil()
+        max_camber_x, max_camber = aerofoil.get_max_camber()
+    return [idx, aerofoil.alpha, aerofoil.eps, aerofoil.beta, aerofoil.tau, aerofoil.n,
+            max_camber, max_camber_x, aerofoil.get_max_thickness(), aerofoil.Cl]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+import os
+import re
+
+from lazy_import import lazy_module
+from lru import LRUCache
+from xfoil_io import read_dump
+
+pd = lazy_module('pandas')
+
+DUMP_FILE = re.compile(r'^(?P<name>.+)_alpha=(?P<alpha>-?\d+(?:\.\d+)?)\.(?P<kind>cp|bl)$')
+
+
+class XFoilCatalog(object):
+    """
+    Object to index the <name>_alpha=<alpha>.{cp,bl} files of Xfoil run folders by (name, alpha, kind).
+    Each folder is listed once; files are only parsed when requested and the most recently used
+    DataFrames are kept in a bounded cache.
+    """
+    def __init__(self, folder_path, folder_names=None, maxsize=64):
+        """
+        :param folder_names: run folders to index, defaults to every sub folder of folder_path.
+        :param maxsize: number of parsed files held in memory.
+        """
+        self.folder_path = folder_path
+        if folder_names is None:
+            folder_names = sorted(name for name in os.listdir(folder_path)
+                                  if os.path.isdir(os.path.join(folder_path, name)))
+        self.folder_names = list(folder_names)
+        self.index = {}
+        self._cache = LRUCache(maxsize)
+        for folder_name in self.folder_names:
+            self._scan(folder_name)
+
+    def _scan(self, folder_name):
+        folder = os.path.join(self.folder_path, folder_name)
+        if not os.path.isdir(folder):
+            return
+        for file_name in os.listdir(folder):
+            match = DUMP_FILE.match(file_name)
+            if match and match.group('name') == folder_name:
+                key = (folder_name, float(match.group('alpha')), match.group('kind'))
+                self.index[key] = os.path.join(folder, file_name)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def alphas(self, name, kind):
+        """
+        :return: sorted alphas with a file of kind ('cp' or 'bl') for aerofoil name.
+        """
+        return sorted(alpha for key_name, alpha, key_kind in self.index if key_name == name and key_kind == kind)
+
+    def load(self, name, alpha, kind):
+        """
+        :return: DataFrame of the file for (name, alpha, kind), parsed on first use.
+        """
+        key = (name, float(alpha), kind)
+        data = self._cache.get(key)
+        if data is None:
+            headers, values, conditions = read_dump(self.index[key])
+            data = pd.DataFrame(values, columns=headers)
+            self._cache.put(key, data)
+        return data
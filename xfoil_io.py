@@ -0,0 +1,112 @@
+import os
+import re
+
+import numpy as np
+
+SIDECAR_EXT = '.npz'
+POLAR_CONDITIONS = re.compile(r'Mach\s*=\s*([-\d.]+)\s+Re\s*=\s*([-\d.]+)\s*e\s*([-\d]+)\s+Ncrit\s*=\s*([-\d.]+)')
+RUN_TOGETHER = re.compile(r'(?<=[\d.])-')   # Full Fortran fixed-width fields, e.g. '-0.12345-0.00012'
+
+
+def read_polar(file_path, sidecar=True):
+    """
+    Function to read an Xfoil polar (PACC) file.
+    :param sidecar: load from / write a binary .npz sidecar, reused while the polar's mtime and size are unchanged.
+    :return: list of column headers, data array (rows, columns) and dict of reynolds_number, mach_number, ncrit.
+    """
+    return _read(file_path, _parse_polar, sidecar)
+
+
+def read_dump(file_path, sidecar=True):
+    """
+    Function to read an Xfoil .cp (CPWR) or .bl (DUMP) file.
+    :param sidecar: load from / write a binary .npz sidecar, reused while the file's mtime and size are unchanged.
+    :return: list of column headers, data array (rows, columns) and an empty dict.
+    """
+    return _read(file_path, _parse_dump, sidecar)
+
+
+def _read(file_path, parser, sidecar):
+    stat = os.stat(file_path)
+    sidecar_path = file_path + SIDECAR_EXT
+    if sidecar:
+        cached = _load_sidecar(sidecar_path, stat)
+        if cached is not None:
+            return cached
+
+    with open(file_path) as f:
+        lines = f.read().splitlines()
+    headers, data, conditions = parser(lines)
+
+    if sidecar:
+        _write_sidecar(sidecar_path, stat, headers, data, conditions)
+    return headers, data, conditions
+
+
+def _parse_polar(lines):
+    """
+    The column header is the line starting with 'alpha', it is followed by a line of dashes and then the data.
+    """
+    header_idx = next(idx for idx, line in enumerate(lines) if line.split()[:1] == ['alpha'])
+    headers = lines[header_idx].split()
+    body = [line for line in lines[header_idx + 1:] if set(line.strip()) - set('- ')]
+
+    conditions = {}
+    for line in lines[:header_idx]:
+        match = POLAR_CONDITIONS.search(line)
+        if match:
+            mach, re_mantissa, re_exponent, ncrit = match.groups()
+            conditions = {'mach_number': float(mach), 'ncrit': float(ncrit),
+                          'reynolds_number': float(re_mantissa) * 10 ** int(re_exponent)}
+    return headers, _parse_body(body, len(headers)), conditions
+
+
+def _parse_dump(lines):
+    """
+    The column header is the last comment ('#') line before the data.
+    """
+    header_idx = max(idx for idx, line in enumerate(lines) if line.lstrip().startswith('#'))
+    headers = lines[header_idx].strip().lstrip('#').split()
+    return headers, _parse_body(lines[header_idx + 1:], len(headers)), {}
+
+
+def _parse_body(lines, columns):
+    """
+    Function to convert whitespace separated rows to an array in one pass, padding short rows with NaN.
+    A minus sign straight after a digit starts a new value, as Fortran leaves no space before a negative value that
+    fills its field.
+    """
+    lines = [RUN_TOGETHER.sub(' -', line) for line in lines if line.strip()]
+    values = ' '.join(lines).split()
+    rows = len(lines)
+    if len(values) == rows * columns:
+        return np.array(values, dtype=float).reshape(rows, columns)
+
+    data = np.full((rows, columns), np.nan)
+    for idx, line in enumerate(lines):
+        row = line.split()[:columns]
+        data[idx, :len(row)] = [float(value) for value in row]
+    return data
+
+
+def _load_sidecar(sidecar_path, stat):
+    try:
+        with np.load(sidecar_path) as sidecar:
+            if float(sidecar['mtime']) != stat.st_mtime or int(sidecar['size']) != stat.st_size:
+                return None
+            conditions = dict((str(key), float(value))
+                              for key, value in zip(sidecar['condition_keys'], sidecar['condition_values']))
+            return [str(header) for header in sidecar['headers']], sidecar['data'], conditions
+    except (IOError, OSError, KeyError, ValueError):
+        return None
+
+
+def _write_sidecar(sidecar_path, stat, headers, data, conditions):
+    keys = sorted(conditions)
+    temp_path = '{}.{}.tmp{}'.format(sidecar_path[:-len(SIDECAR_EXT)], os.getpid(), SIDECAR_EXT)
+    try:
+        np.savez(temp_path, headers=np.array(headers), data=data, mtime=stat.st_mtime, size=stat.st_size,
+                 condition_keys=np.array(keys, dtype=str), condition_values=np.array([conditions[key] for key in keys]))
+        os.rename(temp_path, sidecar_path)
+    except (IOError, OSError):     # Read only run folders still parse, just without a sidecar
+        pass
@@ -1,171 +1,163 @@
 import os
 import sys
 
-import pandas as pd
-import matplotlib.pyplot as plt
+from lazy_import import lazy_module
+from plot_render import LinePlot, PlotRenderer
+from polar_db import polar_name
+from xfoil_catalog import XFoilCatalog
+from xfoil_io import read_polar
+from result_writer import ResultWriter
+from tracing import span
+
+pd = lazy_module('pandas')
+
+DEFAULT_ALPHAS = [-2.0, 0.0, 4.0, 8.0, 12.0, 16.0, 22.0, 26.0, 28.0]
+RENDER_BATCH = 16   # cp/bl figures held before rendering, bounds the dump data kept in memory
 
 
 class XFoilPost(object):
     """
     Object to manage post processing of Xfoil runs.
     """
-    def __init__(self, folder_path, folder_names):
+    def __init__(self, folder_path, folder_names, alphas=DEFAULT_ALPHAS, cache_size=64, processes=None,
+                 database=None):
+        """
+        :param alphas: alphas to export and plot cp/bl data for, None for every alpha with files on disk.
+        :param cache_size: number of cp/bl files held in memory at once.
+        :param processes: worker processes rendering plots, see PlotRenderer.
+        :param database: PolarDatabase to ingest the polars into.
+        """
         self.folder_path = folder_path
         self.folder_names = folder_names
+        self.alphas = alphas
         self.polar_data = {}
-        self.cp_data = {}
-        self.dump_data = {}
+        self.catalog = XFoilCatalog(folder_path, folder_names, cache_size)
+        self.renderer = PlotRenderer(processes)
+        self.database = database
 
     def __call__(self, *args, **kwargs):
-        for folder_name in self.folder_names:
-            self._read_polar(folder_name)
-            self._read_data(folder_name, [-2.0, 0.0, 4.0, 8.0, 12.0, 16.0, 22.0, 26.0, 28.0], 'cp')
-            self._read_data(folder_name, [-2.0, 0.0, 4.0, 8.0, 12.0, 16.0, 22.0, 26.0, 28.0], 'bl')
-        self._write_polar()
-        self._write_cp()
-        self._write_dump()
-        self._plot_cl_alpha()
-        self._plot_cd_alpha()
-        self._plot_ldratio_alpha()
-        self._plot_transition_lower_alpha()
-        self._plot_transition_upper_alpha()
-        self._plot_cp_x()
-        self._plot_cf_x()
+        with span('xfoil_post.read_polar'):
+            for folder_name in self.folder_names:
+                self._read_polar(folder_name)
+        with span('xfoil_post.write'):
+            self._write_polar()
+            self._write_cp()
+            self._write_dump()
+        with span('xfoil_post.plot'):
+            self._plot_cl_alpha()
+            self._plot_cd_alpha()
+            self._plot_ldratio_alpha()
+            self._plot_transition_lower_alpha()
+            self._plot_transition_upper_alpha()
+            self._plot_cp_x()
+            self._plot_cf_x()
+            self.renderer.render()
 
     def _read_polar(self, folder_name):
         file_path = os.path.join(self.folder_path, folder_name, '{}_polar.dat'.format(folder_name))
-        f = open(file_path)
-        lines = f.readlines()
-        headers = lines[10].strip().strip('\n').split(' ')
-        headers = [header for header in headers if len(header)]
-        rows = [row.strip().strip('\n').split(' ') for row in lines[12:]]
-        data = []
-        for row in rows:
-            row = [float(cell) for cell in row if len(cell)]
-            data.append(row)
-        f.close()
+        headers, data, conditions = read_polar(file_path)
+        if self.database is not None:
+            self.database.ingest(file_path, polar_name(folder_name))
         self.polar_data[folder_name] = pd.DataFrame(data, columns=headers)
         self.polar_data[folder_name]['L/D'] = self.polar_data[folder_name]['CL'] / self.polar_data[folder_name]['CD']
 
-    def _read_data(self, folder_name, alphas, ext):
-        for alpha in alphas:
-            file_path = os.path.join(self.folder_path, folder_name, '{}_alpha={}.{}'.format(folder_name, alpha, ext))
-            if os.path.exists(file_path):
-                f = open(file_path)
-                lines = f.readlines()
-                headers = [header for header in lines[0].strip().strip('\n').split(' ')[1:] if len(header)]
-                rows = [row.strip().strip('\n').split(' ') for row in lines[1:]]
-                data = []
-                for row in rows:
-                    row = [float(cell) for cell in row if len(cell)]
-                    data.append(row)
-                f.close()
-
-                if ext == 'cp':
-                    if folder_name not in self.cp_data.keys():
-                        self.cp_data[folder_name] = {}
-                    self.cp_data[folder_name][alpha] = pd.DataFrame(data, columns=headers)
-
-                if ext == 'bl':
-                    if folder_name not in self.dump_data.keys():
-                        self.dump_data[folder_name] = {}
-                    self.dump_data[folder_name][alpha] = pd.DataFrame(data, columns=headers)
+    def _get_alphas(self, name, kind):
+        """
+        :return: alphas with a file of kind ('cp' or 'bl') for name, restricted to self.alphas if given.
+        """
+        alphas = self.catalog.alphas(name, kind)
+        if self.alphas is None:
+            return alphas
+        wanted = set(float(alpha) for alpha in self.alphas)
+        return [alpha for alpha in alphas if alpha in wanted]
 
     def _write_polar(self):
-        writer = pd.ExcelWriter(os.path.join(self.folder_path, 'polar.xlsx'))
         f = open(os.path.join(self.folder_path, 'stall_angle.txt'), 'w')
-        for name in self.folder_names:
-            data = self.polar_data[name]
-            data.to_excel(writer, name)
-            f.write('{} - max Cl: {} @ alpha: {}\n'.format(name,
-                                                           data['CL'].max(), data.loc[data['CL'].idxmax()]['alpha']))
+        with ResultWriter(os.path.join(self.folder_path, 'polar')) as writer:
+            for name in self.folder_names:
+                data = self.polar_data[name]
+                writer.write(name, data)
+                f.write('{} - max Cl: {} @ alpha: {}\n'.format(name, data['CL'].max(),
+                                                               data.loc[data['CL'].idxmax()]['alpha']))
         f.close()
 
     def _write_dump(self):
-        writer = pd.ExcelWriter(os.path.join(self.folder_path, 'dump.xlsx'))
-        for name in self.folder_names:
-            for key, data in self.dump_data[name].iteritems():
-                data.to_excel(writer, '{}alpha={}'.format(name, key))
+        with ResultWriter(os.path.join(self.folder_path, 'dump')) as writer:
+            for name in self.folder_names:
+                for alpha in self._get_alphas(name, 'bl'):
+                    writer.write('{}alpha={}'.format(name, alpha), self.catalog.load(name, alpha, 'bl'))
 
     def _write_cp(self):
-        writer = pd.ExcelWriter(os.path.join(self.folder_path, 'cp.xlsx'))
-        for name in self.folder_names:
-            for key, data in self.cp_data[name].iteritems():
-                data.to_excel(writer, '{}alpha={}'.format(name, key))
+        with ResultWriter(os.path.join(self.folder_path, 'cp')) as writer:
+            for name in self.folder_names:
+                for alpha in self._get_alphas(name, 'cp'):
+                    writer.write('{}alpha={}'.format(name, alpha), self.catalog.load(name, alpha, 'cp'))
+
+    def _plot(self, file_name, title, xlabel, ylabel):
+        return self.renderer.add(LinePlot(os.path.join(self.folder_path, file_name), title, xlabel, ylabel))
 
     def _plot_cl_alpha(self):
+        plot = self._plot('Cl vs alpha.png', 'Cl vs alpha', 'Angle of attack, alpha', 'Lift coefficient, Cl')
         for name, data in self.polar_data.iteritems():
-            plt.plot(list(data['alpha']), list(data['CL']), label=name)
-        plt.xlabel('Angle of attack, alpha')
-        plt.ylabel('Lift coefficient, Cl')
-        plt.title('Cl vs alpha')
-        plt.legend(loc='best', fontsize='small')
-        plt.savefig(os.path.join(self.folder_path, 'Cl vs alpha.png'))
-        plt.gcf().clear()
+            plot.line(data['alpha'], data['CL'], label=name)
 
     def _plot_cd_alpha(self):
+        plot = self._plot('Cd vs alpha.png', 'Cd vs alpha', 'Angle of attack, alpha', 'Drag coefficient, Cd')
         for name, data in self.polar_data.iteritems():
-            plt.plot(list(data['alpha']), list(data['CD']), label=name)
-        plt.xlabel('Angle of attack, alpha')
-        plt.ylabel('Drag coefficient, Cd')
-        plt.title('Cd vs alpha')
-        plt.legend(loc='best', fontsize='small')
-        plt.savefig(os.path.join(self.folder_path, 'Cd vs alpha.png'))
-        plt.gcf().clear()
+            plot.line(data['alpha'], data['CD'], label=name)
 
     def _plot_ldratio_alpha(self):
+        plot = self._plot('L_D vs alpha.png', 'L/D vs alpha', 'Angle of attack, alpha', 'Lift to drag ratio, L/D')
         for name, data in self.polar_data.iteritems():
-            plt.plot(list(data['alpha']), list(data['L/D']), label=name)
-        plt.xlabel('Angle of attack, alpha')
-        plt.ylabel('Lift to drag ratio, L/D')
-        plt.title('L/D vs alpha')
-        plt.legend(loc='best', fontsize='small')
-        plt.savefig(os.path.join(self.folder_path, 'L_D vs alpha.png'))
-        plt.gcf().clear()
+            plot.line(data['alpha'], data['L/D'], label=name)
 
     def _plot_transition_lower_alpha(self):
+        plot = self._plot('Alpha vs lower surface transition.png', 'Alpha vs lower surface transition',
+                          'Transition point, Xtr', 'Angle of attack, alpha')
         for name, data in self.polar_data.iteritems():
-            plt.plot(list(data['Bot_Xtr']), list(data['alpha']), label='{}_lower'.format(name))
-        plt.ylabel('Angle of attack, alpha')
-        plt.xlabel('Transition point, Xtr')
-        plt.title('Alpha vs lower surface transition')
-        plt.legend(loc='best', fontsize='small')
-        plt.savefig(os.path.join(self.folder_path, 'Alpha vs lower surface transition.png'))
-        plt.gcf().clear()
+            plot.line(data['Bot_Xtr'], data['alpha'], label='{}_lower'.format(name))
 
     def _plot_transition_upper_alpha(self):
+        plot = self._plot('Alpha vs upper surface transition.png', 'Alpha vs upper surface transition',
+                          'Transition point, Xtr', 'Angle of attack, alpha')
         for name, data in self.polar_data.iteritems():
-            plt.plot(list(data['Top_Xtr']), list(data['alpha']), label='{}_upper'.format(name))
-        plt.ylabel('Angle of attack, alpha')
-        plt.xlabel('Transition point, Xtr')
-        plt.title('Alpha vs upper surface transition')
-        plt.legend(loc='best', fontsize='small')
-        plt.savefig(os.path.join(self.folder_path, 'Alpha vs upper surface transition.png'))
-        plt.gcf().clear()
+            plot.line(data['Top_Xtr'], data['alpha'], label='{}_upper'.format(name))
 
     def _plot_cp_x(self):
-        for alpha in self.cp_data[self.folder_names[0]].keys():
+        for alpha in self._get_alphas(self.folder_names[0], 'cp'):
+            plot = self._plot('Pressure distribution alpha={}.png'.format(alpha),
+                              'Pressure distribution alpha={}'.format(alpha), 'x', 'Pressure coefficient, Cp')
             for name in self.folder_names:
-                plt.plot(list(self.cp_data[name][alpha]['x']), list(self.cp_data[name][alpha]['Cp']), label=name)
-            plt.xlabel('x')
-            plt.ylabel('Pressure coefficient, Cp')
-            plt.title('Pressure distribution alpha={}'.format(alpha))
-            plt.legend(loc='best', fontsize='small')
-            plt.savefig(os.path.join(self.folder_path, 'Pressure distribution alpha={}.png'.format(alpha)))
-            plt.gcf().clear()
+                if (name, alpha, 'cp') in self.catalog:
+                    data = self.catalog.load(name, alpha, 'cp')
+                    plot.line(data['x'], data['Cp'], label=name)
+            self._render_batch()
 
     def _plot_cf_x(self):
-        for alpha in self.dump_data[self.folder_names[0]].keys():
+        for alpha in self._get_alphas(self.folder_names[0], 'bl'):
+            plot = self._plot('Cf distribution alpha={}.png'.format(alpha),
+                              'Skin friction distribution alpha={}'.format(alpha),
+                              'x', 'Skin friction coefficient, Cf')
             for name in self.folder_names:
-                plt.plot(list(self.dump_data[name][alpha]['x']), list(self.dump_data[name][alpha]['Cf']), label=name)
-            plt.xlabel('x')
-            plt.ylabel('Skin friction coefficient, Cf')
-            plt.title('Skin friction distribution alpha={}'.format(alpha))
-            plt.legend(loc='best', fontsize='small')
-            plt.savefig(os.path.join(self.folder_path, 'Cf distribution alpha={}.png'.format(alpha)))
-            plt.gcf().clear()
+                if (name, alpha, 'bl') in self.catalog:
+                    data = self.catalog.load(name, alpha, 'bl')
+                    plot.line(data['x'], data['Cf'], label=name)
+            self._render_batch()
+
+    def _render_batch(self):
+        """
+        Function to render the figures added so far once there are RENDER_BATCH of them.
+        """
+        if len(self.renderer.plots) >= RENDER_BATCH:
+            self.renderer.render()
+
+
+def xfoil_post(folder_path, folder_names, **kwargs):
+    """
+    Function to post process the Xfoil runs in folder_names, see XFoilPost.
+    """
+    XFoilPost(folder_path, folder_names, **kwargs)()
 
 
 if __name__ == '__main__':
-    xfoil_post = XFoilPost(sys.argv[1], ['aerofoil', 'naca1510'])
-    xfoil_post()
+    xfoil_post(sys.argv[1], ['aerofoil', 'naca1510'])
@@ -0,0 +1,290 @@
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+from tracing import span
+
+PROMPT = re.compile(r'[a-zA-Z]>\s*$')
+POINT = re.compile(r'\ba\s*=\s*(-?[\d.]+)\s+CL\s*=\s*(-?[\d.]+)')
+FORCES = re.compile(r'Cm\s*=\s*(-?[\d.]+)\s+CD\s*=\s*(-?[\d.]+)\s*=>\s*CDf\s*=\s*(-?[\d.]+)\s+CDp\s*=\s*(-?[\d.]+)')
+TRANSITION = re.compile(r'Side\s+([12])\s+.*transition at x/c\s*=\s*(-?[\d.]+)')
+FAILED = 'Convergence failed'
+
+Point = namedtuple('Point', ['alpha', 'cl', 'cd', 'cdp', 'cm', 'top_xtr', 'bot_xtr', 'converged'])
+
+
+class XFoilSession(object):
+    """
+    Object to drive one interactive Xfoil process over pipes.
+    Commands are sent one at a time and the output up to the next prompt is returned, so results are available
+    as soon as each point converges and the process can be reused for any number of aerofoils and conditions.
+    """
+    def __init__(self, xfoil_path, cwd=None, timeout=120.0, graphics=False):
+        """
+        :param xfoil_path: Xfoil executable (or argument list), e.g. fake_xfoil.py for testing.
+        :param timeout: seconds to wait for Xfoil to answer a single command before it is killed.
+        :param graphics: leave Xfoil plotting enabled.
+        """
+        args = list(xfoil_path) if isinstance(xfoil_path, (list, tuple)) else [xfoil_path]
+        self.timeout = timeout
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, cwd=cwd)
+        self.menu = 'top'
+        self.viscous = False
+        self.accumulating = False
+        self.log = []
+        self._output = []
+        self._condition = threading.Condition()
+        self._reader = threading.Thread(target=self._read)
+        self._reader.daemon = True
+        self._reader.start()
+        self._expect()
+        if not graphics:
+            self.command('plop')
+            self.command('g')
+            self.command('')
+
+    def _read(self):
+        stdout = self.process.stdout.fileno()
+        while True:
+            chunk = os.read(stdout, 4096)
+            with self._condition:
+                self._output.append(chunk.decode('latin-1') if chunk else None)
+                self._condition.notify()
+            if not chunk:
+                return
+
+    def _expect(self, timeout=None):
+        """
+        Function to wait for the next prompt.
+        :return: output since the last prompt, including the new prompt.
+        """
+        deadline = time.time() + (timeout or self.timeout)
+        text = ''
+        with self._condition:
+            while True:
+                while self._output:
+                    if self._output[0] is None:     # Left in place so later commands fail at once too
+                        raise RuntimeError('Xfoil exited unexpectedly:\n{}'.format(text[-2000:]))
+                    text += self._output.pop(0)
+                if PROMPT.search(text):
+                    return text
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.process.kill()
+                    raise RuntimeError('Xfoil did not answer within {} s:\n{}'.format(timeout or self.timeout,
+                                                                                      text[-2000:]))
+                self._condition.wait(remaining)
+
+    def command(self, line, timeout=None):
+        """
+        Function to send one line to Xfoil.
+        :return: Xfoil output in response, ending with its next prompt.
+        """
+        self.log.append(line)
+        self.process.stdin.write((line + '\n').encode('latin-1'))
+        self.process.stdin.flush()
+        return self._expect(timeout)
+
+    def top(self):
+        """
+        Function to return to the top level menu.
+        """
+        if self.menu != 'top':
+            self.command('')
+            self.menu = 'top'
+
+    def naca(self, digits):
+        self.top()
+        self.command('naca {}'.format(digits))
+
+    def load(self, file_path, name='aerofoil', panel=True):
+        """
+        Function to load aerofoil coordinates, naming the aerofoil if the file does not and repanelling it.
+        """
+        self.top()
+        output = self.command('load {}'.format(os.path.abspath(file_path)))
+        if output.rstrip().endswith('s>'):
+            self.command(name)
+        if panel:
+            self.command('pane')
+
+    def oper(self, reynolds_number=None, mach_number=0.0, iterations=None):
+        """
+        Function to enter OPER and set the flow conditions, reynolds_number None for inviscid.
+        """
+        if self.menu != 'oper':
+            self.top()
+            self.command('oper')
+            self.menu = 'oper'
+        if reynolds_number is not None and not self.viscous:
+            self.command('visc {}'.format(reynolds_number))
+            self.viscous = True
+        elif reynolds_number is not None:
+            self.command('re {}'.format(reynolds_number))
+        elif self.viscous:
+            self.command('visc')
+            self.viscous = False
+        self.command('m {}'.format(mach_number))
+        if iterations is not None:
+            self.command('iter {}'.format(iterations))
+
+    def accumulate(self, polar_path):
+        """
+        Function to start writing converged points to polar_path, None to stop.
+        """
+        if self.accumulating:
+            self.command('pacc')
+            self.accumulating = False
+        if polar_path is not None:
+            self.command('pacc')
+            self.command(os.path.abspath(polar_path))
+            self.command('')
+            self.accumulating = True
+
+    def alfa(self, alpha):
+        """
+        :return: Point at alpha, parsed from the last iteration Xfoil printed.
+        """
+        with span('xfoil.alfa', alpha=alpha):
+            return parse_point(alpha, self.command('alfa {}'.format(alpha)))
+
+    def dump(self, file_path):
+        self.command('dump {}'.format(os.path.abspath(file_path)))
+
+    def cpwr(self, file_path):
+        self.command('cpwr {}'.format(os.path.abspath(file_path)))
+
+    def polar(self, alphas, stall_drop=0.1):
+        """
+        Generator running alphas in order and yielding each Point as it converges (or fails).
+        Stops early once CL of a converged point has fallen stall_drop (fraction of the maximum) below the maximum
+        CL of the polar, i.e. once the polar is clearly past stall. stall_drop None runs every alpha.
+        """
+        cl_max = None
+        for alpha in alphas:
+            point = self.alfa(alpha)
+            yield point
+            if point.converged and stall_drop is not None:
+                cl_max = point.cl if cl_max is None else max(cl_max, point.cl)
+                if cl_max > 0.0 and point.cl < (1.0 - stall_drop) * cl_max:
+                    return
+
+    def adaptive_polar(self, min_alpha, max_alpha, min_step=0.1, max_step=1.0, tol=0.01, xtr_jump=0.05,
+                       stall_drop=0.1, required=()):
+        """
+        Generator marching alpha from min_alpha to max_alpha with a step that adapts to the CL-alpha curve,
+        yielding each Point as it is solved (not necessarily in alpha order).
+        The step doubles (up to max_step) while CL follows the line through the last two points and is halved
+        (down to min_step) back from the last accepted point when the error exceeds tol, the transition location on
+        either side moves by more than xtr_jump or the point fails to converge. Finally the maximum CL is bracketed
+        by points min_step apart. Refined alphas stay on the min_step grid from min_alpha, so the angle of maximum
+        CL matches a uniform march. Alphas in required are always solved.
+        :param stall_drop: stop once CL has fallen this fraction below its maximum, None to run to max_alpha.
+        """
+        def snap(value):    # Ties round down, rather than differently under Python 2 and 3 round()
+            return round(min_alpha + min_step * math.ceil((value - min_alpha) / min_step - 0.5 - 1e-9), 2)
+
+        required = sorted(set(round(float(alpha), 2) for alpha in required))
+        solved = {}
+        march = []
+        step = max_step
+        alpha = round(float(min_alpha), 2)
+        cl_max = None
+        while alpha <= max_alpha + 1e-9:
+            if alpha not in solved:
+                solved[alpha] = self.alfa(alpha)
+                yield solved[alpha]
+            point = solved[alpha]
+            last = march[-1][0] if march else None
+            gap = alpha - last if march else 0.0
+
+            error, refine = 0.0, False
+            if not point.converged:
+                refine = True
+            elif len(march) >= 2:
+                (alpha_0, point_0), (alpha_1, point_1) = march[-2:]
+                error = abs(point.cl - point_1.cl - (point_1.cl - point_0.cl) / (alpha_1 - alpha_0) * gap)
+                jump = max(abs(point.top_xtr - point_1.top_xtr), abs(point.bot_xtr - point_1.bot_xtr)) > xtr_jump
+                refine = error > tol or jump
+            if refine and gap > min_step + 1e-9:
+                step = max(snap(min_alpha + gap / 2.0) - min_alpha, min_step)
+                alpha = snap(last + step)
+                continue
+
+            if point.converged:
+                march.append((alpha, point))
+                if error < tol / 4.0:
+                    step = min(2.0 * step, max_step)
+                cl_max = point.cl if cl_max is None else max(cl_max, point.cl)
+                if stall_drop is not None and cl_max > 0.0 and point.cl < (1.0 - stall_drop) * cl_max:
+                    break
+            next_required = [value for value in required if value > alpha + 1e-9]
+            alpha = round(min([alpha + step] + next_required[:1]), 2)
+
+        while True:     # Bracket the maximum CL by min_step
+            alphas = sorted(value for value, point in solved.items() if point.converged)
+            if not alphas:
+                return
+            idx = max(range(len(alphas)), key=lambda i: solved[alphas[i]].cl)
+            targets = [snap(0.5 * (alphas[i] + alphas[i + 1])) for i in (idx - 1, idx)
+                       if 0 <= i < len(alphas) - 1 and alphas[i + 1] - alphas[i] > min_step + 1e-9]
+            targets = [target for target in targets if target not in solved]
+            if not targets:
+                return
+            self.command('init')    # Restart the boundary layer rather than march back from stall
+            for target in targets:
+                solved[target] = self.alfa(target)
+                yield solved[target]
+
+    def close(self):
+        """
+        Function to quit Xfoil, killing it if it does not exit, and release its pipes. Also closes a session whose
+        Xfoil has already exited.
+        """
+        if self.process.poll() is None:
+            try:
+                self.top()
+                self.accumulate(None)
+                self.process.stdin.write('quit\n'.encode('latin-1'))
+                self.process.stdin.close()
+            except (IOError, OSError, RuntimeError):
+                pass
+            timer = threading.Timer(self.timeout, self.process.kill)
+            timer.start()
+            try:
+                self.process.wait()
+            finally:
+                timer.cancel()
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self._reader.join(self.timeout)
+        if not self._reader.is_alive():
+            self.process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def parse_point(alpha, output):
+    """
+    Function to parse the response to an Alfa command.
+    :return: Point, with NaN coefficients if Xfoil printed none.
+    """
+    nan = float('nan')
+    points = POINT.findall(output)
+    forces = FORCES.findall(output)
+    transition = dict(TRANSITION.findall(output))
+    alpha, cl = [float(value) for value in points[-1]] if points else (alpha, nan)
+    cm, cd, cdf, cdp = [float(value) for value in forces[-1]] if forces else (nan, nan, nan, nan)
+    return Point(alpha, cl, cd, cdp, cm, float(transition.get('1', nan)), float(transition.get('2', nan)),
+                 bool(points) and FAILED not in output)